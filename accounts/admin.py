@@ -6,7 +6,7 @@ from django.utils.html import format_html
 from django import forms
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from .models import CustomUser, UserSession, LoginHistory, Tenant, LoginActivity
+from .models import CustomUser, UserSession, LoginHistory, Tenant, LoginActivity, TenantDailyMetrics, SMSDailyStats
 
 class TenantAdminForm(forms.ModelForm):
     """Custom form for Tenant admin with color pickers"""
@@ -427,4 +427,18 @@ class LoginHistoryAdmin(admin.ModelAdmin):
         if obj.ip_address and obj.ip_address.startswith('192.168'):
             return "Local Network"
         return "External"
-    location.short_description = "Location"
\ No newline at end of file
+    location.short_description = "Location"
+@admin.register(TenantDailyMetrics)
+class TenantDailyMetricsAdmin(admin.ModelAdmin):
+    list_display = ('tenant', 'date', 'revenue', 'payments_count', 'new_customers',
+                    'active_customers', 'overdue_customers', 'online_routers', 'online_devices')
+    list_filter = ('tenant', 'date')
+    readonly_fields = [field.name for field in TenantDailyMetrics._meta.fields]
+    date_hierarchy = 'date'
+
+@admin.register(SMSDailyStats)
+class SMSDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ('tenant', 'date', 'sent_count', 'failed_count', 'cost')
+    list_filter = ('tenant', 'date')
+    readonly_fields = [field.name for field in SMSDailyStats._meta.fields]
+    date_hierarchy = 'date'
@@ -0,0 +1,283 @@
+# accounts/branding.py
+import hashlib
+from functools import lru_cache
+
+# Fallback palette, also used when a tenant leaves a colour blank
+DEFAULT_COLORS = {
+    'primary': '#4361ee',
+    'secondary': '#3a0ca3',
+    'accent': '#f59e0b',
+    'light': '#eff6ff',
+    'dark': '#1e3a8a',
+    'text': '#1f2937',
+    'success': '#10b981',
+    'warning': '#f59e0b',
+    'error': '#ef4444',
+    'info': '#3b82f6',
+}
+
+# Tenant fields whose change requires the stylesheet to be rebuilt
+BRANDING_FIELDS = [f'{name}_color' for name in DEFAULT_COLORS]
+
+
+def hex_to_rgb(hex_color):
+    """Convert hex color to RGB tuple"""
+    hex_color = hex_color.lstrip('#')
+    if len(hex_color) == 3:
+        hex_color = ''.join([c*2 for c in hex_color])
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+
+def rgb_to_hex(rgb):
+    """Convert RGB tuple to hex color"""
+    return f"#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}"
+
+
+def lighten_color(hex_color, factor=0.2):
+    """Lighten a hex color by a factor"""
+    rgb = hex_to_rgb(hex_color)
+    light_rgb = tuple(min(255, int(c + (255 - c) * factor)) for c in rgb)
+    return rgb_to_hex(light_rgb)
+
+
+def darken_color(hex_color, factor=0.2):
+    """Darken a hex color by a factor"""
+    rgb = hex_to_rgb(hex_color)
+    dark_rgb = tuple(max(0, int(c * (1 - factor))) for c in rgb)
+    return rgb_to_hex(dark_rgb)
+
+
+def tenant_colors(tenant):
+    """Tenant colours keyed like DEFAULT_COLORS, with defaults filled in"""
+    return {
+        name: getattr(tenant, f'{name}_color', None) or default
+        for name, default in DEFAULT_COLORS.items()
+    }
+
+
+@lru_cache(maxsize=256)
+def _palette(colors):
+    colors = dict(colors)
+    palette = dict(colors)
+    for name in ('primary', 'secondary', 'accent'):
+        palette[f'{name}_light'] = lighten_color(colors[name], 0.15)
+        palette[f'{name}_dark'] = darken_color(colors[name], 0.15)
+        palette[f'{name}_rgb'] = hex_to_rgb(colors[name])
+    return palette
+
+
+def tenant_palette(tenant):
+    """Base colours plus light/dark/RGB variants, memoised per colour set"""
+    return dict(_palette(tuple(sorted(tenant_colors(tenant).items()))))
+
+
+def build_tenant_css(tenant):
+    """
+    Render the full branding stylesheet for a tenant. It is linked from
+    every page, so anything beyond the variables and tenant-* classes is
+    scoped to .tenant-themed containers.
+    """
+    p = tenant_palette(tenant)
+    primary_rgb = p['primary_rgb']
+    secondary_rgb = p['secondary_rgb']
+    accent_rgb = p['accent_rgb']
+    rgb = f"{primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}"
+
+    return fr""":root {{
+    /* Primary Color Palette */
+    --tenant-primary: {p['primary']};
+    --tenant-primary-light: {p['primary_light']};
+    --tenant-primary-dark: {p['primary_dark']};
+    --tenant-primary-rgb: {rgb};
+    --tenant-primary-10: {p['primary']}1a;
+    --tenant-primary-20: {p['primary']}33;
+    --tenant-primary-50: {p['primary']}80;
+
+    /* Secondary Color Palette */
+    --tenant-secondary: {p['secondary']};
+    --tenant-secondary-light: {p['secondary_light']};
+    --tenant-secondary-dark: {p['secondary_dark']};
+    --tenant-secondary-rgb: {secondary_rgb[0]}, {secondary_rgb[1]}, {secondary_rgb[2]};
+
+    /* Accent Color Palette */
+    --tenant-accent: {p['accent']};
+    --tenant-accent-light: {p['accent_light']};
+    --tenant-accent-dark: {p['accent_dark']};
+    --tenant-accent-rgb: {accent_rgb[0]}, {accent_rgb[1]}, {accent_rgb[2]};
+
+    /* Light & Dark Variants */
+    --tenant-light: {p['light']};
+    --tenant-dark: {p['dark']};
+
+    /* Text Colors */
+    --tenant-text: {p['text']};
+    --tenant-text-light: #6b7280;
+    --tenant-text-lighter: #9ca3af;
+
+    /* UI Colors */
+    --tenant-success: {p['success']};
+    --tenant-warning: {p['warning']};
+    --tenant-error: {p['error']};
+    --tenant-info: {p['info']};
+
+    /* Background Colors */
+    --tenant-bg-primary: #ffffff;
+    --tenant-bg-secondary: #f9fafb;
+    --tenant-bg-tertiary: #f3f4f6;
+
+    /* Border Colors */
+    --tenant-border: #e5e7eb;
+    --tenant-border-light: #f3f4f6;
+    --tenant-border-dark: #d1d5db;
+
+    /* Shadow Colors */
+    --tenant-shadow-sm: 0 1px 2px 0 rgba({rgb}, 0.05);
+    --tenant-shadow: 0 1px 3px 0 rgba({rgb}, 0.1), 0 1px 2px 0 rgba({rgb}, 0.06);
+    --tenant-shadow-md: 0 4px 6px -1px rgba({rgb}, 0.1), 0 2px 4px -1px rgba({rgb}, 0.06);
+    --tenant-shadow-lg: 0 10px 15px -3px rgba({rgb}, 0.1), 0 4px 6px -2px rgba({rgb}, 0.05);
+    --tenant-shadow-xl: 0 20px 25px -5px rgba({rgb}, 0.1), 0 10px 10px -5px rgba({rgb}, 0.04);
+
+    /* Brand Gradients */
+    --tenant-gradient-primary: linear-gradient(135deg, {p['primary']} 0%, {p['primary_light']} 100%);
+    --tenant-gradient-secondary: linear-gradient(135deg, {p['secondary']} 0%, {p['secondary_light']} 100%);
+    --tenant-gradient-hero: linear-gradient(135deg, {p['primary']} 0%, {p['secondary']} 100%);
+    --tenant-gradient-accent: linear-gradient(135deg, {p['accent']} 0%, {p['accent_light']} 100%);
+    --tenant-gradient-light: linear-gradient(135deg, {p['light']} 0%, #ffffff 100%);
+}}
+
+/* Tenant-specific component styles */
+.tenant-brand-bg {{ background: var(--tenant-gradient-hero) !important; }}
+.tenant-gradient-bg {{ background: var(--tenant-gradient-primary) !important; }}
+.tenant-primary-bg {{ background-color: var(--tenant-primary) !important; }}
+.tenant-secondary-bg {{ background-color: var(--tenant-secondary) !important; }}
+.tenant-accent-bg {{ background-color: var(--tenant-accent) !important; }}
+.tenant-light-bg {{ background-color: var(--tenant-light) !important; }}
+.tenant-primary-text {{ color: var(--tenant-primary) !important; }}
+.tenant-secondary-text {{ color: var(--tenant-secondary) !important; }}
+.tenant-accent-text {{ color: var(--tenant-accent) !important; }}
+.tenant-border-primary {{ border-color: var(--tenant-primary) !important; }}
+.tenant-border-secondary {{ border-color: var(--tenant-secondary) !important; }}
+.tenant-border-accent {{ border-color: var(--tenant-accent) !important; }}
+
+.tenant-button-primary {{
+    background: var(--tenant-gradient-primary);
+    border: none;
+    color: white !important;
+    transition: all 0.2s ease;
+}}
+
+.tenant-button-primary:hover {{
+    background: var(--tenant-primary-dark);
+    transform: translateY(-1px);
+    box-shadow: var(--tenant-shadow-md);
+}}
+
+.tenant-button-secondary {{
+    background: var(--tenant-gradient-secondary);
+    border: none;
+    color: white !important;
+    transition: all 0.2s ease;
+}}
+
+.tenant-button-secondary:hover {{
+    background: var(--tenant-secondary-dark);
+    transform: translateY(-1px);
+    box-shadow: var(--tenant-shadow-md);
+}}
+
+.tenant-button-accent {{
+    background: var(--tenant-gradient-accent);
+    border: none;
+    color: white !important;
+    transition: all 0.2s ease;
+}}
+
+.tenant-button-accent:hover {{
+    background: var(--tenant-accent-dark);
+    transform: translateY(-1px);
+    box-shadow: var(--tenant-shadow-md);
+}}
+
+.tenant-card {{
+    border-left: 4px solid var(--tenant-primary);
+    box-shadow: var(--tenant-shadow-sm);
+    transition: all 0.3s ease;
+}}
+
+.tenant-card:hover {{
+    box-shadow: var(--tenant-shadow-md);
+    transform: translateY(-2px);
+}}
+
+.tenant-nav-active {{
+    color: var(--tenant-primary) !important;
+    background-color: var(--tenant-primary-10) !important;
+    border-left: 3px solid var(--tenant-primary);
+}}
+
+.tenant-badge {{
+    background-color: var(--tenant-primary);
+    color: white;
+    padding: 0.25rem 0.5rem;
+    border-radius: 0.375rem;
+    font-size: 0.75rem;
+    font-weight: 600;
+}}
+
+.tenant-progress-bar {{
+    background: var(--tenant-gradient-primary);
+    height: 0.5rem;
+    border-radius: 0.25rem;
+}}
+
+/* Tailwind colours and scrollbars follow the tenant only inside an opted-in container */
+.tenant-themed .text-blue-600 {{ color: var(--tenant-primary) !important; }}
+.tenant-themed .bg-blue-600 {{ background-color: var(--tenant-primary) !important; }}
+.tenant-themed .border-blue-600 {{ border-color: var(--tenant-primary) !important; }}
+.tenant-themed .hover\:bg-blue-700:hover {{ background-color: var(--tenant-primary-dark) !important; }}
+
+.tenant-themed .text-purple-600 {{ color: var(--tenant-secondary) !important; }}
+.tenant-themed .bg-purple-600 {{ background-color: var(--tenant-secondary) !important; }}
+.tenant-themed .border-purple-600 {{ border-color: var(--tenant-secondary) !important; }}
+
+.tenant-themed .text-yellow-500 {{ color: var(--tenant-accent) !important; }}
+.tenant-themed .bg-yellow-500 {{ background-color: var(--tenant-accent) !important; }}
+
+.tenant-themed .text-green-600 {{ color: var(--tenant-success) !important; }}
+.tenant-themed .bg-green-600 {{ background-color: var(--tenant-success) !important; }}
+
+.tenant-themed .text-red-600 {{ color: var(--tenant-error) !important; }}
+.tenant-themed .bg-red-600 {{ background-color: var(--tenant-error) !important; }}
+
+.tenant-themed::-webkit-scrollbar {{ width: 10px; }}
+.tenant-themed::-webkit-scrollbar-track {{ background: var(--tenant-light); }}
+.tenant-themed::-webkit-scrollbar-thumb {{ background: var(--tenant-primary); border-radius: 5px; }}
+.tenant-themed::-webkit-scrollbar-thumb:hover {{ background: var(--tenant-primary-dark); }}
+"""
+
+
+def css_content_hash(css):
+    """Short content hash used in the stylesheet URL"""
+    return hashlib.sha256(css.encode('utf-8')).hexdigest()[:16]
+
+
+def compile_tenant_branding(tenant):
+    """Rebuild tenant.branding_css and its hash in place (does not save)"""
+    css = build_tenant_css(tenant)
+    tenant.branding_css = css
+    tenant.branding_css_hash = css_content_hash(css)
+    return tenant.branding_css_hash
+
+
+def ensure_tenant_branding(tenant):
+    """
+    Compile and store the stylesheet of a tenant that has none yet, e.g.
+    one saved before it existed. Returns True when it compiled one.
+    """
+    if tenant.branding_css_hash:
+        return False
+    compile_tenant_branding(tenant)
+    type(tenant).objects.filter(pk=tenant.pk).update(
+        branding_css=tenant.branding_css, branding_css_hash=tenant.branding_css_hash
+    )
+    return True
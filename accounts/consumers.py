@@ -1,7 +1,12 @@
 # Create accounts/consumers.py for WebSocket
-from channels.generic.websocket import AsyncWebsocketConsumer
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer, AsyncJsonWebsocketConsumer
 import json
 
+from .status_events import status_group, latest_cursor, events_since
+
 class MapConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope['user']
@@ -9,7 +14,7 @@ class MapConsumer(AsyncWebsocketConsumer):
             await self.accept()
             
             # Join room for this tenant
-            self.room_group_name = f'map_updates_{self.user.tenant.id}'
+            self.room_group_name = f'map_updates_{self.user.tenant_id}'
             await self.channel_layer.group_add(
                 self.room_group_name,
                 self.channel_name
@@ -46,4 +51,58 @@ class MapConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'message': message,
             'type': 'refresh'
-        }))
\ No newline at end of file
+        }))
+
+
+class StatusConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Live status deltas for ISP dashboards.
+    
+    Connect with ?since=<cursor> to replay missed deltas first; without it
+    the client gets a 'hello' carrying the current cursor. Every 'deltas'
+    message carries the cursor to resume from. Events can repeat around a
+    resume, so clients skip ids at or below their cursor.
+    """
+    
+    async def connect(self):
+        self.user = self.scope['user']
+        if not (self.user.is_authenticated and self.user.role in ['isp_admin', 'isp_staff'] and self.user.tenant_id):
+            await self.close()
+            return
+        
+        self.tenant_id = self.user.tenant_id
+        self.group_name = status_group(self.tenant_id)
+        # Join before reading the backlog so nothing falls between the two
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        
+        since = parse_qs(self.scope.get('query_string', b'').decode()).get('since')
+        await self.send_backlog(since[0] if since else None)
+    
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def receive_json(self, content):
+        if content.get('action') == 'resume':
+            await self.send_backlog(content.get('since'))
+    
+    async def send_backlog(self, since):
+        try:
+            cursor = int(since)
+        except (TypeError, ValueError):
+            cursor = None
+        
+        if cursor is None:
+            await self.send_json({'type': 'hello', 'cursor': await database_sync_to_async(latest_cursor)(self.tenant_id)})
+            return
+        
+        events, cursor, complete = await database_sync_to_async(events_since)(self.tenant_id, cursor)
+        if not complete:
+            await self.send_json({'type': 'resync', 'cursor': cursor})
+        else:
+            await self.send_json({'type': 'deltas', 'cursor': cursor, 'events': events, 'replay': True})
+    
+    # Receive deltas from the tenant's status group
+    async def status_deltas(self, event):
+        await self.send_json({'type': 'deltas', 'cursor': event['cursor'], 'events': event['events']})
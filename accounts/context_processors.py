@@ -1,5 +1,7 @@
 from itertools import count
+from django.templatetags.static import static
 from .models import Tenant, CustomUser
+from .branding import DEFAULT_COLORS, ensure_tenant_branding, tenant_palette
 from django.db.models import Q
 
 def tenant_context(request):
@@ -28,275 +30,29 @@ def tenant_context(request):
             'tenant_subscription_active': tenant.is_subscription_active(),
         })
         
-        # Get tenant colors with defaults
-        primary_color = tenant.primary_color if tenant.primary_color else '#4361ee'
-        secondary_color = tenant.secondary_color if tenant.secondary_color else '#3a0ca3'
-        accent_color = tenant.accent_color if tenant.accent_color else '#f59e0b'
-        light_color = tenant.light_color if tenant.light_color else '#eff6ff'
-        dark_color = tenant.dark_color if tenant.dark_color else '#1e3a8a'
-        text_color = tenant.text_color if tenant.text_color else '#1f2937'
-        success_color = tenant.success_color if tenant.success_color else '#10b981'
-        warning_color = tenant.warning_color if tenant.warning_color else '#f59e0b'
-        error_color = tenant.error_color if tenant.error_color else '#ef4444'
-        info_color = tenant.info_color if tenant.info_color else '#3b82f6'
-        
-        # Helper function to generate color variations
-        def hex_to_rgb(hex_color):
-            """Convert hex color to RGB tuple"""
-            hex_color = hex_color.lstrip('#')
-            if len(hex_color) == 3:
-                hex_color = ''.join([c*2 for c in hex_color])
-            return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-        
-        def rgb_to_hex(rgb):
-            """Convert RGB tuple to hex color"""
-            return f"#{rgb[0]:02x}{rgb[1]:02x}{rgb[2]:02x}"
-        
-        def lighten_color(hex_color, factor=0.2):
-            """Lighten a hex color by a factor"""
-            rgb = hex_to_rgb(hex_color)
-            light_rgb = tuple(min(255, int(c + (255 - c) * factor)) for c in rgb)
-            return rgb_to_hex(light_rgb)
-        
-        def darken_color(hex_color, factor=0.2):
-            """Darken a hex color by a factor"""
-            rgb = hex_to_rgb(hex_color)
-            dark_rgb = tuple(max(0, int(c * (1 - factor))) for c in rgb)
-            return rgb_to_hex(dark_rgb)
-        
-        # Generate color variations
-        primary_light = lighten_color(primary_color, 0.15)
-        primary_dark = darken_color(primary_color, 0.15)
-        secondary_light = lighten_color(secondary_color, 0.15)
-        secondary_dark = darken_color(secondary_color, 0.15)
-        accent_light = lighten_color(accent_color, 0.15)
-        accent_dark = darken_color(accent_color, 0.15)
-        
-        # Get RGB values for CSS variables
-        primary_rgb = hex_to_rgb(primary_color)
-        secondary_rgb = hex_to_rgb(secondary_color)
-        accent_rgb = hex_to_rgb(accent_color)
-        
-        context['tenant_css'] = fr"""
-        :root {{
-            /* Primary Color Palette */
-            --tenant-primary: {primary_color};
-            --tenant-primary-light: {primary_light};
-            --tenant-primary-dark: {primary_dark};
-            --tenant-primary-rgb: {primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]};
-            --tenant-primary-10: {primary_color}1a;
-            --tenant-primary-20: {primary_color}33;
-            --tenant-primary-50: {primary_color}80;
-            
-            /* Secondary Color Palette */
-            --tenant-secondary: {secondary_color};
-            --tenant-secondary-light: {secondary_light};
-            --tenant-secondary-dark: {secondary_dark};
-            --tenant-secondary-rgb: {secondary_rgb[0]}, {secondary_rgb[1]}, {secondary_rgb[2]};
-            
-            /* Accent Color Palette */
-            --tenant-accent: {accent_color};
-            --tenant-accent-light: {accent_light};
-            --tenant-accent-dark: {accent_dark};
-            --tenant-accent-rgb: {accent_rgb[0]}, {accent_rgb[1]}, {accent_rgb[2]};
-            
-            /* Light & Dark Variants */
-            --tenant-light: {light_color};
-            --tenant-dark: {dark_color};
-            
-            /* Text Colors */
-            --tenant-text: {text_color};
-            --tenant-text-light: #6b7280;
-            --tenant-text-lighter: #9ca3af;
-            
-            /* UI Colors */
-            --tenant-success: {success_color};
-            --tenant-warning: {warning_color};
-            --tenant-error: {error_color};
-            --tenant-info: {info_color};
-            
-            /* Background Colors */
-            --tenant-bg-primary: #ffffff;
-            --tenant-bg-secondary: #f9fafb;
-            --tenant-bg-tertiary: #f3f4f6;
-            
-            /* Border Colors */
-            --tenant-border: #e5e7eb;
-            --tenant-border-light: #f3f4f6;
-            --tenant-border-dark: #d1d5db;
-            
-            /* Shadow Colors */
-            --tenant-shadow-sm: 0 1px 2px 0 rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.05);
-            --tenant-shadow: 0 1px 3px 0 rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.1), 0 1px 2px 0 rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.06);
-            --tenant-shadow-md: 0 4px 6px -1px rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.1), 0 2px 4px -1px rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.06);
-            --tenant-shadow-lg: 0 10px 15px -3px rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.1), 0 4px 6px -2px rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.05);
-            --tenant-shadow-xl: 0 20px 25px -5px rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.1), 0 10px 10px -5px rgba({primary_rgb[0]}, {primary_rgb[1]}, {primary_rgb[2]}, 0.04);
-            
-            /* Brand Gradients */
-            --tenant-gradient-primary: linear-gradient(135deg, {primary_color} 0%, {primary_light} 100%);
-            --tenant-gradient-secondary: linear-gradient(135deg, {secondary_color} 0%, {secondary_light} 100%);
-            --tenant-gradient-hero: linear-gradient(135deg, {primary_color} 0%, {secondary_color} 100%);
-            --tenant-gradient-accent: linear-gradient(135deg, {accent_color} 0%, {accent_light} 100%);
-            --tenant-gradient-light: linear-gradient(135deg, {light_color} 0%, #ffffff 100%);
-        }}
-        
-        /* Tenant-specific component styles */
-        .tenant-brand-bg {{
-            background: var(--tenant-gradient-hero) !important;
-        }}
-        
-        .tenant-gradient-bg {{
-            background: var(--tenant-gradient-primary) !important;
-        }}
-        
-        .tenant-primary-bg {{
-            background-color: var(--tenant-primary) !important;
-        }}
-        
-        .tenant-secondary-bg {{
-            background-color: var(--tenant-secondary) !important;
-        }}
-        
-        .tenant-accent-bg {{
-            background-color: var(--tenant-accent) !important;
-        }}
-        
-        .tenant-light-bg {{
-            background-color: var(--tenant-light) !important;
-        }}
-        
-        .tenant-primary-text {{
-            color: var(--tenant-primary) !important;
-        }}
-        
-        .tenant-secondary-text {{
-            color: var(--tenant-secondary) !important;
-        }}
-        
-        .tenant-accent-text {{
-            color: var(--tenant-accent) !important;
-        }}
-        
-        .tenant-border-primary {{
-            border-color: var(--tenant-primary) !important;
-        }}
-        
-        .tenant-border-secondary {{
-            border-color: var(--tenant-secondary) !important;
-        }}
-        
-        .tenant-border-accent {{
-            border-color: var(--tenant-accent) !important;
-        }}
-        
-        .tenant-button-primary {{
-            background: var(--tenant-gradient-primary);
-            border: none;
-            color: white !important;
-            transition: all 0.2s ease;
-        }}
-        
-        .tenant-button-primary:hover {{
-            background: var(--tenant-primary-dark);
-            transform: translateY(-1px);
-            box-shadow: var(--tenant-shadow-md);
-        }}
-        
-        .tenant-button-secondary {{
-            background: var(--tenant-gradient-secondary);
-            border: none;
-            color: white !important;
-            transition: all 0.2s ease;
-        }}
-        
-        .tenant-button-secondary:hover {{
-            background: var(--tenant-secondary-dark);
-            transform: translateY(-1px);
-            box-shadow: var(--tenant-shadow-md);
-        }}
-        
-        .tenant-button-accent {{
-            background: var(--tenant-gradient-accent);
-            border: none;
-            color: white !important;
-            transition: all 0.2s ease;
-        }}
-        
-        .tenant-button-accent:hover {{
-            background: var(--tenant-accent-dark);
-            transform: translateY(-1px);
-            box-shadow: var(--tenant-shadow-md);
-        }}
-        
-        .tenant-card {{
-            border-left: 4px solid var(--tenant-primary);
-            box-shadow: var(--tenant-shadow-sm);
-            transition: all 0.3s ease;
-        }}
-        
-        .tenant-card:hover {{
-            box-shadow: var(--tenant-shadow-md);
-            transform: translateY(-2px);
-        }}
-        
-        .tenant-nav-active {{
-            color: var(--tenant-primary) !important;
-            background-color: var(--tenant-primary-10) !important;
-            border-left: 3px solid var(--tenant-primary);
-        }}
-        
-        .tenant-badge {{
-            background-color: var(--tenant-primary);
-            color: white;
-            padding: 0.25rem 0.5rem;
-            border-radius: 0.375rem;
-            font-size: 0.75rem;
-            font-weight: 600;
-        }}
-        
-        .tenant-progress-bar {{
-            background: var(--tenant-gradient-primary);
-            height: 0.5rem;
-            border-radius: 0.25rem;
-        }}
-        
-        /* Override Tailwind colors with tenant colors */
-        .text-blue-600 {{ color: var(--tenant-primary) !important; }}
-        .bg-blue-600 {{ background-color: var(--tenant-primary) !important; }}
-        .border-blue-600 {{ border-color: var(--tenant-primary) !important; }}
-        .hover\\:bg-blue-700:hover {{ background-color: var(--tenant-primary-dark) !important; }}
-        
-        .text-purple-600 {{ color: var(--tenant-secondary) !important; }}
-        .bg-purple-600 {{ background-color: var(--tenant-secondary) !important; }}
-        .border-purple-600 {{ border-color: var(--tenant-secondary) !important; }}
-        
-        .text-yellow-500 {{ color: var(--tenant-accent) !important; }}
-        .bg-yellow-500 {{ background-color: var(--tenant-accent) !important; }}
-        
-        .text-green-600 {{ color: var(--tenant-success) !important; }}
-        .bg-green-600 {{ background-color: var(--tenant-success) !important; }}
-        
-        .text-red-600 {{ color: var(--tenant-error) !important; }}
-        .bg-red-600 {{ background-color: var(--tenant-error) !important; }}
-        
-        /* Scrollbar styling */
-        ::-webkit-scrollbar {{
-            width: 10px;
-        }}
-        
-        ::-webkit-scrollbar-track {{
-            background: var(--tenant-light);
-        }}
-        
-        ::-webkit-scrollbar-thumb {{
-            background: var(--tenant-primary);
-            border-radius: 5px;
-        }}
-        
-        ::-webkit-scrollbar-thumb:hover {{
-            background: var(--tenant-primary-dark);
-        }}
-        """
+        # Colour variants are memoised per palette; the stylesheet itself is
+        # compiled on Tenant.save() and linked by content-hashed URL
+        palette = tenant_palette(tenant)
+        primary_color = palette['primary']
+        secondary_color = palette['secondary']
+        accent_color = palette['accent']
+        light_color = palette['light']
+        dark_color = palette['dark']
+        text_color = palette['text']
+        success_color = palette['success']
+        warning_color = palette['warning']
+        error_color = palette['error']
+        info_color = palette['info']
+        primary_light = palette['primary_light']
+        primary_dark = palette['primary_dark']
+        secondary_light = palette['secondary_light']
+        secondary_dark = palette['secondary_dark']
+        
+        if ensure_tenant_branding(tenant):
+            # Cached copies still carry the empty hash
+            from .tenant_cache import tenant_cache
+            tenant_cache.invalidate_tenant(tenant)
+        context['tenant_css_url'] = tenant.branding_css_url or static('css/tenant_default.css')
         
         # Add JavaScript configuration for tenant
         context['tenant_js_config'] = fr"""
@@ -377,16 +133,16 @@ def tenant_context(request):
     
     else:
         # Default values when no tenant is available
-        default_primary = '#4361ee'
-        default_secondary = '#3a0ca3'
-        default_accent = '#f59e0b'
-        default_light = '#eff6ff'
-        default_dark = '#1e3a8a'
-        default_text = '#1f2937'
-        default_success = '#10b981'
-        default_warning = '#f59e0b'
-        default_error = '#ef4444'
-        default_info = '#3b82f6'
+        default_primary = DEFAULT_COLORS['primary']
+        default_secondary = DEFAULT_COLORS['secondary']
+        default_accent = DEFAULT_COLORS['accent']
+        default_light = DEFAULT_COLORS['light']
+        default_dark = DEFAULT_COLORS['dark']
+        default_text = DEFAULT_COLORS['text']
+        default_success = DEFAULT_COLORS['success']
+        default_warning = DEFAULT_COLORS['warning']
+        default_error = DEFAULT_COLORS['error']
+        default_info = DEFAULT_COLORS['info']
         
         context.update({
             'tenant': None,
@@ -407,21 +163,7 @@ def tenant_context(request):
             'brand_info': default_info,
         })
         
-        # Default CSS with all required variables
-        context['tenant_css'] = f"""
-        :root {{
-            --tenant-primary: {default_primary};
-            --tenant-secondary: {default_secondary};
-            --tenant-accent: {default_accent};
-            --tenant-light: {default_light};
-            --tenant-dark: {default_dark};
-            --tenant-text: {default_text};
-            --tenant-success: {default_success};
-            --tenant-warning: {default_warning};
-            --tenant-error: {default_error};
-            --tenant-info: {default_info};
-        }}
-        """
+        context['tenant_css_url'] = static('css/tenant_default.css')
         
         context['tenant_js_config'] = """
         window.tenantConfig = {
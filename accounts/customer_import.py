@@ -0,0 +1,413 @@
+# accounts/customer_import.py
+"""
+Staged customer imports.
+
+An upload is parsed as a stream (csv.reader over the file, or openpyxl
+in read-only mode) and written to CustomerImportRow in chunks of
+STAGE_CHUNK. Rows are validated while staging: required fields, e-mail
+format, duplicates within the file, and usernames that already exist
+(one query per chunk). Only the CustomerImportJob id goes into the
+session. The preview pages through the staged rows.
+
+The import runs on a background thread. It takes the valid rows in
+batches of IMPORT_BATCH, and each batch is one transaction that
+bulk-creates the users and their subscriptions (see provisioning).
+Passwords are hashed on a process pool shared by all batches. The job's counters are
+updated after every batch, so the results page can show progress.
+
+The thread dies with its process. A queued or importing job whose
+heartbeat is older than STALE_IMPORT_SECONDS is assumed lost and is
+reported as failed; rows it had not reached stay valid.
+"""
+import csv
+import io
+import logging
+import threading
+
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import CustomerImportJob, CustomerImportRow, CustomUser
+from .provisioning import (
+    build_customer, existing_usernames, generate_account_numbers, insert_customers, password_hasher,
+    record_new_customers,
+)
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = ['username', 'email', 'phone', 'first_name', 'last_name', 'address']
+
+# Rows validated and inserted per staging query
+STAGE_CHUNK = 1000
+# Customers created per import transaction
+IMPORT_BATCH = 200
+# Finished or abandoned jobs (and any generated passwords) are purged after this
+RETENTION_DAYS = 7
+# A running import writes a heartbeat after every batch; silence this long means its process is gone
+STALE_IMPORT_SECONDS = 900
+STALE_IMPORT_ERROR = 'Import stopped responding; its process most likely exited'
+
+username_validator = UnicodeUsernameValidator()
+
+
+class ImportFileError(Exception):
+    """The upload could not be read as a customer list"""
+
+
+# ---------------------------------------------------------------------------
+# Parsing: each reader yields (row_number, {column: value} or error string)
+# ---------------------------------------------------------------------------
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        # Spreadsheets store phone numbers as floats
+        if value != value:
+            return ''
+        if value.is_integer():
+            value = int(value)
+    return str(value).strip()
+
+
+def _records(header, rows, first_row_number=2):
+    header = [_cell(name).lower() for name in header]
+    if 'username' not in header:
+        raise ImportFileError("The first row must contain column names, including 'username'")
+    for row_number, row in enumerate(rows, start=first_row_number):
+        values = [_cell(value) for value in row]
+        if not any(values):
+            continue
+        if len(values) != len(header):
+            yield row_number, f"Expected {len(header)} columns, found {len(values)}"
+            continue
+        yield row_number, dict(zip(header, values))
+
+
+def read_csv(uploaded_file):
+    uploaded_file.seek(0)
+    reader = csv.reader(io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline=''))
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ImportFileError("The file is empty")
+    yield from _records(header, reader)
+
+
+def read_xlsx(uploaded_file):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        try:
+            header = next(rows)
+        except StopIteration:
+            raise ImportFileError("The file is empty")
+        # Trailing empty cells would otherwise count as extra columns
+        width = len(header)
+        yield from _records(header, (row[:width] for row in rows))
+    finally:
+        workbook.close()
+
+
+def read_xls(uploaded_file):
+    # Legacy .xls has no streaming reader; pandas loads it whole
+    import pandas as pd
+
+    frame = pd.read_excel(uploaded_file, dtype=object)
+    yield from _records(frame.columns, frame.itertuples(index=False, name=None))
+
+
+def read_text(text):
+    """Pasted username, email, phone, first name, last name, address lines (comma or tab separated)"""
+    lines = text.strip().split('\n')
+    delimiter = '\t' if '\t' in lines[0] else ','
+    for row_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        parts = [part.strip() for part in line.split(delimiter)]
+        if len(parts) < 2:
+            yield row_number, "Expected at least a username and an email"
+            continue
+        yield row_number, dict(zip(COLUMNS, parts))
+
+
+READERS = {
+    'csv': read_csv,
+    'xlsx': read_xlsx,
+    'xls': read_xls,
+}
+
+
+# ---------------------------------------------------------------------------
+# Staging
+# ---------------------------------------------------------------------------
+
+def _validate_chunk(chunk, seen_usernames):
+    """Build CustomerImportRow objects for a chunk of parsed records"""
+    usernames = [data.get('username', '') for _, data in chunk if isinstance(data, dict)]
+    existing = set(
+        CustomUser.objects.filter(username__in=[name for name in usernames if name])
+        .values_list('username', flat=True)
+    )
+
+    rows = []
+    for row_number, data in chunk:
+        if not isinstance(data, dict):
+            rows.append(CustomerImportRow(row_number=row_number, status='invalid', error=data))
+            continue
+        data = {column: data.get(column, '') for column in COLUMNS}
+        errors = []
+        username = data['username']
+        if not username:
+            errors.append("Username is required")
+        else:
+            try:
+                username_validator(username)
+            except ValidationError:
+                errors.append("Username may only contain letters, digits and @/./+/-/_")
+            if len(username) > 150:
+                errors.append("Username is longer than 150 characters")
+            if username in existing:
+                errors.append(f'Username "{username}" already exists')
+            elif username in seen_usernames:
+                errors.append(f'Username "{username}" appears more than once in the file')
+            seen_usernames.add(username)
+        if data['email']:
+            try:
+                validate_email(data['email'])
+            except ValidationError:
+                errors.append(f'Invalid email "{data["email"]}"')
+        rows.append(CustomerImportRow(
+            row_number=row_number,
+            data=data,
+            status='invalid' if errors else 'valid',
+            error='; '.join(errors),
+        ))
+    return rows
+
+
+def create_import_job(tenant, user, file_name, file_type, records):
+    """Stage parsed records as a new CustomerImportJob. Raises ImportFileError on unreadable input."""
+    purge_old_jobs()
+    job = CustomerImportJob.objects.create(
+        tenant=tenant, created_by=user, file_name=file_name[:255], file_type=file_type
+    )
+    try:
+        seen_usernames = set()
+        totals = {'valid': 0, 'invalid': 0}
+        chunk = []
+
+        def flush():
+            rows = _validate_chunk(chunk, seen_usernames)
+            for row in rows:
+                row.job = job
+                totals[row.status] += 1
+            CustomerImportRow.objects.bulk_create(rows)
+            chunk.clear()
+
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= STAGE_CHUNK:
+                flush()
+        if chunk:
+            flush()
+    except Exception:
+        job.delete()
+        raise
+
+    job.valid_rows = totals['valid']
+    job.invalid_rows = totals['invalid']
+    job.total_rows = job.valid_rows + job.invalid_rows
+    job.save(update_fields=['valid_rows', 'invalid_rows', 'total_rows'])
+    return job
+
+
+def _stale_jobs():
+    cutoff = timezone.now() - timezone.timedelta(seconds=STALE_IMPORT_SECONDS)
+    return CustomerImportJob.objects.filter(status__in=['queued', 'importing'], heartbeat_at__lt=cutoff)
+
+
+def expire_stale_jobs():
+    """Fail every queued or importing job whose thread has stopped. Returns the number expired."""
+    return _stale_jobs().update(status='failed', error=STALE_IMPORT_ERROR, finished_at=timezone.now())
+
+
+def expire_if_stale(job):
+    """Mark `job` failed if its import stopped responding. Returns the job."""
+    if job.status in ('queued', 'importing') and _stale_jobs().filter(pk=job.pk).update(
+        status='failed', error=STALE_IMPORT_ERROR, finished_at=timezone.now()
+    ):
+        job.refresh_from_db()
+    return job
+
+
+def purge_old_jobs():
+    expire_stale_jobs()
+    cutoff = timezone.now() - timezone.timedelta(days=RETENTION_DAYS)
+    CustomerImportJob.objects.filter(created_at__lt=cutoff).exclude(status__in=['queued', 'importing']).delete()
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+def queue_import(job, options):
+    """Save the chosen options and start the import once the current transaction commits"""
+    job.options = options
+    job.status = 'queued'
+    job.heartbeat_at = timezone.now()
+    job.save(update_fields=['options', 'status', 'heartbeat_at'])
+    thread = threading.Thread(target=_import_in_thread, args=(job.pk,), daemon=True, name=f"CustomerImport-{job.pk}")
+    transaction.on_commit(thread.start)
+
+
+def _import_in_thread(job_id):
+    close_old_connections()
+    try:
+        run_import(job_id)
+    finally:
+        close_old_connections()
+
+
+def run_import(job_id):
+    """Import a queued job's valid rows batch by batch"""
+    from billing.models import SubscriptionPlan
+
+    now = timezone.now()
+    claimed = CustomerImportJob.objects.filter(pk=job_id, status='queued').update(
+        status='importing', started_at=now, heartbeat_at=now
+    )
+    if not claimed:
+        return
+    job = CustomerImportJob.objects.select_related('tenant', 'created_by').get(pk=job_id)
+
+    try:
+        plan = None
+        if job.options.get('default_plan_id'):
+            plan = SubscriptionPlan.objects.get(id=job.options['default_plan_id'], tenant=job.tenant)
+
+        last_id = 0
+        with password_hasher(job.valid_rows) as hash_batch:
+            while True:
+                batch = list(job.rows.filter(status='valid', id__gt=last_id).order_by('id')[:IMPORT_BATCH])
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                _import_rows(job, batch, plan, hash_batch)
+    except Exception as e:
+        logger.error(f"Customer import {job_id} failed: {e}")
+        CustomerImportJob.objects.filter(pk=job_id).update(
+            status='failed', error=str(e), finished_at=timezone.now()
+        )
+        return
+
+    CustomerImportJob.objects.filter(pk=job_id).update(status='completed', finished_at=timezone.now())
+    logger.info(f"Customer import {job_id} completed for tenant {job.tenant_id}")
+
+
+def _import_rows(job, rows, plan, hash_batch):
+    """Create customers for a batch in one transaction, falling back to one row at a time on conflicts"""
+    # Passwords are hashed before the transaction opens to keep it short
+    customers, created_rows = _build_customers(job, rows, plan, hash_batch)
+    try:
+        with transaction.atomic():
+            _insert_customers(job, rows, customers, created_rows, plan)
+    except IntegrityError:
+        if len(rows) == 1:
+            rows[0].status = 'failed'
+            rows[0].error = 'Username or account number already exists'
+            rows[0].password = ''
+            CustomerImportRow.objects.bulk_update(rows, ['status', 'error', 'password'])
+            _count(job, rows)
+            return
+        for row in rows:
+            _import_rows(job, [row], plan, hash_batch)
+        return
+    record_new_customers(job.tenant_id, customers)
+
+
+def _build_customers(job, rows, plan, hash_batch):
+    """Unsaved CustomUser objects for a batch, plus the rows they belong to"""
+    options = job.options
+    # Usernames taken since the file was staged
+    taken = existing_usernames(row.data['username'] for row in rows)
+
+    created_rows, passwords = [], []
+    for row in rows:
+        if row.data['username'] in taken:
+            row.status = 'failed'
+            row.error = f'Username "{row.data["username"]}" already exists'
+            continue
+        if options.get('generate_passwords'):
+            row.password = CustomUser.objects.make_random_password(length=10)
+            passwords.append(row.password)
+        else:
+            passwords.append(f"{row.data['username']}123")
+        created_rows.append(row)
+
+    password_hashes = hash_batch(passwords)
+    account_numbers = generate_account_numbers(job.tenant, len(created_rows))
+    now = timezone.now()
+    customers = []
+    for row, password_hash, account_number in zip(created_rows, password_hashes, account_numbers):
+        data = row.data
+        customers.append(build_customer(
+            job.tenant,
+            {
+                'username': data['username'],
+                'email': data['email'] or f"{data['username']}@example.com",
+                'phone': data['phone'],
+                'first_name': data['first_name'],
+                'last_name': data['last_name'],
+                'address': data['address'],
+            },
+            password_hash,
+            account_number,
+            plan=plan,
+            auto_activate=options.get('auto_activate', False),
+            approved_by=job.created_by,
+            now=now,
+        ))
+    return customers, created_rows
+
+
+def _insert_customers(job, rows, customers, created_rows, plan):
+    insert_customers(customers, plan)
+    for row, customer in zip(created_rows, customers):
+        row.status = 'imported'
+        row.customer = customer
+    CustomerImportRow.objects.bulk_update(rows, ['status', 'error', 'customer', 'password'])
+    _count(job, rows)
+
+
+def _count(job, rows):
+    imported = sum(1 for row in rows if row.status == 'imported')
+    CustomerImportJob.objects.filter(pk=job.pk).update(
+        processed_rows=F('processed_rows') + len(rows),
+        imported_rows=F('imported_rows') + imported,
+        failed_rows=F('failed_rows') + len(rows) - imported,
+        heartbeat_at=timezone.now(),
+    )
+
+
+def job_status(job):
+    """Progress snapshot served to the results page while an import runs"""
+    job = expire_if_stale(job)
+    return {
+        'id': job.id,
+        'status': job.status,
+        'total': job.total_rows,
+        'valid': job.valid_rows,
+        'invalid': job.invalid_rows,
+        'processed': job.processed_rows,
+        'imported': job.imported_rows,
+        'failed': job.failed_rows,
+        'progress': job.progress,
+        'error': job.error,
+    }
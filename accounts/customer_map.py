@@ -0,0 +1,457 @@
+# accounts/customer_map.py
+"""
+GeoJSON payload for the ISP customer map.
+
+Features are built in bulk (customers, active subscriptions, routers and
+online device counts - four queries regardless of tenant size) and cached
+one per customer. Signals call invalidate_customer_pins for the customers
+a write touched, which only deletes their keys; the next read rebuilds
+the missing pins in bulk. A write costs the same in a tenant of any size.
+
+The viewport endpoint never loads the whole tenant: the legend, the
+extent and the grid clusters are SQL aggregates over the indexed
+coordinates, with the pin colour computed as a CASE (with_pin_state).
+"""
+import math
+from datetime import timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import (
+    Case, CharField, Count, Exists, ExpressionWrapper, F, FloatField, Max, Min, OuterRef, Q, Subquery, Sum,
+    Value, When,
+)
+from django.db.models.functions import Floor
+from django.utils import timezone
+
+from .models import CustomUser, ISPZone
+
+CUSTOMER_MAP_TTL = 300
+# Missing pins rebuilt per query batch
+PIN_BUILD_CHUNK = 500
+
+# Web map zoom levels; anything outside is clamped
+MIN_ZOOM, MAX_ZOOM = 0, 22
+# Individual pins are only returned from this zoom level up...
+CLUSTER_PIN_ZOOM = 15
+# ...and only while the viewport holds fewer than this many
+MAX_VIEWPORT_PINS = 1000
+# Grid cells per 256px map tile edge, i.e. roughly one cluster per 64px
+CLUSTER_CELLS_PER_TILE = 4
+
+# Fallback bounding box (Nairobi) for zones without one, and for the default zone
+DEFAULT_BOUNDS = {'min_lat': -1.5, 'max_lat': -1.0, 'min_lng': 36.5, 'max_lng': 37.0}
+
+CUSTOMER_FIELDS = [
+    'id', 'tenant_id', 'username', 'first_name', 'last_name', 'email', 'phone',
+    'address', 'latitude', 'longitude', 'is_active_customer', 'location_verified',
+    'last_login',
+]
+
+
+def customer_pin_key(tenant_id, customer_id):
+    return f'customer_map_pin_{tenant_id}_{customer_id}'
+
+
+def pin_color(customer, subscription, router, online_devices, now):
+    """Pin colour from already-fetched customer, subscription and router state"""
+    if customer['latitude'] is None or customer['longitude'] is None:
+        return '#9CA3AF'  # Gray - No location
+    if not customer['location_verified']:
+        return '#FBBF24'  # Yellow - Unverified
+    if not customer['is_active_customer']:
+        return '#DC2626'  # Red - Inactive customer
+    if not subscription:
+        return '#8B5CF6'  # Purple - No subscription
+    if not subscription.start_date <= now <= subscription.end_date:
+        return '#DC2626'  # Red - Subscription not active
+
+    days_remaining = subscription.days_remaining
+    if days_remaining <= 0:
+        return '#EF4444'  # Red - Expired
+    if days_remaining <= 3:
+        return '#F97316'  # Orange - Expiring soon (≤3 days)
+    if days_remaining <= 7:
+        return '#EAB308'  # Yellow - Expiring (≤7 days)
+    if not router:
+        return '#8B5CF6'  # Purple - No router assigned
+    if router['is_online'] or online_devices:
+        return '#10B981'  # Green - Online
+    return '#3B82F6'  # Blue - Offline but active subscription
+
+
+def _feature(customer, subscription, router, online_devices, now):
+    is_online = bool(router and (router['is_online'] or online_devices))
+    full_name = f"{customer['first_name']} {customer['last_name']}".strip()
+    return {
+        'type': 'Feature',
+        'id': customer['id'],
+        'geometry': {
+            'type': 'Point',
+            'coordinates': [round(float(customer['longitude']), 6), round(float(customer['latitude']), 6)],
+        },
+        'properties': {
+            'username': customer['username'],
+            'full_name': full_name or customer['username'],
+            'email': customer['email'],
+            'phone': customer['phone'],
+            'address': customer['address'] or 'No address specified',
+            'pin_color': pin_color(customer, subscription, router, online_devices, now),
+            'is_online': is_online,
+            'online_devices': online_devices,
+            'is_active_customer': customer['is_active_customer'],
+            'location_verified': customer['location_verified'],
+            'last_login': customer['last_login'].isoformat() if customer['last_login'] else None,
+            'subscription': {
+                'has_subscription': bool(subscription),
+                'plan_name': subscription.plan.name if subscription else 'No Plan',
+                'days_remaining': subscription.days_remaining if subscription else 0,
+                'is_active': bool(subscription),
+                'start_date': subscription.start_date.isoformat() if subscription else None,
+                'end_date': subscription.end_date.isoformat() if subscription else None,
+            },
+            'router': {
+                'has_router': bool(router),
+                'is_online': bool(router and router['is_online']),
+                'model': router['model'] if router else None,
+            },
+        },
+    }
+
+
+def build_customer_features(tenant_id, customer_ids=None):
+    """
+    {customer_id: feature} for a tenant's located customers, optionally
+    limited to `customer_ids`. Runs a fixed number of queries.
+    """
+    from billing.models import Subscription
+    from router_manager.models import Router, Device
+
+    now = timezone.now()
+    customers = CustomUser.objects.filter(
+        tenant_id=tenant_id, role='customer',
+        latitude__isnull=False, longitude__isnull=False,
+    )
+    if customer_ids is not None:
+        customers = customers.filter(id__in=customer_ids)
+    customers = list(customers.values(*CUSTOMER_FIELDS))
+    ids = [customer['id'] for customer in customers]
+    if not ids:
+        return {}
+
+    # Latest active subscription per customer (Subscription is ordered by -created_at)
+    subscriptions = {}
+    for subscription in Subscription.objects.filter(
+        user_id__in=ids, is_active=True, end_date__gte=now
+    ).select_related('plan'):
+        subscriptions.setdefault(subscription.user_id, subscription)
+
+    routers = {
+        router['user_id']: router
+        for router in Router.objects.filter(user_id__in=ids).values('id', 'user_id', 'is_online', 'model')
+    }
+    online_devices = dict(
+        Device.objects.filter(router__user_id__in=ids, is_online=True)
+        .values('router__user_id')
+        .annotate(count=Count('id'))
+        .values_list('router__user_id', 'count')
+    )
+
+    return {
+        customer['id']: _feature(
+            customer,
+            subscriptions.get(customer['id']),
+            routers.get(customer['id']),
+            online_devices.get(customer['id'], 0),
+            now,
+        )
+        for customer in customers
+    }
+
+
+def zone_features(tenant_id, customer_count=0):
+    """Active zones as GeoJSON features; a default zone when none are defined"""
+    features = []
+    for zone in ISPZone.objects.filter(tenant_id=tenant_id, is_active=True):
+        bounds = {
+            'min_lat': float(zone.min_lat),
+            'max_lat': float(zone.max_lat),
+            'min_lng': float(zone.min_lng),
+            'max_lng': float(zone.max_lng),
+        } if zone.min_lat else DEFAULT_BOUNDS
+        features.append({
+            'type': 'Feature',
+            'id': zone.id,
+            'geometry': _zone_geometry(zone.geojson, bounds),
+            'properties': {
+                'name': zone.name,
+                'color': zone.color or '#3B82F6',
+                'bounds': bounds,
+                'customer_count': zone.customer_count,
+            },
+        })
+
+    if not features:
+        features.append({
+            'type': 'Feature',
+            'id': 'default',
+            'geometry': _zone_geometry(None, DEFAULT_BOUNDS),
+            'properties': {
+                'name': 'Default Zone',
+                'color': '#3B82F6',
+                'bounds': DEFAULT_BOUNDS,
+                'customer_count': customer_count,
+            },
+        })
+    return features
+
+
+def _zone_geometry(geojson, bounds):
+    """Zone polygon from its stored GeoJSON, falling back to its bounding box"""
+    if geojson:
+        if geojson.get('type') == 'Feature':
+            return geojson.get('geometry')
+        if geojson.get('type') == 'FeatureCollection' and geojson.get('features'):
+            return geojson['features'][0].get('geometry')
+        if 'coordinates' in geojson:
+            return geojson
+    return {
+        'type': 'Polygon',
+        'coordinates': [[
+            [bounds['min_lng'], bounds['min_lat']],
+            [bounds['max_lng'], bounds['min_lat']],
+            [bounds['max_lng'], bounds['max_lat']],
+            [bounds['min_lng'], bounds['max_lat']],
+            [bounds['min_lng'], bounds['min_lat']],
+        ]],
+    }
+
+
+def located_customers(tenant_id):
+    return CustomUser.objects.filter(
+        tenant_id=tenant_id, role='customer', latitude__isnull=False, longitude__isnull=False,
+    )
+
+
+def located_customer_ids(tenant_id):
+    return list(located_customers(tenant_id).order_by('id').values_list('id', flat=True))
+
+
+def get_customer_pins(tenant_id, customer_ids):
+    """{customer_id: feature} for the given located customers, building the ones not cached"""
+    keys = {customer_pin_key(tenant_id, customer_id): customer_id for customer_id in customer_ids}
+    cached = cache.get_many(list(keys))
+    features = {keys[key]: feature for key, feature in cached.items()}
+    missing = [customer_id for key, customer_id in keys.items() if key not in cached]
+    if len(missing) == len(keys) and len(missing) > PIN_BUILD_CHUNK:
+        fresh = build_customer_features(tenant_id)
+    else:
+        fresh = {}
+        for start in range(0, len(missing), PIN_BUILD_CHUNK):
+            fresh.update(build_customer_features(tenant_id, missing[start:start + PIN_BUILD_CHUNK]))
+    if fresh:
+        cache.set_many(
+            {customer_pin_key(tenant_id, customer_id): feature for customer_id, feature in fresh.items()},
+            CUSTOMER_MAP_TTL,
+        )
+        features.update(fresh)
+    return {customer_id: features[customer_id] for customer_id in customer_ids if customer_id in features}
+
+
+def get_customer_features(tenant_id):
+    """{customer_id: feature} for every located customer of a tenant"""
+    return get_customer_pins(tenant_id, located_customer_ids(tenant_id))
+
+
+def invalidate_customer_pins(tenant_id, customer_ids):
+    """Drop the cached pins of the given customers; they are rebuilt on the next read"""
+    customer_ids = {customer_id for customer_id in customer_ids if customer_id}
+    if not tenant_id or not customer_ids:
+        return
+    cache.delete_many([customer_pin_key(tenant_id, customer_id) for customer_id in customer_ids])
+
+
+def parse_bbox(value):
+    """
+    'min_lng,min_lat,max_lng,max_lat' -> list of (min_lng, min_lat, max_lng,
+    max_lat) boxes within -180..180, or None. Longitudes are wrapped, and a
+    viewport crossing the antimeridian (min_lng > max_lng once wrapped) is
+    split in two.
+    """
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        return None
+    if not all(math.isfinite(part) for part in (min_lng, min_lat, max_lng, max_lat)):
+        return None
+    if min_lat > max_lat:
+        return None
+    min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+    width = max_lng - min_lng if min_lng <= max_lng else max_lng - min_lng + 360
+    if width >= 360:
+        return [(-180.0, min_lat, 180.0, max_lat)]
+    west = (min_lng + 180) % 360 - 180
+    east = west + width
+    if east <= 180:
+        return [(west, min_lat, east, max_lat)]
+    return [(west, min_lat, 180.0, max_lat), (-180.0, min_lat, east - 360, max_lat)]
+
+
+def parse_zoom(value, default=5):
+    """Zoom level clamped to MIN_ZOOM..MAX_ZOOM (so ±inf is clamped too), or None when not a number"""
+    if value in (None, ''):
+        return default
+    try:
+        zoom = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(zoom):
+        return None
+    return int(min(max(zoom, MIN_ZOOM), MAX_ZOOM))
+
+
+def _bbox_filter(boxes):
+    query = Q()
+    for min_lng, min_lat, max_lng, max_lat in boxes:
+        query |= Q(
+            longitude__gte=min_lng, longitude__lte=max_lng,
+            latitude__gte=min_lat, latitude__lte=max_lat,
+        )
+    return query
+
+
+def utc_midnight(now):
+    """
+    Start of today in UTC. Subscription.days_remaining counts whole UTC
+    days, so "n days or fewer remaining" means an end before this + n + 1 days.
+    """
+    return now.astimezone(dt_timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def with_pin_state(customers, now):
+    """
+    Annotate customers with the state pin_color() reads - latest active
+    subscription, router and online devices - and the colour itself as a
+    SQL CASE, so the map can be aggregated without building features.
+    """
+    from billing.models import Subscription
+    from router_manager.models import Router, Device
+
+    subscription = Subscription.objects.filter(
+        user_id=OuterRef('pk'), is_active=True, end_date__gte=now
+    ).order_by('-created_at')
+    midnight = utc_midnight(now)
+    customers = customers.annotate(
+        map_sub_start=Subquery(subscription.values('start_date')[:1]),
+        map_sub_end=Subquery(subscription.values('end_date')[:1]),
+        map_router_online=Subquery(Router.objects.filter(user_id=OuterRef('pk')).values('is_online')[:1]),
+        map_device_online=Exists(Device.objects.filter(router__user_id=OuterRef('pk'), is_online=True)),
+    )
+    return customers.annotate(map_pin_color=Case(
+        When(location_verified=False, then=Value('#FBBF24')),
+        When(is_active_customer=False, then=Value('#DC2626')),
+        When(map_sub_end__isnull=True, then=Value('#8B5CF6')),
+        When(map_sub_start__gt=now, then=Value('#DC2626')),
+        When(map_sub_end__lt=midnight + timezone.timedelta(days=1), then=Value('#EF4444')),
+        When(map_sub_end__lt=midnight + timezone.timedelta(days=4), then=Value('#F97316')),
+        When(map_sub_end__lt=midnight + timezone.timedelta(days=8), then=Value('#EAB308')),
+        When(map_router_online__isnull=True, then=Value('#8B5CF6')),
+        When(Q(map_router_online=True) | Q(map_device_online=True), then=Value('#10B981')),
+        default=Value('#3B82F6'),
+        output_field=CharField(),
+    ))
+
+
+def map_summary(tenant_id):
+    """Tenant-wide legend counts, using the same buckets as the map legend, in one query"""
+    now = timezone.now()
+    midnight = utc_midnight(now)
+    has_plan = Q(map_sub_end__isnull=False)
+    is_online = Q(map_router_online=True) | Q(map_device_online=True)
+    # Spelled out rather than ~is_online, which is NULL for customers without a router
+    is_offline = (Q(map_router_online=False) | Q(map_router_online__isnull=True)) & Q(map_device_online=False)
+    # Customers without a plan have zero days remaining, so they count as expired too
+    expired = ~has_plan | Q(map_sub_end__lt=midnight + timezone.timedelta(days=1))
+    return with_pin_state(located_customers(tenant_id), now).aggregate(
+        total=Count('id'),
+        online=Count('id', filter=has_plan & is_online),
+        offline=Count('id', filter=has_plan & is_offline),
+        expiring=Count('id', filter=has_plan & ~expired & Q(map_sub_end__lt=midnight + timezone.timedelta(days=8))),
+        expired=Count('id', filter=expired),
+        noplan=Count('id', filter=~has_plan),
+    )
+
+
+def map_extent(tenant_id):
+    """[min_lng, min_lat, max_lng, max_lat] covering every pin, or None"""
+    extent = located_customers(tenant_id).aggregate(
+        min_lng=Min('longitude'), min_lat=Min('latitude'), max_lng=Max('longitude'), max_lat=Max('latitude'),
+    )
+    if extent['min_lng'] is None:
+        return None
+    return [float(extent[key]) for key in ('min_lng', 'min_lat', 'max_lng', 'max_lat')]
+
+
+def cluster_features(tenant_id, boxes, zoom):
+    """
+    Aggregate the pins inside `boxes` (see parse_bbox) on a fixed grid
+    aligned with the map's tiles. Returns (features, clustered). The bbox
+    filter and the grid bucketing run in SQL on the indexed coordinates;
+    only singletons and zoomed-in pins are read from the pin cache. Cells
+    are absolute, so a cluster stays put while the user pans.
+    """
+    zoom = int(min(max(zoom, MIN_ZOOM), MAX_ZOOM))
+    visible = located_customers(tenant_id).filter(_bbox_filter(boxes))
+    if zoom >= CLUSTER_PIN_ZOOM:
+        ids = list(visible.order_by('id').values_list('id', flat=True)[:MAX_VIEWPORT_PINS + 1])
+        if len(ids) <= MAX_VIEWPORT_PINS:
+            return list(get_customer_pins(tenant_id, ids).values()), False
+
+    cell_size = 360.0 / (2 ** zoom) / CLUSTER_CELLS_PER_TILE
+    rows = with_pin_state(visible, timezone.now()).annotate(
+        cell_x=Floor(ExpressionWrapper(F('longitude') / cell_size, output_field=FloatField())),
+        cell_y=Floor(ExpressionWrapper(F('latitude') / cell_size, output_field=FloatField())),
+    ).values('cell_x', 'cell_y', 'map_pin_color').annotate(
+        count=Count('id'),
+        sum_lng=Sum('longitude'), sum_lat=Sum('latitude'),
+        min_lng=Min('longitude'), min_lat=Min('latitude'),
+        max_lng=Max('longitude'), max_lat=Max('latitude'),
+        first_id=Min('id'),
+    ).order_by()
+
+    cells = {}
+    for row in rows:
+        cells.setdefault((int(row['cell_x']), int(row['cell_y'])), []).append(row)
+
+    singletons = [members[0]['first_id'] for members in cells.values() if sum(m['count'] for m in members) == 1]
+    pins = get_customer_pins(tenant_id, singletons)
+
+    clustered = []
+    for (cell_x, cell_y), members in cells.items():
+        count = sum(member['count'] for member in members)
+        if count == 1:
+            if members[0]['first_id'] in pins:
+                clustered.append(pins[members[0]['first_id']])
+            continue
+        clustered.append({
+            'type': 'Feature',
+            'id': f'cluster:{zoom}:{cell_x}:{cell_y}',
+            'geometry': {
+                'type': 'Point',
+                'coordinates': [
+                    round(float(sum(member['sum_lng'] for member in members)) / count, 6),
+                    round(float(sum(member['sum_lat'] for member in members)) / count, 6),
+                ],
+            },
+            'properties': {
+                'cluster': True,
+                'count': count,
+                'colors': {member['map_pin_color']: member['count'] for member in members},
+                'bounds': [
+                    float(min(member['min_lng'] for member in members)),
+                    float(min(member['min_lat'] for member in members)),
+                    float(max(member['max_lng'] for member in members)),
+                    float(max(member['max_lat'] for member in members)),
+                ],
+            },
+        })
+    return clustered, True
@@ -0,0 +1,107 @@
+# accounts/dashboard_stats.py
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import CustomUser
+
+# Counters move often, so keep the TTL short; writes also invalidate
+DASHBOARD_STATS_TTL = 60
+
+
+def dashboard_stats_cache_key(tenant_id):
+    return f'isp_dashboard_stats_{tenant_id}'
+
+
+def invalidate_dashboard_stats(tenant_id):
+    if tenant_id:
+        cache.delete(dashboard_stats_cache_key(tenant_id))
+
+
+def _revenue_months(now, count=12):
+    """First day of each of the `count` months ending with last month"""
+    month = (now.replace(day=1) - timedelta(days=1)).replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    )
+    months = []
+    for _ in range(count):
+        months.append(month)
+        month = (month - timedelta(days=1)).replace(day=1)
+    return list(reversed(months))
+
+
+def compute_isp_dashboard_stats(tenant):
+    """
+    Compute ISP dashboard counters and chart series for a tenant.
+    Revenue and the active/overdue/online gauges come from the
+    TenantDailyMetrics rollup; the customer total and the
+    router/device/plan breakdowns are counted from their own tables.
+    """
+    from billing.models import SubscriptionPlan
+    from router_manager.models import Router, Device
+    from . import metrics
+    from .models import TenantDailyMetrics
+
+    now = timezone.now()
+    today = timezone.localdate()
+    gauges = metrics.get_today_metrics(tenant)
+    rollup = TenantDailyMetrics.objects.filter(tenant=tenant)
+
+    total_customers = CustomUser.objects.filter(tenant=tenant, role='customer').count()
+    total_routers = Router.objects.filter(user__tenant=tenant).count()
+
+    device_rows = list(
+        Device.objects.filter(router__user__tenant=tenant)
+        .values('device_type')
+        .annotate(count=Count('id'))
+        .order_by('device_type')
+    )
+
+    monthly_revenue = metrics.revenue_between(today - timedelta(days=30), today, tenant_id=tenant.id)
+
+    months = _revenue_months(now)
+    revenue_by_month = {
+        row['month']: row['total']
+        for row in rollup.filter(date__gte=months[0].date(), date__lt=today.replace(day=1))
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(total=Sum('revenue'))
+        .order_by('month')
+    }
+
+    plan_qs = SubscriptionPlan.objects.filter(tenant=tenant, is_active=True).values('name').annotate(
+        count=Count('id')
+    )
+
+    return {
+        'total_customers': total_customers,
+        'active_customers': gauges.active_customers,
+        'overdue_customers': gauges.overdue_customers,
+        'paid_customers': total_customers - gauges.overdue_customers,
+        'total_routers': total_routers,
+        'online_routers': gauges.online_routers,
+        'total_devices': sum(row['count'] for row in device_rows),
+        'online_devices': gauges.online_devices,
+        'monthly_revenue': monthly_revenue,
+        'device_distribution': {
+            'labels': [row['device_type'].title() if row['device_type'] else 'Unknown' for row in device_rows],
+            'data': [row['count'] for row in device_rows],
+        },
+        'revenue_months': [month.strftime('%b %Y') for month in months],
+        'revenue_series': [float(revenue_by_month.get(month.date(), 0)) for month in months],
+        'plan_labels': [p['name'] for p in plan_qs],
+        'plan_counts': [p['count'] for p in plan_qs],
+    }
+
+
+def get_isp_dashboard_stats(tenant):
+    """Cached wrapper around compute_isp_dashboard_stats"""
+    key = dashboard_stats_cache_key(tenant.id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_isp_dashboard_stats(tenant)
+        cache.set(key, stats, DASHBOARD_STATS_TTL)
+    return stats
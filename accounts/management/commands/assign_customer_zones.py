@@ -0,0 +1,24 @@
+# accounts/management/commands/assign_customer_zones.py
+from django.core.management.base import BaseCommand
+from accounts.models import Tenant
+from accounts.zones import recompute_tenant_zones
+
+class Command(BaseCommand):
+    help = 'Assign customers to service zones by point-in-polygon and recount every zone'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            help='Limit to a single tenant id',
+        )
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.filter(zones__isnull=False).distinct()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+
+        for tenant in tenants.only('id', 'name'):
+            checked, changed = recompute_tenant_zones(tenant.id)
+            self.stdout.write(f'{tenant.name}: {checked} customers checked, {changed} reassigned')
+
+        self.stdout.write(self.style.SUCCESS('Zone assignment completed'))
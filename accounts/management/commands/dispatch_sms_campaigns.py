@@ -0,0 +1,36 @@
+# accounts/management/commands/dispatch_sms_campaigns.py
+import time
+from django.core.management.base import BaseCommand
+from accounts.sms_dispatch import dispatch_pending_campaigns
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Send scheduled bulk SMS campaigns that are due and resume interrupted ones'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for campaigns instead of exiting after one pass',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=15.0,
+            help='Seconds to wait between polls (with --loop)',
+        )
+    
+    def handle(self, *args, **options):
+        while True:
+            ran = dispatch_pending_campaigns()
+            if ran:
+                self.stdout.write(f"Dispatched {ran} SMS campaigns")
+            
+            if not options['loop']:
+                break
+            
+            time.sleep(options['sleep'])
+        
+        self.stdout.write(self.style.SUCCESS("SMS campaign dispatch finished"))
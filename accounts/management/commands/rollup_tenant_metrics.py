@@ -0,0 +1,44 @@
+# accounts/management/commands/rollup_tenant_metrics.py
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.models import Tenant
+from accounts import metrics
+
+class Command(BaseCommand):
+    help = 'Backfill TenantDailyMetrics and refresh today\'s gauges'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Recompute revenue and new-customer counters for the full history',
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=0,
+            help='Recompute counters for the last N days only',
+        )
+        parser.add_argument(
+            '--tenant',
+            help='Limit to a single tenant id',
+        )
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.all()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+
+        since = None
+        if options['days']:
+            since = timezone.localdate() - timedelta(days=options['days'])
+        recompute = options['backfill'] or since is not None
+
+        for tenant in tenants.only('id', 'name'):
+            if recompute:
+                rows = metrics.backfill_counters(tenant.id, since=since)
+                self.stdout.write(f'{tenant.name}: recomputed {rows} daily rows')
+            metrics.refresh_gauges(tenant.id)
+
+        self.stdout.write(self.style.SUCCESS('Tenant metrics rollup completed'))
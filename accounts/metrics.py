@@ -0,0 +1,257 @@
+# accounts/metrics.py
+"""
+Maintenance of the TenantDailyMetrics rollup.
+
+Signals call the track_* helpers with the previous and current state of a
+row; the difference is applied to the tenant's rollup with F() updates.
+rollup_tenant_metrics backfills history and refreshes today's gauges.
+"""
+from datetime import timedelta
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CustomUser, TenantDailyMetrics
+
+GAUGE_FIELDS = ['active_customers', 'overdue_customers', 'online_routers', 'online_devices']
+COUNTER_FIELDS = ['revenue', 'payments_count', 'new_customers']
+
+# Tenants in the middle of a cascading delete; their rollup rows are going away
+deleting_tenants = set()
+
+
+def snapshot_gauges(tenant_id, now=None):
+    """Current gauge values for a tenant, computed from the live tables"""
+    from router_manager.models import Router, Device
+
+    # Attributed by the rows' own tenant, as the track_router / track_device signals do
+    now = now or timezone.now()
+    customers = CustomUser.objects.filter(tenant_id=tenant_id, role='customer').aggregate(
+        active=Count('id', filter=Q(is_active_customer=True)),
+        overdue=Count('id', filter=Q(next_payment_date__lt=now)),
+    )
+    return {
+        'active_customers': customers['active'],
+        'overdue_customers': customers['overdue'],
+        'online_routers': Router.objects.filter(tenant_id=tenant_id, is_online=True).count(),
+        'online_devices': Device.objects.filter(tenant_id=tenant_id, is_online=True).count(),
+    }
+
+
+def _get_row(tenant_id, day):
+    """
+    Return (row, seeded). Today's row is seeded from a gauge snapshot when
+    first created; the snapshot already reflects the write being tracked.
+    """
+    row = TenantDailyMetrics.objects.filter(tenant_id=tenant_id, date=day).first()
+    if row:
+        return row, False
+    defaults = snapshot_gauges(tenant_id) if day == timezone.localdate() else {}
+    row, created = TenantDailyMetrics.objects.get_or_create(
+        tenant_id=tenant_id, date=day, defaults=defaults
+    )
+    return row, created and bool(defaults)
+
+
+def bump(tenant_id, day, **deltas):
+    """Add deltas to a tenant's rollup row for `day`"""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not tenant_id or not deltas or tenant_id in deleting_tenants:
+        return
+    row, seeded = _get_row(tenant_id, day)
+    if seeded:
+        deltas = {field: value for field, value in deltas.items() if field not in GAUGE_FIELDS}
+        if not deltas:
+            return
+    TenantDailyMetrics.objects.filter(pk=row.pk).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + value for field, value in deltas.items()}
+    )
+
+
+def get_today_metrics(tenant):
+    """Today's rollup row for a tenant, created from a snapshot if needed"""
+    row, _ = _get_row(tenant.id, timezone.localdate())
+    return row
+
+
+def _apply(previous, current):
+    """Bump the difference between two {(tenant_id, day): {field: value}} maps"""
+    for key in set(previous) | set(current):
+        before = previous.get(key, {})
+        after = current.get(key, {})
+        deltas = {
+            field: after.get(field, 0) - before.get(field, 0)
+            for field in set(before) | set(after)
+        }
+        bump(key[0], key[1], **deltas)
+
+
+# ---------------------------------------------------------------------------
+# Per-model contributions. Each returns {(tenant_id, day): {field: value}}
+# describing what a row in a given state adds to the rollup.
+# ---------------------------------------------------------------------------
+
+def payment_contribution(state):
+    if not state or state.get('status') != 'completed':
+        return {}
+    if state.get('role') != 'customer' or not state.get('tenant_id'):
+        return {}
+    day = timezone.localdate(state['created_at'])
+    return {(state['tenant_id'], day): {'revenue': state['amount'], 'payments_count': 1}}
+
+
+def customer_contribution(state, include_join=True):
+    if not state or state.get('role') != 'customer' or not state.get('tenant_id'):
+        return {}
+    today = timezone.localdate()
+    next_payment_date = state.get('next_payment_date')
+    gauges = {
+        'active_customers': 1 if state.get('is_active_customer') else 0,
+        'overdue_customers': 1 if next_payment_date and next_payment_date < timezone.now() else 0,
+    }
+    contribution = {(state['tenant_id'], today): gauges}
+    if include_join and state.get('date_joined'):
+        join_key = (state['tenant_id'], timezone.localdate(state['date_joined']))
+        contribution[join_key] = dict(contribution.get(join_key, {}), new_customers=1)
+    return contribution
+
+
+def online_contribution(state, field):
+    if not state or not state.get('tenant_id') or not state.get('is_online'):
+        return {}
+    return {(state['tenant_id'], timezone.localdate()): {field: 1}}
+
+
+def track_payment(previous, current):
+    _apply(payment_contribution(previous), payment_contribution(current))
+
+
+def track_customer(previous, current):
+    # Joining only counts once - on create and delete
+    include_join = previous is None or current is None
+    _apply(
+        customer_contribution(previous, include_join),
+        customer_contribution(current, include_join),
+    )
+
+
+def track_router(previous, current):
+    _apply(online_contribution(previous, 'online_routers'), online_contribution(current, 'online_routers'))
+
+
+def track_device(previous, current):
+    _apply(online_contribution(previous, 'online_devices'), online_contribution(current, 'online_devices'))
+
+
+# ---------------------------------------------------------------------------
+# Backfill / refresh
+# ---------------------------------------------------------------------------
+
+def refresh_gauges(tenant_id):
+    """Overwrite today's gauges from the live tables (corrects drift and
+    picks up customers who became overdue with the passage of time)"""
+    TenantDailyMetrics.objects.update_or_create(
+        tenant_id=tenant_id,
+        date=timezone.localdate(),
+        defaults=snapshot_gauges(tenant_id),
+    )
+
+
+def backfill_counters(tenant_id, since=None):
+    """Recompute additive counters for a tenant from the raw tables"""
+    from billing.models import Payment
+
+    payments = Payment.objects.filter(
+        user__tenant_id=tenant_id, user__role='customer', status='completed'
+    )
+    customers = CustomUser.objects.filter(tenant_id=tenant_id, role='customer')
+    rows = TenantDailyMetrics.objects.filter(tenant_id=tenant_id)
+    if since:
+        payments = payments.filter(created_at__date__gte=since)
+        customers = customers.filter(date_joined__date__gte=since)
+        rows = rows.filter(date__gte=since)
+
+    counters = {}
+    for item in payments.annotate(day=TruncDate('created_at')).values('day').annotate(
+        total=Sum('amount'), count=Count('id')
+    ):
+        counters.setdefault(item['day'], {})
+        counters[item['day']].update(revenue=item['total'], payments_count=item['count'])
+
+    for item in customers.annotate(day=TruncDate('date_joined')).values('day').annotate(count=Count('id')):
+        counters.setdefault(item['day'], {})
+        counters[item['day']]['new_customers'] = item['count']
+
+    existing = {row.date: row for row in rows}
+    to_create, to_update = [], []
+    for day in set(counters) | set(existing):
+        values = counters.get(day, {})
+        row = existing.get(day) or TenantDailyMetrics(tenant_id=tenant_id, date=day)
+        row.revenue = values.get('revenue', 0)
+        row.payments_count = values.get('payments_count', 0)
+        row.new_customers = values.get('new_customers', 0)
+        (to_update if row.pk else to_create).append(row)
+
+    TenantDailyMetrics.objects.bulk_create(to_create, batch_size=500)
+    TenantDailyMetrics.objects.bulk_update(to_update, COUNTER_FIELDS, batch_size=500)
+    return len(to_create) + len(to_update)
+
+
+# ---------------------------------------------------------------------------
+# Readers
+# ---------------------------------------------------------------------------
+
+def daily_series(tenant_id, start, end, field):
+    """{date: value} for a tenant between two dates (inclusive)"""
+    rows = TenantDailyMetrics.objects.filter(
+        tenant_id=tenant_id, date__gte=start, date__lte=end
+    ).values_list('date', field)
+    return dict(rows)
+
+
+def revenue_between(start, end, tenant_id=None):
+    """
+    Rolled-up revenue between two dates (inclusive), optionally per tenant.
+    Revenue is completed payments by customers; see payment_contribution.
+    """
+    rows = TenantDailyMetrics.objects.all()
+    if start:
+        rows = rows.filter(date__gte=start)
+    if end:
+        rows = rows.filter(date__lte=end)
+    if tenant_id:
+        rows = rows.filter(tenant_id=tenant_id)
+    return rows.aggregate(total=Sum('revenue'))['total'] or 0
+
+
+def total_revenue(tenant_id=None):
+    return revenue_between(None, None, tenant_id=tenant_id)
+
+
+def last_days_start(days, today=None):
+    """First date of the `days` day window ending today, inclusive of both ends"""
+    return (today or timezone.localdate()) - timedelta(days=days - 1)
+
+
+def platform_gauges(day=None):
+    """
+    Gauge totals across all tenants for today. Tenants without a row yet
+    (none of their rows has changed today and the rollup cron has not run)
+    get one seeded from a snapshot, as on any first write.
+    """
+    from .models import Tenant
+
+    day = day or timezone.localdate()
+    for tenant_id in Tenant.objects.exclude(daily_metrics__date=day).values_list('id', flat=True):
+        _get_row(tenant_id, day)
+    totals = TenantDailyMetrics.objects.filter(date=day).aggregate(
+        **{field: Sum(field) for field in GAUGE_FIELDS}
+    )
+    return {field: totals[field] or 0 for field in GAUGE_FIELDS}
+
+
+def last_n_days(days, today=None):
+    today = today or timezone.localdate()
+    return [today - timedelta(days=offset) for offset in range(days, 0, -1)]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0023_tenant_address_tenant_description_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenant',
+            name='branding_css',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='branding_css_hash',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
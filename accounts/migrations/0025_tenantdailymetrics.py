@@ -0,0 +1,79 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:48
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def backfill_tenant_metrics(apps, schema_editor):
+    """Build the daily counters from existing payments and customers, and seed today's gauges"""
+    Tenant = apps.get_model('accounts', 'Tenant')
+    CustomUser = apps.get_model('accounts', 'CustomUser')
+    TenantDailyMetrics = apps.get_model('accounts', 'TenantDailyMetrics')
+    Payment = apps.get_model('billing', 'Payment')
+    Router = apps.get_model('router_manager', 'Router')
+    Device = apps.get_model('router_manager', 'Device')
+
+    now = timezone.now()
+    today = timezone.localdate()
+    for tenant_id in Tenant.objects.values_list('id', flat=True):
+        rows = {}
+        for item in Payment.objects.filter(
+            user__tenant_id=tenant_id, user__role='customer', status='completed'
+        ).annotate(day=TruncDate('created_at')).values('day').annotate(total=Sum('amount'), count=Count('id')):
+            rows.setdefault(item['day'], {}).update(revenue=item['total'], payments_count=item['count'])
+
+        customers = CustomUser.objects.filter(tenant_id=tenant_id, role='customer')
+        for item in customers.annotate(day=TruncDate('date_joined')).values('day').annotate(count=Count('id')):
+            rows.setdefault(item['day'], {})['new_customers'] = item['count']
+
+        gauges = customers.aggregate(
+            active_customers=Count('id', filter=Q(is_active_customer=True)),
+            overdue_customers=Count('id', filter=Q(next_payment_date__lt=now)),
+        )
+        gauges['online_routers'] = Router.objects.filter(tenant_id=tenant_id, is_online=True).count()
+        gauges['online_devices'] = Device.objects.filter(tenant_id=tenant_id, is_online=True).count()
+        rows.setdefault(today, {}).update(gauges)
+
+        TenantDailyMetrics.objects.bulk_create([
+            TenantDailyMetrics(tenant_id=tenant_id, date=day, **values) for day, values in rows.items()
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0024_tenant_branding_css'),
+        ('billing', '0026_subscriptionactivation'),
+        ('router_manager', '0008_alter_routerconfig_options_router_router_config_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantDailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('payments_count', models.IntegerField(default=0)),
+                ('new_customers', models.IntegerField(default=0)),
+                ('active_customers', models.IntegerField(default=0)),
+                ('overdue_customers', models.IntegerField(default=0)),
+                ('online_routers', models.IntegerField(default=0)),
+                ('online_devices', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_metrics', to='accounts.tenant')),
+            ],
+            options={
+                'verbose_name': 'Tenant Daily Metrics',
+                'verbose_name_plural': 'Tenant Daily Metrics',
+                'db_table': 'tenant_daily_metrics',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='tenant_dail_date_3c2ad8_idx')],
+                'unique_together': {('tenant', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_tenant_metrics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0025_tenantdailymetrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='service_zone',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='customers', to='accounts.ispzone'),
+        ),
+    ]
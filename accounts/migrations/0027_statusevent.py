@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0026_customuser_service_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('router.online', 'Router Online'), ('router.offline', 'Router Offline'), ('device.joined', 'Device Joined'), ('device.left', 'Device Left'), ('payment.completed', 'Payment Completed')], max_length=30)),
+                ('key', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_events', to='accounts.tenant')),
+            ],
+            options={
+                'db_table': 'status_events',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['tenant', 'id'], name='status_even_tenant__4e3b8e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0027_statusevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulksms',
+            name='dispatch_heartbeat',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='smsproviderconfig',
+            name='max_sms_per_second',
+            field=models.PositiveIntegerField(default=10, help_text='Send rate limit for bulk campaigns'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:31
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+import django.db.models.deletion
+
+
+def backfill_sms_stats(apps, schema_editor):
+    """Build the daily counters from the existing SMS logs"""
+    SMSLog = apps.get_model('accounts', 'SMSLog')
+    SMSDailyStats = apps.get_model('accounts', 'SMSDailyStats')
+    rows = SMSLog.objects.annotate(day=TruncDate(Coalesce('sent_at', 'created_at'))).values('tenant_id', 'day').annotate(
+        sent=Count('id', filter=Q(status__in=['sent', 'delivered'])),
+        failed=Count('id', filter=Q(status='failed')),
+        total_cost=Sum('cost'),
+    )
+    SMSDailyStats.objects.bulk_create([
+        SMSDailyStats(
+            tenant_id=row['tenant_id'], date=row['day'], sent_count=row['sent'],
+            failed_count=row['failed'], cost=row['total_cost'] or 0,
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0028_bulksms_dispatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('sent_count', models.IntegerField(default=0)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'SMS Daily Stats',
+                'verbose_name_plural': 'SMS Daily Stats',
+                'db_table': 'sms_daily_stats',
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='smslog',
+            index=models.Index(fields=['tenant', '-id'], name='accounts_sm_tenant__6c19be_idx'),
+        ),
+        migrations.AddField(
+            model_name='smsdailystats',
+            name='tenant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sms_daily_stats', to='accounts.tenant'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='smsdailystats',
+            unique_together={('tenant', 'date')},
+        ),
+        migrations.RunPython(backfill_sms_stats, migrations.RunPython.noop),
+    ]
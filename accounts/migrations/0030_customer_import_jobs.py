@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0029_sms_daily_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('file_type', models.CharField(default='csv', max_length=10)),
+                ('status', models.CharField(choices=[('staged', 'Staged'), ('queued', 'Queued'), ('importing', 'Importing'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='staged', max_length=20)),
+                ('options', models.JSONField(blank=True, default=dict)),
+                ('total_rows', models.IntegerField(default=0)),
+                ('valid_rows', models.IntegerField(default=0)),
+                ('invalid_rows', models.IntegerField(default=0)),
+                ('processed_rows', models.IntegerField(default=0)),
+                ('imported_rows', models.IntegerField(default=0)),
+                ('failed_rows', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='customer_import_jobs', to=settings.AUTH_USER_MODEL)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='customer_import_jobs', to='accounts.tenant')),
+            ],
+            options={
+                'db_table': 'customer_import_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CustomerImportRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('row_number', models.IntegerField()),
+                ('data', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('valid', 'Valid'), ('invalid', 'Invalid'), ('imported', 'Imported'), ('failed', 'Failed')], default='valid', max_length=20)),
+                ('error', models.TextField(blank=True)),
+                ('password', models.CharField(blank=True, max_length=128)),
+                ('customer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='accounts.customerimportjob')),
+            ],
+            options={
+                'db_table': 'customer_import_rows',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['job', 'status', 'id'], name='customer_im_job_id_8345f1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0030_customer_import_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bulksms',
+            name='dispatch_token',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:22
+
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+
+def seed_heartbeats(apps, schema_editor):
+    """Unfinished jobs get a heartbeat so stale-job expiry can reach them"""
+    CustomerImportJob = apps.get_model('accounts', 'CustomerImportJob')
+    CustomerImportJob.objects.filter(status__in=['queued', 'importing']).update(
+        heartbeat_at=Coalesce(F('started_at'), F('created_at'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0031_bulksms_dispatch_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerimportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(seed_heartbeats, migrations.RunPython.noop),
+    ]
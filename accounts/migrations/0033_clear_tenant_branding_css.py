@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def clear_branding_css(apps, schema_editor):
+    """Stylesheets compiled before the overrides were scoped; rebuilt on next use"""
+    Tenant = apps.get_model('accounts', 'Tenant')
+    Tenant.objects.exclude(branding_css_hash='').update(branding_css='', branding_css_hash='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0032_customerimportjob_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_branding_css, migrations.RunPython.noop),
+    ]
@@ -9,6 +9,8 @@ import re
 from decimal import Decimal
 from django.conf import settings
 from datetime import timezone
+from django.urls import reverse
+from .branding import BRANDING_FIELDS, compile_tenant_branding
 
 class Tenant(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -34,6 +36,10 @@ class Tenant(models.Model):
     error_color = models.CharField(max_length=7, default='#ef4444')
     info_color = models.CharField(max_length=7, default='#3b82f6')
 
+    # Compiled branding stylesheet, rebuilt on save and served by content hash
+    branding_css = models.TextField(blank=True, editable=False)
+    branding_css_hash = models.CharField(max_length=16, blank=True, editable=False)
+
     # ISP Settings
     bandwidth_limit = models.IntegerField(default=1000)
     client_limit = models.IntegerField(default=1000)
@@ -115,8 +121,22 @@ class Tenant(models.Model):
         if self.is_verified and not self.verification_date:
             self.verification_date = tz.now()
         
+        # Recompile branding stylesheet when colours change
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(BRANDING_FIELDS):
+            previous_hash = self.branding_css_hash
+            compile_tenant_branding(self)
+            if update_fields is not None and self.branding_css_hash != previous_hash:
+                kwargs['update_fields'] = list(update_fields) + ['branding_css', 'branding_css_hash']
+        
         super().save(*args, **kwargs)
 
+    @property
+    def branding_css_url(self):
+        if not self.branding_css_hash:
+            return None
+        return reverse('tenant_branding_css', args=[self.id, self.branding_css_hash])
+
     @property
     def primary_domain(self):
         if self.custom_domain:
@@ -297,6 +317,15 @@ class CustomUser(AbstractUser):
     geocoded_address = models.TextField(blank=True)
     geocoded_at = models.DateTimeField(null=True, blank=True)
     
+    # Service zone containing the customer's coordinates (see accounts/zones.py)
+    service_zone = models.ForeignKey(
+        'ISPZone',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='customers'
+    )
+    
     class Meta:
         db_table = 'custom_users'
         unique_together = [['tenant', 'company_account_number']]
@@ -515,15 +544,9 @@ class ISPZone(models.Model):
         return f"{self.tenant.name} - {self.name}"
     
     def update_customer_count(self):
-        """Update customer count in this zone"""
-        count = CustomUser.objects.filter(
-            tenant=self.tenant,
-            role='customer',
-            latitude__range=(self.min_lat, self.max_lat),
-            longitude__range=(self.min_lng, self.max_lng)
-        ).count()
-        self.customer_count = count
-        self.save()
+        """Update customer count in this zone from point-in-polygon assignments"""
+        self.customer_count = self.customers.filter(role='customer').count()
+        self.save(update_fields=['customer_count'])
 
 
 class LoginActivity(models.Model):
@@ -732,6 +755,10 @@ class BulkSMS(models.Model):
     sent_count = models.IntegerField(default=0)
     failed_count = models.IntegerField(default=0)
     total_recipients = models.IntegerField(default=0)
+    # Refreshed by the dispatcher while it sends; a stale value lets another worker resume
+    dispatch_heartbeat = models.DateTimeField(null=True, blank=True)
+    # Set by the dispatcher that holds the lease; renewals only succeed while it still matches
+    dispatch_token = models.CharField(max_length=32, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -771,11 +798,36 @@ class SMSLog(models.Model):
         indexes = [
             models.Index(fields=['customer', 'status']),
             models.Index(fields=['sent_at']),
+            # Keyset pagination of a tenant's log, newest first
+            models.Index(fields=['tenant', '-id']),
         ]
     
     def __str__(self):
         return f"SMS to {self.customer.username} - {self.status}"
 
+class SMSDailyStats(models.Model):
+    """
+    Per-tenant, per-day SMS counters. The campaign dispatcher adds each
+    chunk's outcome with F() updates, so dashboards read a few rows
+    instead of aggregating the whole SMSLog table.
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='sms_daily_stats')
+    date = models.DateField()
+    sent_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'sms_daily_stats'
+        ordering = ['-date']
+        unique_together = [['tenant', 'date']]
+        verbose_name = 'SMS Daily Stats'
+        verbose_name_plural = 'SMS Daily Stats'
+    
+    def __str__(self):
+        return f"{self.tenant.name} - {self.date}"
+
 class SMSProviderConfig(models.Model):
     """Configuration for SMS providers"""
     PROVIDERS = [
@@ -798,6 +850,7 @@ class SMSProviderConfig(models.Model):
     
     # Rate limiting
     max_sms_per_day = models.IntegerField(default=1000)
+    max_sms_per_second = models.PositiveIntegerField(default=10, help_text="Send rate limit for bulk campaigns")
     sms_sent_today = models.IntegerField(default=0)
     last_reset_date = models.DateField(auto_now_add=True)
     
@@ -812,7 +865,7 @@ class SMSProviderConfig(models.Model):
     
     def reset_daily_count(self):
         """Reset daily SMS count if it's a new day"""
-        today = timezone.now().date()
+        today = tz.now().date()
         if self.last_reset_date != today:
             self.sms_sent_today = 0
             self.last_reset_date = today
@@ -878,4 +931,149 @@ class ActivityLog(models.Model):
         verbose_name_plural = 'Activity Logs'
     
     def __str__(self):
-        return f"{self.user.username if self.user else 'System'} - {self.action} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"{self.user.username if self.user else 'System'} - {self.action} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+class TenantDailyMetrics(models.Model):
+    """
+    Per-tenant, per-day rollup read by the dashboards.
+    Revenue and new customers are additive counters kept up to date by
+    write-path signals; the remaining fields are end-of-day gauges that
+    signals adjust on state flips and rollup_tenant_metrics refreshes.
+    """
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='daily_metrics')
+    date = models.DateField()
+    
+    # Additive counters
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    payments_count = models.IntegerField(default=0)
+    new_customers = models.IntegerField(default=0)
+    
+    # Gauges
+    active_customers = models.IntegerField(default=0)
+    overdue_customers = models.IntegerField(default=0)
+    online_routers = models.IntegerField(default=0)
+    online_devices = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'tenant_daily_metrics'
+        ordering = ['-date']
+        unique_together = [['tenant', 'date']]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+        verbose_name = 'Tenant Daily Metrics'
+        verbose_name_plural = 'Tenant Daily Metrics'
+    
+    def __str__(self):
+        return f"{self.tenant.name} - {self.date}"
+
+
+class StatusEvent(models.Model):
+    """
+    Status delta pushed to ISP dashboards over WebSocket. Rows are kept
+    for a day so reconnecting clients can fetch what they missed by id.
+    """
+    EVENT_TYPES = [
+        ('router.online', 'Router Online'),
+        ('router.offline', 'Router Offline'),
+        ('device.joined', 'Device Joined'),
+        ('device.left', 'Device Left'),
+        ('payment.completed', 'Payment Completed'),
+    ]
+    
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='status_events')
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES)
+    # What the delta is about, e.g. "router:12"; coalescing keeps the latest event per key
+    key = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        db_table = 'status_events'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['tenant', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} {self.key}"
+
+
+class CustomerImportJob(models.Model):
+    """
+    A customer upload staged row by row in CustomerImportRow. The session
+    only holds the job id; preview, validation and the import itself read
+    the staged rows in pages.
+    """
+    STATUS_CHOICES = [
+        ('staged', 'Staged'),
+        ('queued', 'Queued'),
+        ('importing', 'Importing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='customer_import_jobs')
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, related_name='customer_import_jobs')
+    file_name = models.CharField(max_length=255, blank=True)
+    file_type = models.CharField(max_length=10, default='csv')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='staged')
+    # default_plan_id, generate_passwords, send_welcome_email, auto_activate
+    options = models.JSONField(default=dict, blank=True)
+    
+    total_rows = models.IntegerField(default=0)
+    valid_rows = models.IntegerField(default=0)
+    invalid_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    imported_rows = models.IntegerField(default=0)
+    failed_rows = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Touched when the job is queued, claimed and after every batch
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'customer_import_jobs'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Import #{self.id} {self.file_name} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        return round(self.processed_rows * 100 / self.valid_rows) if self.valid_rows else 100
+
+
+class CustomerImportRow(models.Model):
+    """One staged line of a CustomerImportJob"""
+    STATUS_CHOICES = [
+        ('valid', 'Valid'),
+        ('invalid', 'Invalid'),
+        ('imported', 'Imported'),
+        ('failed', 'Failed'),
+    ]
+    
+    job = models.ForeignKey(CustomerImportJob, on_delete=models.CASCADE, related_name='rows')
+    row_number = models.IntegerField()
+    data = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='valid')
+    error = models.TextField(blank=True)
+    customer = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Generated password shown once on the results page; cleared with the job
+    password = models.CharField(max_length=128, blank=True)
+    
+    class Meta:
+        db_table = 'customer_import_rows'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['job', 'status', 'id']),
+        ]
+    
+    def __str__(self):
+        return f"Import #{self.job_id} row {self.row_number}"
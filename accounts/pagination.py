@@ -0,0 +1,103 @@
+# accounts/pagination.py
+"""
+Keyset (seek) pagination.
+
+Instead of OFFSET, each page starts strictly after (or before) the row
+whose primary key is passed as the cursor, so deep pages cost the same
+as the first one. The ordering must end with a unique field (normally
+'-id' or 'id').
+"""
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of results plus the cursors to move either way"""
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        return self.object_list[-1].pk if self.has_next and self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return self.object_list[0].pk if self.has_previous and self.object_list else None
+
+
+def _parse_ordering(ordering):
+    return [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+
+
+def _seek_filter(fields, values, forward):
+    """
+    Rows that come after `values` in the given ordering (or before when
+    forward is False): (a < x) OR (a = x AND b < y) OR ...
+    """
+    condition = Q()
+    for index, (name, descending) in enumerate(fields):
+        lookup = 'lt' if descending == forward else 'gt'
+        clause = Q(**{f'{name}__{lookup}': values[name]})
+        for previous_name, _ in fields[:index]:
+            clause &= Q(**{previous_name: values[previous_name]})
+        condition |= clause
+    return condition
+
+
+def _parse_cursor(model, cursor):
+    """The cursor as a primary key value, or None when it isn't a valid one"""
+    pk = model._meta.pk
+    try:
+        value = pk.to_python(cursor)
+        pk.run_validators(value)
+    except (ValidationError, TypeError, ValueError):
+        return None
+    # Not every backend bounds integer fields; anything beyond 64 bits can't match a row
+    if isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63:
+        return None
+    return value
+
+
+def keyset_paginate(queryset, ordering, after=None, before=None, page_size=25):
+    """
+    Return a KeysetPage of `queryset` ordered by `ordering`.
+    `after` / `before` are primary keys taken from a previous page's
+    next_cursor / previous_cursor; an unknown or malformed cursor yields
+    the first page.
+    """
+    fields = _parse_ordering(ordering)
+    names = [name for name, _ in fields]
+    cursor = after or before
+    forward = not before
+
+    anchor = None
+    cursor = _parse_cursor(queryset.model, cursor) if cursor else None
+    if cursor is not None:
+        anchor = queryset.model._default_manager.filter(pk=cursor).values(*names).first()
+
+    if anchor is None:
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        return KeysetPage(rows[:page_size], len(rows) > page_size, False)
+
+    page_qs = queryset.filter(_seek_filter(fields, anchor, forward))
+    if forward:
+        rows = list(page_qs.order_by(*ordering)[:page_size + 1])
+        return KeysetPage(rows[:page_size], len(rows) > page_size, True)
+
+    reverse_ordering = [name if descending else f'-{name}' for name, descending in fields]
+    rows = list(page_qs.order_by(*reverse_ordering)[:page_size + 1])
+    has_previous = len(rows) > page_size
+    return KeysetPage(list(reversed(rows[:page_size])), True, has_previous)
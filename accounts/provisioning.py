@@ -0,0 +1,228 @@
+# accounts/provisioning.py
+"""
+Bulk customer provisioning.
+
+Creating customers one at a time is dominated by password hashing:
+create_user() runs a full PBKDF2 hash per account. It also pays for an
+exists() check, CustomUser.save() and a Subscription insert each time.
+bulk_provision_customers() instead:
+
+1. hashes every password in a process pool, before any transaction
+   opens;
+2. generates account numbers in memory, in the format
+   CustomUser.save() uses, checked for uniqueness in one query;
+3. inserts users and their subscriptions with bulk_create in chunks of
+   PROVISION_CHUNK, inside one transaction.
+
+bulk_create() skips the post_save receivers in accounts.signals.
+record_new_customers() applies their metrics rollup and dashboard cache
+updates for the whole batch.
+"""
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from . import metrics
+from .dashboard_stats import invalidate_dashboard_stats
+from .models import CustomUser
+
+# Rows per INSERT
+PROVISION_CHUNK = 500
+# Smaller batches are hashed in-process; starting the pool costs more than it saves
+MIN_POOL_PASSWORDS = 16
+# Each pool worker is a full Django process; settings.PASSWORD_HASH_WORKERS overrides
+DEFAULT_HASH_WORKERS = 2
+CGROUP_CPU_LIMITS = [
+    ('/sys/fs/cgroup/cpu.max', None),
+    ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', '/sys/fs/cgroup/cpu/cpu.cfs_period_us'),
+]
+
+
+def _read_cgroup_quota():
+    """CPUs allowed by a cgroup v2 or v1 CPU quota, or None when unlimited or unknown"""
+    for quota_path, period_path in CGROUP_CPU_LIMITS:
+        try:
+            with open(quota_path) as f:
+                values = f.read().split()
+            if period_path:
+                with open(period_path) as f:
+                    values.append(f.read().strip())
+        except OSError:
+            continue
+        try:
+            quota, period = int(values[0]), int(values[1])
+        except (IndexError, ValueError):
+            # "max" (v2) means no quota
+            return None
+        return max(1, quota // period) if quota > 0 and period > 0 else None
+    return None
+
+
+def available_cpus():
+    """CPUs this process may run on: its affinity mask, capped by the container's CPU quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _read_cgroup_quota()
+    return min(cpus, quota) if quota else cpus
+
+
+def hash_worker_count(count):
+    """Pool size for hashing `count` passwords"""
+    configured = getattr(settings, 'PASSWORD_HASH_WORKERS', DEFAULT_HASH_WORKERS)
+    return max(1, min(configured, available_cpus(), count))
+
+
+def _hash_worker_init():
+    import django
+    django.setup()
+
+
+@contextmanager
+def password_hasher(count):
+    """
+    Yields a function that hashes a list of passwords. For `count` of
+    MIN_POOL_PASSWORDS or more it runs on a process pool, which is kept
+    for the whole with-block so batches can share it.
+    """
+    workers = hash_worker_count(count)
+    if workers < 2 or count < MIN_POOL_PASSWORDS:
+        yield hash_passwords
+        return
+    # Spawned rather than forked: the web process runs threads whose locks a fork would copy
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_hash_worker_init,
+    ) as pool:
+        yield lambda passwords: list(
+            pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4)))
+        )
+
+
+def hash_passwords(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def existing_usernames(usernames):
+    """The subset of `usernames` that are already taken"""
+    usernames = list(usernames)
+    taken = set()
+    for start in range(0, len(usernames), PROVISION_CHUNK):
+        taken.update(CustomUser.objects.filter(
+            username__in=usernames[start:start + PROVISION_CHUNK]
+        ).values_list('username', flat=True))
+    return taken
+
+
+def account_number_prefix(tenant):
+    return tenant.subdomain.upper()[:6] if tenant else "USER"
+
+
+def generate_account_numbers(tenant, count):
+    """`count` account numbers that are unused in the tenant and distinct from each other"""
+    prefix = account_number_prefix(tenant)
+    numbers = set()
+    while len(numbers) < count:
+        candidates = {f"{prefix}{uuid.uuid4().hex[:8].upper()}" for _ in range(count - len(numbers))}
+        taken = set(CustomUser.objects.filter(
+            tenant=tenant, company_account_number__in=candidates
+        ).values_list('company_account_number', flat=True))
+        numbers |= candidates - taken
+    return list(numbers)
+
+
+def build_customer(tenant, fields, password_hash, account_number, plan=None, auto_activate=False,
+                   approved_by=None, now=None):
+    """Unsaved customer with everything create_user() and CustomUser.save() would have set"""
+    now = now or timezone.now()
+    return CustomUser(
+        password=password_hash,
+        tenant=tenant,
+        role='customer',
+        company_account_number=account_number,
+        is_active_customer=auto_activate,
+        registration_status='approved' if auto_activate else 'pending',
+        registration_date=now,
+        approval_date=now if auto_activate else None,
+        approved_by=approved_by if auto_activate else None,
+        next_payment_date=now + timezone.timedelta(days=plan.duration_days) if plan and auto_activate else None,
+        **fields
+    )
+
+
+def insert_customers(customers, plan=None):
+    """bulk_create customers and, with a plan, their subscriptions. The caller owns the transaction."""
+    from billing.models import Subscription
+
+    for start in range(0, len(customers), PROVISION_CHUNK):
+        CustomUser.objects.bulk_create(customers[start:start + PROVISION_CHUNK])
+    if plan:
+        now = timezone.now()
+        Subscription.objects.bulk_create([
+            Subscription(
+                user=customer,
+                plan=plan,
+                is_active=customer.is_active_customer,
+                start_date=now,
+                end_date=now + timezone.timedelta(days=plan.duration_days),
+            )
+            for customer in customers
+        ], batch_size=PROVISION_CHUNK)
+
+
+def bulk_provision_customers(tenant, accounts, plan=None, auto_activate=False, approved_by=None):
+    """
+    Create customers for `accounts`, a list of dicts with a username,
+    a plain-text password and optionally email, phone, first_name,
+    last_name and address. Usernames must already be free (see
+    existing_usernames). Returns the created customers.
+    """
+    if not accounts:
+        return []
+    with password_hasher(len(accounts)) as hash_batch:
+        password_hashes = hash_batch([account['password'] for account in accounts])
+    account_numbers = generate_account_numbers(tenant, len(accounts))
+    now = timezone.now()
+    customers = [
+        build_customer(
+            tenant,
+            {field: value for field, value in account.items() if field != 'password'},
+            password_hash,
+            account_number,
+            plan=plan,
+            auto_activate=auto_activate,
+            approved_by=approved_by,
+            now=now,
+        )
+        for account, password_hash, account_number in zip(accounts, password_hashes, account_numbers)
+    ]
+    with transaction.atomic():
+        insert_customers(customers, plan)
+        record_new_customers(tenant.id, customers)
+    return customers
+
+
+def record_new_customers(tenant_id, customers):
+    """Roll up bulk-created customers the way track_customer_save would, one update per batch"""
+    if not customers:
+        return
+    invalidate_dashboard_stats(tenant_id)
+    now = timezone.now()
+    metrics.bump(
+        tenant_id,
+        timezone.localdate(),
+        new_customers=len(customers),
+        active_customers=sum(1 for customer in customers if customer.is_active_customer),
+        overdue_customers=sum(
+            1 for customer in customers if customer.next_payment_date and customer.next_payment_date < now
+        ),
+    )
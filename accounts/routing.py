@@ -0,0 +1,9 @@
+# accounts/routing.py
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/map/', consumers.MapConsumer.as_asgi()),
+    path('ws/status/', consumers.StatusConsumer.as_asgi()),
+]
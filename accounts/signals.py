@@ -0,0 +1,214 @@
+# accounts/signals.py
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+import logging
+
+from .models import Tenant, CustomUser, ISPZone
+from .tenant_cache import tenant_cache
+from .dashboard_stats import invalidate_dashboard_stats
+from .customer_map import invalidate_customer_pins
+from . import zones
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Tenant)
+@receiver(post_delete, sender=Tenant)
+def invalidate_tenant_resolution(sender, instance, **kwargs):
+    """
+    Drop cached host lookups for a tenant whenever it changes
+    """
+    tenant_cache.invalidate_tenant(instance)
+    logger.debug(f"Invalidated tenant resolution cache for {instance.subdomain}")
+
+
+@receiver(pre_delete, sender=Tenant)
+def suspend_tenant_metrics(sender, instance, **kwargs):
+    metrics.deleting_tenants.add(instance.pk)
+
+
+@receiver(post_delete, sender=Tenant)
+def resume_tenant_metrics(sender, instance, **kwargs):
+    metrics.deleting_tenants.discard(instance.pk)
+
+
+def _customer_state(user_id):
+    return CustomUser.objects.filter(pk=user_id).values(
+        'tenant_id', 'role', 'is_active_customer', 'next_payment_date', 'date_joined',
+        'latitude', 'longitude', 'service_zone_id',
+    ).first()
+
+
+def _instance_state(instance, fields):
+    return {field: getattr(instance, field) for field in fields}
+
+
+CUSTOMER_FIELDS = ['tenant_id', 'role', 'is_active_customer', 'next_payment_date', 'date_joined']
+ONLINE_FIELDS = ['tenant_id', 'is_online']
+
+
+def refresh_map_pins(tenant_id, customer_ids):
+    """Drop the touched customers' cached map pins once the write is committed"""
+    transaction.on_commit(lambda: invalidate_customer_pins(tenant_id, customer_ids))
+
+
+# Remember the stored state of tracked rows so post_save can roll up the difference
+
+@receiver(pre_save, sender=CustomUser)
+def remember_customer_state(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._metrics_previous = _customer_state(instance.pk)
+
+
+@receiver(pre_save, sender='billing.Payment')
+def remember_payment_state(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._metrics_previous = sender.objects.filter(pk=instance.pk).values(
+            'status', 'amount', 'created_at',
+            tenant_id=F('user__tenant_id'), role=F('user__role'),
+        ).first()
+
+
+@receiver(pre_save, sender='router_manager.Router')
+@receiver(pre_save, sender='router_manager.Device')
+def remember_online_state(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._metrics_previous = sender.objects.filter(pk=instance.pk).values(*ONLINE_FIELDS).first()
+
+
+@receiver(post_save, sender=CustomUser)
+def track_customer_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_dashboard_stats(instance.tenant_id)
+    previous = None if created else getattr(instance, '_metrics_previous', None)
+    metrics.track_customer(previous, _instance_state(instance, CUSTOMER_FIELDS))
+    if instance.role == 'customer':
+        refresh_map_pins(instance.tenant_id, [instance.pk])
+        _reassign_zone(instance, previous)
+
+
+def _reassign_zone(instance, previous):
+    """
+    Re-run point-in-polygon when coordinates move (CustomerLocation.save
+    writes them through to the customer) or a stale instance overwrote
+    the stored zone.
+    """
+    previous = previous or {}
+    current = _instance_state(instance, ['latitude', 'longitude', 'service_zone_id'])
+    if previous and all(previous.get(field) == value for field, value in current.items()):
+        return
+    if not previous and instance.latitude is None and instance.service_zone_id is None:
+        return
+    counted_zone_id = previous.get('service_zone_id')
+    transaction.on_commit(lambda: zones.assign_customer(instance, counted_zone_id))
+
+
+@receiver(post_delete, sender=CustomUser)
+def track_customer_delete(sender, instance, **kwargs):
+    invalidate_dashboard_stats(instance.tenant_id)
+    metrics.track_customer(_instance_state(instance, CUSTOMER_FIELDS), None)
+    if instance.role == 'customer':
+        refresh_map_pins(instance.tenant_id, [instance.pk])
+        if instance.service_zone_id:
+            zone_id = instance.service_zone_id
+            transaction.on_commit(lambda: zones.recount_zones([zone_id]))
+
+
+def _payment_state(instance):
+    user = _customer_state(instance.user_id) or {}
+    return {
+        'status': instance.status,
+        'amount': instance.amount,
+        'created_at': instance.created_at,
+        'tenant_id': user.get('tenant_id'),
+        'role': user.get('role'),
+    }
+
+
+@receiver(post_save, sender='billing.Payment')
+def track_payment_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    current = _payment_state(instance)
+    invalidate_dashboard_stats(current['tenant_id'])
+    previous = None if created else getattr(instance, '_metrics_previous', None)
+    metrics.track_payment(previous, current)
+    refresh_map_pins(current['tenant_id'], [instance.user_id])
+
+
+@receiver(post_delete, sender='billing.Payment')
+def track_payment_delete(sender, instance, **kwargs):
+    previous = _payment_state(instance)
+    invalidate_dashboard_stats(previous['tenant_id'])
+    metrics.track_payment(previous, None)
+
+
+@receiver(post_save, sender='router_manager.Router')
+def track_router_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_dashboard_stats(instance.tenant_id)
+    previous = None if created else getattr(instance, '_metrics_previous', None)
+    metrics.track_router(previous, _instance_state(instance, ONLINE_FIELDS))
+    refresh_map_pins(instance.tenant_id, [instance.user_id])
+
+
+@receiver(post_delete, sender='router_manager.Router')
+def track_router_delete(sender, instance, **kwargs):
+    invalidate_dashboard_stats(instance.tenant_id)
+    metrics.track_router(_instance_state(instance, ONLINE_FIELDS), None)
+    refresh_map_pins(instance.tenant_id, [instance.user_id])
+
+
+@receiver(post_save, sender='router_manager.Device')
+def track_device_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_dashboard_stats(instance.tenant_id)
+    previous = None if created else getattr(instance, '_metrics_previous', None)
+    current = _instance_state(instance, ONLINE_FIELDS)
+    metrics.track_device(previous, current)
+    if (previous or {}).get('is_online', False) != current['is_online']:
+        refresh_map_pins(instance.tenant_id, [_router_owner(instance.router_id)])
+
+
+@receiver(post_delete, sender='router_manager.Device')
+def track_device_delete(sender, instance, **kwargs):
+    invalidate_dashboard_stats(instance.tenant_id)
+    metrics.track_device(_instance_state(instance, ONLINE_FIELDS), None)
+    if instance.is_online:
+        refresh_map_pins(instance.tenant_id, [_router_owner(instance.router_id)])
+
+
+def _router_owner(router_id):
+    from router_manager.models import Router
+    return Router.objects.filter(pk=router_id).values_list('user_id', flat=True).first()
+
+
+@receiver(post_save, sender='billing.Subscription')
+@receiver(post_delete, sender='billing.Subscription')
+def refresh_subscription_pin(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    user = _customer_state(instance.user_id)
+    if user and user['role'] == 'customer':
+        refresh_map_pins(user['tenant_id'], [instance.user_id])
+
+
+@receiver(post_save, sender=ISPZone)
+def reassign_zone_customers(sender, instance, raw=False, update_fields=None, **kwargs):
+    """A zone's shape or status changed: re-run assignment for its tenant"""
+    if raw or (update_fields and set(update_fields) <= {'customer_count'}):
+        return
+    tenant_id = instance.tenant_id
+    transaction.on_commit(lambda: zones.recompute_tenant_zones(tenant_id))
+
+
+@receiver(post_delete, sender=ISPZone)
+def reassign_deleted_zone_customers(sender, instance, **kwargs):
+    tenant_id = instance.tenant_id
+    transaction.on_commit(lambda: zones.recompute_tenant_zones(tenant_id))
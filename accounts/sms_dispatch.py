@@ -0,0 +1,380 @@
+# accounts/sms_dispatch.py
+"""
+Bulk SMS campaign dispatcher.
+
+Campaigns are sent outside the request: queue_campaign() marks a campaign
+as sending and starts dispatch_campaign() on a thread once the row is
+committed. The dispatch_sms_campaigns worker picks up scheduled campaigns
+that are due and resumes any whose dispatcher stopped heartbeating.
+
+A campaign is claimed by writing a fresh dispatch_token and heartbeat,
+so only one dispatcher sends it at a time. The holder renews the
+heartbeat from the send loop, at most every RENEW_SECONDS, and every
+renewal compares the token in the UPDATE. A dispatcher whose lease was
+taken over stops before its next send. Chunks are sized from the
+provider's rate so that one chunk takes well under a lease.
+Recipients are processed in chunks:
+
+1. Every chunk's SMSLog rows are bulk-created as 'pending' before
+   anything is sent. These rows are the checkpoint: a resumed run skips
+   every recipient that already has a log. Pending rows left behind by a
+   crash are marked failed instead of being re-sent.
+2. Recipients that get the same text are batched into one Africa's
+   Talking request. Other providers send one message per call.
+3. Sends run on a bounded thread pool. A token bucket per
+   SMSProviderConfig (max_sms_per_second) paces them.
+4. Outcomes are written back with one bulk_update per chunk, only to
+   logs that are still pending. A dispatcher that lost its lease never
+   overwrites what the new holder recorded, and counts only what it
+   wrote.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import BulkSMS, SMSLog, SMSProviderConfig
+from .sms_service import SMSService, record_sms_outcomes
+from .sms_templates import compile_message
+
+logger = logging.getLogger(__name__)
+
+# Recipients handled per checkpoint, at most
+CHUNK_SIZE = 500
+# Recipients per Africa's Talking request (also capped by the provider's burst size)
+AT_BATCH_SIZE = 100
+# A sending campaign whose heartbeat is older than this is resumed by the worker
+LEASE_SECONDS = 120
+# How often the dispatcher renews its heartbeat while sending
+RENEW_SECONDS = LEASE_SECONDS / 4
+
+LOG_RESULT_FIELDS = ['status', 'status_message', 'cost', 'provider_reference', 'sent_at']
+
+
+class TokenBucket:
+    """Allows `rate` messages per second on average, in bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = max(float(rate), 0.1)
+        self.capacity = capacity or max(int(self.rate), 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, count=1):
+        """Block until `count` tokens (at most one burst) are available and take them"""
+        count = min(count, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= count:
+                    self.tokens -= count
+                    return
+                wait = (count - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def provider_bucket(provider_config):
+    """Shared token bucket for a provider config, rebuilt when its rate changes"""
+    rate = provider_config.max_sms_per_second or 1
+    with _buckets_lock:
+        bucket = _buckets.get(provider_config.pk)
+        if bucket is None or bucket.rate != float(rate):
+            bucket = _buckets[provider_config.pk] = TokenBucket(rate)
+        return bucket
+
+
+class CampaignLease:
+    """A dispatcher's hold on a campaign, renewed only while its token is still the campaign's"""
+
+    def __init__(self, campaign_id, token):
+        self.campaign_id = campaign_id
+        self.token = token
+        self.lost = False
+        self._renewed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def renew(self, force=False):
+        """Refresh the heartbeat (at most every RENEW_SECONDS unless forced). Returns False once lost."""
+        with self._lock:
+            if self.lost:
+                return False
+            if not force and time.monotonic() - self._renewed < RENEW_SECONDS:
+                return True
+            renewed = BulkSMS.objects.filter(
+                pk=self.campaign_id, status='sending', dispatch_token=self.token
+            ).update(dispatch_heartbeat=timezone.now())
+            self._renewed = time.monotonic()
+            if not renewed:
+                self.lost = True
+                logger.warning(f"Bulk SMS campaign {self.campaign_id}: lease lost, stopping this dispatcher")
+            return not self.lost
+
+
+def queue_campaign(campaign):
+    """Mark a campaign for sending and start it once the current transaction commits"""
+    BulkSMS.objects.filter(pk=campaign.pk).update(status='sending', dispatch_heartbeat=None, dispatch_token='')
+    campaign.status = 'sending'
+    thread = threading.Thread(
+        target=_dispatch_in_thread, args=(campaign.pk,), daemon=True, name=f"BulkSMS-{campaign.pk}"
+    )
+    transaction.on_commit(thread.start)
+
+
+def _dispatch_in_thread(campaign_id):
+    close_old_connections()
+    try:
+        dispatch_campaign(campaign_id)
+    except Exception as e:
+        logger.error(f"Bulk SMS campaign {campaign_id} crashed: {e}")
+    finally:
+        close_old_connections()
+
+
+def _claim(campaign_id):
+    """
+    Take the campaign's lease. Returns (campaign, CampaignLease), or
+    (None, None) when someone else holds it.
+    """
+    now = timezone.now()
+    stale_before = now - timezone.timedelta(seconds=LEASE_SECONDS)
+    claimable = (
+        Q(status='sending') & (Q(dispatch_heartbeat__isnull=True) | Q(dispatch_heartbeat__lt=stale_before))
+    ) | Q(status='scheduled', scheduled_time__lte=now)
+    token = uuid.uuid4().hex
+    claimed = BulkSMS.objects.filter(claimable, pk=campaign_id).update(
+        status='sending', dispatch_heartbeat=now, dispatch_token=token, sent_at=now
+    )
+    if not claimed:
+        return None, None
+    return BulkSMS.objects.get(pk=campaign_id), CampaignLease(campaign_id, token)
+
+
+def dispatch_campaign(campaign_id):
+    """Send (or resume) a campaign. Returns (success, message)."""
+    campaign, lease = _claim(campaign_id)
+    if campaign is None:
+        return False, "Campaign is already being sent or is not ready"
+
+    provider_config = SMSProviderConfig.objects.filter(tenant=campaign.tenant_id, is_active=True).first()
+    if not provider_config:
+        BulkSMS.objects.filter(pk=campaign.pk).update(status='failed')
+        return False, "No active SMS provider configured"
+
+    # Pending logs from a run that died mid-chunk: their outcome is unknown, so never re-send them
+    interrupted = SMSLog.objects.filter(bulk_sms=campaign, status='pending').update(
+        status='failed', status_message='Interrupted before the provider confirmed sending'
+    )
+    if interrupted:
+        record_sms_outcomes(campaign.tenant_id, failed=interrupted)
+        logger.warning(f"Bulk SMS campaign {campaign.pk}: {interrupted} messages interrupted by a previous run")
+
+    dispatcher = CampaignDispatcher(campaign, provider_config, lease)
+    try:
+        dispatcher.run()
+    finally:
+        dispatcher.close()
+    if lease.lost:
+        return False, "Campaign was cancelled or taken over by another dispatcher"
+    return dispatcher.finish()
+
+
+class CampaignDispatcher:
+    """Sends one claimed campaign chunk by chunk"""
+
+    def __init__(self, campaign, provider_config, lease):
+        self.campaign = campaign
+        self.provider_config = provider_config
+        self.lease = lease
+        self.service = SMSService(provider_config)
+        self.bucket = provider_bucket(provider_config)
+        self.batch_size = AT_BATCH_SIZE if provider_config.provider_name == 'africastalking' else 1
+        self.batch_size = min(self.batch_size, self.bucket.capacity)
+        # About RENEW_SECONDS of sending per chunk at the provider's rate
+        self.chunk_size = min(CHUNK_SIZE, max(int(self.bucket.rate * RENEW_SECONDS), self.batch_size))
+        self.executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'SMS_DISPATCH_WORKERS', 8), thread_name_prefix=f'SMS-{campaign.pk}'
+        )
+        self.template = compile_message(
+            campaign.template.content if campaign.template_id else campaign.custom_message
+        )
+        self.segments = 0
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    def run(self):
+        done = set(SMSLog.objects.filter(bulk_sms=self.campaign).values_list('customer_id', flat=True))
+        last_id = 0
+        while True:
+            chunk = list(
+                self.campaign.recipients.filter(id__gt=last_id)
+                .only('id', 'phone', *self.template.fields)
+                .order_by('id')[:self.chunk_size]
+            )
+            if not chunk:
+                return
+            last_id = chunk[-1].id
+
+            # Also stops a cancelled campaign: the renewal only matches while it is sending
+            if not self.lease.renew(force=True):
+                status = BulkSMS.objects.filter(pk=self.campaign.pk).values_list('status', flat=True).first()
+                logger.info(f"Bulk SMS campaign {self.campaign.pk} stopped ({status})")
+                return
+
+            pending = [customer for customer in chunk if customer.id not in done]
+            if pending:
+                self.send_chunk(pending)
+            if self.lease.lost:
+                return
+
+    def _remaining_quota(self):
+        self.provider_config.reset_daily_count()
+        self.provider_config.refresh_from_db(fields=['sms_sent_today'])
+        return max(self.provider_config.max_sms_per_day - self.provider_config.sms_sent_today, 0)
+
+    def send_chunk(self, customers):
+        quota = self._remaining_quota()
+        logs, sendable = [], []
+        for customer in customers:
+            text, segments = self.template.render_with_segments(customer)
+            phone = self.service.format_phone_number(customer.phone) if customer.phone else None
+            log = SMSLog(tenant_id=self.campaign.tenant_id, bulk_sms=self.campaign, customer=customer, message=text)
+            if not phone:
+                log.status, log.status_message = 'failed', 'Invalid phone number'
+            elif len(sendable) >= quota:
+                log.status, log.status_message = 'failed', 'Daily SMS limit reached'
+            else:
+                log.status = 'pending'
+                sendable.append((phone, log))
+                self.segments += segments
+            logs.append(log)
+
+        # Checkpoint: every recipient of this chunk now has a log and will not be sent to again
+        SMSLog.objects.bulk_create(logs)
+
+        # Identical texts share one provider request
+        groups = {}
+        for phone, log in sendable:
+            groups.setdefault(log.message, []).append((phone, log))
+        units = []
+        for text, members in groups.items():
+            for start in range(0, len(members), self.batch_size):
+                units.append((text, members[start:start + self.batch_size]))
+
+        sent_at = timezone.now()
+        settled = []
+        for members, results in zip((unit[1] for unit in units), self.executor.map(self._send_unit, units)):
+            if results is None:
+                # Not sent: the lease was lost and the new holder owns these logs
+                continue
+            for phone, log in members:
+                settled.append(log)
+                success, result = results.get(phone, (False, "No status returned"))
+                if success:
+                    log.status = 'sent'
+                    log.cost = result.get('cost', 0)
+                    log.provider_reference = str(result.get('message_id', ''))[:100]
+                    log.sent_at = sent_at
+                else:
+                    log.status = 'failed'
+                    log.status_message = str(result)
+        written = self._write_outcomes(settled)
+
+        # Logs created failed are always ours; settled ones only count where the write landed
+        sent = sum(1 for log in written if log.status == 'sent')
+        cost = sum(log.cost for log in written if log.status == 'sent')
+        failed = len(logs) - len(sendable) + len(written) - sent
+        BulkSMS.objects.filter(pk=self.campaign.pk).update(
+            sent_count=F('sent_count') + sent, failed_count=F('failed_count') + failed,
+        )
+        record_sms_outcomes(self.campaign.tenant_id, sent=sent, failed=failed, cost=cost)
+        if sent:
+            SMSProviderConfig.objects.filter(pk=self.provider_config.pk).update(
+                sms_sent_today=F('sms_sent_today') + sent
+            )
+        logger.info(f"Bulk SMS campaign {self.campaign.pk}: chunk of {len(logs)}, {sent} sent, {failed} failed")
+
+    def _write_outcomes(self, settled):
+        """
+        Save outcomes to the logs that are still pending and return those.
+        The rows stay locked until the write commits, so a new lease holder
+        failing interrupted logs either waits for it or has already won.
+        """
+        if not settled:
+            return []
+        with transaction.atomic():
+            pending = set(
+                SMSLog.objects.select_for_update()
+                .filter(pk__in=[log.pk for log in settled], status='pending')
+                .values_list('pk', flat=True)
+            )
+            written = [log for log in settled if log.pk in pending]
+            SMSLog.objects.bulk_update(written, LOG_RESULT_FIELDS)
+        if len(written) < len(settled):
+            logger.warning(
+                f"Bulk SMS campaign {self.campaign.pk}: {len(settled) - len(written)} outcomes "
+                f"not saved, their logs were settled by another dispatcher"
+            )
+        return written
+
+    def _send_unit(self, unit):
+        """Provider results for one request, or None when the lease is gone and nothing was sent"""
+        text, members = unit
+        close_old_connections()
+        try:
+            self.bucket.acquire(len(members))
+            if not self.lease.renew():
+                return None
+            return self.service.send_to_numbers([phone for phone, _ in members], text)
+        finally:
+            # Pool threads are discarded with the dispatcher; do not leave the renewal's connection open
+            connection.close()
+
+    def finish(self):
+        """Settle the campaign's counts and status from its logs"""
+        counts = SMSLog.objects.filter(bulk_sms=self.campaign).aggregate(
+            sent=Count('id', filter=Q(status__in=['sent', 'delivered'])),
+            failed=Count('id', filter=Q(status='failed')),
+        )
+        BulkSMS.objects.filter(pk=self.campaign.pk, status='sending', dispatch_token=self.lease.token).update(
+            sent_count=counts['sent'],
+            failed_count=counts['failed'],
+            status='completed' if counts['sent'] > 0 or counts['failed'] == 0 else 'failed',
+            dispatch_heartbeat=None,
+            dispatch_token='',
+        )
+        logger.info(f"Bulk SMS campaign {self.campaign.pk}: {self.segments} SMS segments submitted")
+        return True, f"Sent {counts['sent']} SMS, {counts['failed']} failed"
+
+
+def dispatch_pending_campaigns():
+    """Worker pass: send due scheduled campaigns and resume abandoned ones. Returns how many ran."""
+    now = timezone.now()
+    stale_before = now - timezone.timedelta(seconds=LEASE_SECONDS)
+    campaign_ids = list(
+        BulkSMS.objects.filter(
+            Q(status='scheduled', scheduled_time__lte=now)
+            | Q(status='sending', dispatch_heartbeat__isnull=True, updated_at__lt=stale_before)
+            | Q(status='sending', dispatch_heartbeat__lt=stale_before)
+        ).order_by('created_at').values_list('id', flat=True)
+    )
+    ran = 0
+    for campaign_id in campaign_ids:
+        success, message = dispatch_campaign(campaign_id)
+        if success:
+            ran += 1
+            logger.info(f"Bulk SMS campaign {campaign_id}: {message}")
+    return ran
@@ -6,6 +6,7 @@ from django.conf import settings
 from django.utils import timezone
 from decimal import Decimal
 import africastalking
+from africastalking.SMS import SMSService as AfricasTalkingSMS
 import logging
 
 from accounts.models import SMSProviderConfig
@@ -30,11 +31,11 @@ class SMSService:
     def initialize_africastalking(self):
         """Initialize Africa's Talking SMS service"""
         try:
-            africastalking.initialize(
+            # Own client per config: africastalking.initialize() sets module globals shared by all tenants
+            self.client = AfricasTalkingSMS(
                 username=self.provider_config.api_key,  # Africa's Talking uses username as API key
                 api_key=self.provider_config.api_secret
             )
-            self.client = africastalking.SMS
         except Exception as e:
             logger.error(f"Failed to initialize Africa's Talking: {e}")
             raise
@@ -169,6 +170,56 @@ class SMSService:
             logger.error(f"SMS Alert API error: {e}")
             raise
     
+    def send_to_numbers(self, phone_numbers, message, sender_id=None):
+        """
+        Send one message to already formatted numbers without touching the
+        database. Africa's Talking takes them in a single request; other
+        providers get one call per number. Returns {phone: (success, result)}.
+        """
+        sender = sender_id or self.provider_config.default_sender or self.provider_config.sender_id
+        
+        if self.provider_config.provider_name == 'africastalking':
+            try:
+                response = self.client.send(message=message, recipients=list(phone_numbers), sender_id=sender)
+            except Exception as e:
+                logger.error(f"Africa's Talking API error: {e}")
+                return {phone: (False, str(e)) for phone in phone_numbers}
+            
+            results = {phone: (False, "No status returned") for phone in phone_numbers}
+            for recipient in response.get('SMSMessageData', {}).get('Recipients', []):
+                if recipient.get('statusCode') in (100, 101, 102):
+                    results[recipient['number']] = (True, {
+                        'success': True,
+                        'message_id': recipient.get('messageId', ''),
+                        'cost': self.parse_cost(recipient.get('cost')),
+                    })
+                else:
+                    results[recipient['number']] = (False, recipient.get('status', 'Failed'))
+            return results
+        
+        send = {
+            'twilio': self.send_via_twilio,
+            'smsalert': self.send_via_smsalert,
+        }.get(self.provider_config.provider_name)
+        if send is None:
+            return {phone: (False, "Unsupported SMS provider") for phone in phone_numbers}
+        
+        results = {}
+        for phone in phone_numbers:
+            try:
+                results[phone] = (True, send(phone, message, sender))
+            except Exception as e:
+                results[phone] = (False, str(e))
+        return results
+    
+    @staticmethod
+    def parse_cost(cost):
+        """Decimal from provider cost strings such as 'KES 0.8000'"""
+        try:
+            return Decimal(str(cost or '0').split()[-1])
+        except Exception:
+            return Decimal('0')
+    
     def send_bulk_sms(self, phone_numbers, message, sender_id=None):
         """Send SMS to multiple phone numbers"""
         results = []
@@ -250,140 +301,98 @@ class SMSService:
 
 
 def send_bulk_sms_to_customers(campaign):
-    """Send bulk SMS campaign"""
-    from .models import SMSLog
+    """Send a bulk SMS campaign in the calling thread (see sms_dispatch for the queued path)"""
+    from .models import BulkSMS
+    from .sms_dispatch import dispatch_campaign
     
     try:
-        # Update campaign status
-        campaign.status = 'sending'
-        campaign.sent_at = timezone.now()
-        campaign.save()
-        
-        # Get SMS provider
-        provider_config = SMSProviderConfig.objects.filter(
-            tenant=campaign.tenant,
-            is_active=True
-        ).first()
-        
-        if not provider_config:
-            campaign.status = 'failed'
-            campaign.save()
-            return False, "No active SMS provider configured"
-        
-        # Initialize SMS service
-        sms_service = SMSService(provider_config)
-        
-        # Get message content
-        if campaign.template:
-            message = campaign.template.content
-        else:
-            message = campaign.custom_message
-        
-        successful = 0
-        failed = 0
-        
-        # Send to each recipient
-        for customer in campaign.recipients.all():
-            if customer.phone:
-                try:
-                    # Replace variables in message
-                    personalized_message = replace_message_variables(message, customer)
-                    
-                    # Send SMS
-                    success, result = sms_service.send_single_sms(
-                        customer.phone, 
-                        personalized_message
-                    )
-                    
-                    # Create SMS log
-                    SMSLog.objects.create(
-                        tenant=campaign.tenant,
-                        bulk_sms=campaign,
-                        customer=customer,
-                        message=personalized_message,
-                        status='sent' if success else 'failed',
-                        status_message=result if not success else '',
-                        cost=result.get('cost', 0) if success else 0,
-                        provider_reference=result.get('message_id', '') if success else '',
-                        sent_at=timezone.now() if success else None
-                    )
-                    
-                    if success:
-                        successful += 1
-                    else:
-                        failed += 1
-                        
-                except Exception as e:
-                    logger.error(f"Failed to send SMS to {customer.username}: {e}")
-                    failed += 1
-            else:
-                failed += 1
-        
-        # Update campaign stats
-        campaign.sent_count = successful
-        campaign.failed_count = failed
-        campaign.status = 'completed' if successful > 0 or failed == 0 else 'failed'
-        campaign.save()
-        
-        return True, f"Sent {successful} SMS, {failed} failed"
+        BulkSMS.objects.filter(pk=campaign.pk).update(status='sending', dispatch_heartbeat=None, dispatch_token='')
+        success, message = dispatch_campaign(campaign.pk)
+        campaign.refresh_from_db()
+        return success, message
         
     except Exception as e:
         logger.error(f"Failed to send bulk SMS campaign: {e}")
-        campaign.status = 'failed'
-        campaign.save()
+        BulkSMS.objects.filter(pk=campaign.pk).update(status='failed', dispatch_heartbeat=None, dispatch_token='')
         return False, str(e)
 
 
 def replace_message_variables(message, customer):
     """Replace variables in message with customer data"""
-    replacements = {
-        '{name}': customer.get_full_name() or customer.username,
-        '{username}': customer.username,
-        '{account}': customer.company_account_number or '',
-        '{balance}': str(customer.account_balance),
-        '{plan}': customer.subscription_plan or 'No Plan',
-        '{due_date}': customer.next_payment_date.strftime('%d/%m/%Y') if customer.next_payment_date else 'N/A',
-        '{phone}': customer.phone or '',
-        '{email}': customer.email,
-    }
+    from .sms_templates import compile_message
+    
+    return compile_message(message).render(customer)
+
+
+def record_sms_outcomes(tenant_id, sent=0, failed=0, cost=0, day=None):
+    """Add a batch of send outcomes to the tenant's SMSDailyStats row"""
+    from django.db.models import F
+    from .models import SMSDailyStats
     
-    for key, value in replacements.items():
-        message = message.replace(key, str(value))
+    if not (sent or failed):
+        return
+    day = day or timezone.localdate()
+    row, _ = SMSDailyStats.objects.get_or_create(tenant_id=tenant_id, date=day)
+    SMSDailyStats.objects.filter(pk=row.pk).update(
+        sent_count=F('sent_count') + sent,
+        failed_count=F('failed_count') + failed,
+        cost=F('cost') + cost,
+        updated_at=timezone.now(),
+    )
+
+
+def summarize_sms_logs(logs):
+    """Count, sent, failed and cost of an SMSLog queryset in one query"""
+    from django.db.models import Count, Q, Sum
     
-    return message
+    totals = logs.order_by().aggregate(
+        total=Count('id'),
+        sent=Count('id', filter=Q(status='sent')),
+        delivered=Count('id', filter=Q(status='delivered')),
+        failed=Count('id', filter=Q(status='failed')),
+        pending=Count('id', filter=Q(status='pending')),
+        cost=Sum('cost'),
+    )
+    totals['cost'] = totals['cost'] or Decimal('0')
+    return totals
 
 
 def get_sms_statistics(tenant):
     """Get SMS statistics for tenant"""
-    from .models import SMSLog, BulkSMS
+    from django.db.models import Count, Q, Sum
+    from .models import BulkSMS, SMSDailyStats
     
-    today = timezone.now().date()
+    today = timezone.localdate()
     
-    # Today's stats
-    today_sms = SMSLog.objects.filter(
-        tenant=tenant,
-        sent_at__date=today
+    # Today's and all-time totals from the daily counters
+    counters = SMSDailyStats.objects.filter(tenant=tenant).aggregate(
+        today_successful=Sum('sent_count', filter=Q(date=today)),
+        today_failed=Sum('failed_count', filter=Q(date=today)),
+        today_cost=Sum('cost', filter=Q(date=today)),
+        total_successful=Sum('sent_count'),
+        total_failed=Sum('failed_count'),
+        total_cost=Sum('cost'),
     )
+    counters = {key: value or 0 for key, value in counters.items()}
     
-    # Total stats
-    total_sms = SMSLog.objects.filter(tenant=tenant)
-    total_campaigns = BulkSMS.objects.filter(tenant=tenant)
-    
-    # Cost calculation
-    total_cost = sum([log.cost for log in total_sms if log.cost])
-    today_cost = sum([log.cost for log in today_sms if log.cost])
+    campaigns = BulkSMS.objects.filter(tenant=tenant).aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status__in=['draft', 'scheduled', 'sending'])),
+    )
     
+    total_count = counters['total_successful'] + counters['total_failed']
     return {
-        'today_count': today_sms.count(),
-        'today_successful': today_sms.filter(status='sent').count(),
-        'today_failed': today_sms.filter(status='failed').count(),
-        'today_cost': float(today_cost),
+        'today_count': counters['today_successful'] + counters['today_failed'],
+        'today_successful': counters['today_successful'],
+        'today_failed': counters['today_failed'],
+        'today_cost': float(counters['today_cost']),
         
-        'total_count': total_sms.count(),
-        'total_successful': total_sms.filter(status='sent').count(),
-        'total_failed': total_sms.filter(status='failed').count(),
-        'total_cost': float(total_cost),
+        'total_count': total_count,
+        'total_successful': counters['total_successful'],
+        'total_failed': counters['total_failed'],
+        'total_cost': float(counters['total_cost']),
+        'success_rate': counters['total_successful'] * 100 / total_count if total_count else 0,
         
-        'total_campaigns': total_campaigns.count(),
-        'active_campaigns': total_campaigns.filter(status__in=['draft', 'scheduled', 'sending']).count(),
-    }
\ No newline at end of file
+        'total_campaigns': campaigns['total'],
+        'active_campaigns': campaigns['active'],
+    }
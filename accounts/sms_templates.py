@@ -0,0 +1,141 @@
+# accounts/sms_templates.py
+"""
+Compiled SMS templates.
+
+compile_message() parses a message into literal text and {placeholder}
+segments once. The result knows which CustomUser columns it reads, so
+campaign queries can load only those with .only(). Rendering is then a
+single join per recipient, and only the placeholders the message
+actually uses are computed.
+
+It also works out the SMS segment count of each rendered message for
+cost estimates. A message is GSM-7 when every character is in the GSM
+03.38 alphabet; extension characters such as € and { take two septets.
+GSM-7 fits 160 septets in one SMS, or 153 per part when concatenated.
+Anything else is sent as UCS-2: 70 UTF-16 units, or 67 per part. The
+literal part of a template is measured once, at compile time.
+"""
+import re
+from functools import lru_cache
+
+GSM7_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+# Sent as an escape plus the character, so each counts twice
+GSM7_EXTENSION = set("^{}\\[~]|€\f")
+
+GSM7_SINGLE, GSM7_PART = 160, 153
+UCS2_SINGLE, UCS2_PART = 70, 67
+
+
+def _full_name(customer):
+    return customer.get_full_name() or customer.username
+
+
+def _due_date(customer):
+    return customer.next_payment_date.strftime('%d/%m/%Y') if customer.next_payment_date else 'N/A'
+
+
+# {name}: (CustomUser columns read, renderer)
+PLACEHOLDERS = {
+    'name': (('first_name', 'last_name', 'username'), _full_name),
+    'username': (('username',), lambda c: c.username),
+    'account': (('company_account_number',), lambda c: c.company_account_number or ''),
+    'balance': (('account_balance',), lambda c: str(c.account_balance)),
+    'plan': (('subscription_plan',), lambda c: c.subscription_plan or 'No Plan'),
+    'due_date': (('next_payment_date',), _due_date),
+    'phone': (('phone',), lambda c: c.phone or ''),
+    'email': (('email',), lambda c: c.email),
+}
+
+PLACEHOLDER_RE = re.compile(r'\{(%s)\}' % '|'.join(PLACEHOLDERS))
+
+
+def text_units(text):
+    """(GSM-7 septets or None when the text needs UCS-2, UTF-16 code units)"""
+    septets = 0
+    for char in text:
+        if char in GSM7_BASIC:
+            septets += 1
+        elif char in GSM7_EXTENSION:
+            septets += 2
+        else:
+            septets = None
+            break
+    ucs2 = len(text.encode('utf-16-le')) // 2
+    return septets, ucs2
+
+
+def segments_for_units(septets, ucs2):
+    """('gsm7' or 'ucs2', number of SMS parts) for a message of the given size"""
+    if septets is not None:
+        return 'gsm7', 1 if septets <= GSM7_SINGLE else -(-septets // GSM7_PART)
+    return 'ucs2', 1 if ucs2 <= UCS2_SINGLE else -(-ucs2 // UCS2_PART)
+
+
+def sms_segments(text):
+    """('gsm7' or 'ucs2', number of SMS parts) needed to send `text`"""
+    return segments_for_units(*text_units(text))
+
+
+class CompiledTemplate:
+    """A message split into literal strings and placeholder renderers"""
+
+    def __init__(self, message):
+        self.message = message
+        self.parts = []
+        self.placeholders = []
+        literals = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(message):
+            if match.start() > position:
+                literals.append(message[position:match.start()])
+                self.parts.append(literals[-1])
+            name = match.group(1)
+            self.parts.append(PLACEHOLDERS[name][1])
+            self.placeholders.append(name)
+            position = match.end()
+        if position < len(message):
+            literals.append(message[position:])
+            self.parts.append(literals[-1])
+
+        self.fields = tuple(sorted({
+            field for name in self.placeholders for field in PLACEHOLDERS[name][0]
+        }))
+        self.is_static = not self.placeholders
+        self.literal_units = text_units(''.join(literals))
+        self.encoding, self.segments = segments_for_units(*self.literal_units)
+
+    def render(self, customer):
+        if self.is_static:
+            return self.message
+        return ''.join(part if isinstance(part, str) else part(customer) for part in self.parts)
+
+    def render_with_segments(self, customer):
+        """(text, number of SMS parts) for one recipient"""
+        if self.is_static:
+            return self.message, self.segments
+        values = [part(customer) for part in self.parts if not isinstance(part, str)]
+        septets, ucs2 = self.literal_units
+        for value in values:
+            value_septets, value_ucs2 = text_units(value)
+            septets = None if septets is None or value_septets is None else septets + value_septets
+            ucs2 += value_ucs2
+        values = iter(values)
+        text = ''.join(part if isinstance(part, str) else next(values) for part in self.parts)
+        return text, segments_for_units(septets, ucs2)[1]
+
+    def count_segments(self, customers):
+        """Total SMS parts for sending this message to a CustomUser queryset"""
+        if self.is_static:
+            return self.segments * customers.count()
+        return sum(
+            self.render_with_segments(customer)[1]
+            for customer in customers.only('id', *self.fields).iterator(chunk_size=1000)
+        )
+
+
+@lru_cache(maxsize=256)
+def compile_message(message):
+    return CompiledTemplate(message)
@@ -0,0 +1,187 @@
+# accounts/status_events.py
+"""
+Live status deltas for ISP dashboards.
+
+emit() queues a typed event (router online/offline, device joined/left,
+payment completed) once the surrounding transaction commits. Events are
+buffered per tenant for COALESCE_SECONDS, keeping only the latest event
+per key, and a transition followed by its reverse (a router that flaps
+offline and back) cancels out. A burst such as a sync that sees 50
+devices join turns into one message. Each flush stores the events as
+StatusEvent rows and sends them to the tenant's channels group in one
+message.
+
+Row ids double as the resume cursor. A page renders live_counters(),
+whose cursor matches the counters it shows, and connects with
+?since=<cursor>. It then gets exactly the deltas the page doesn't
+include yet, and the same again after a reconnect. If too many were
+missed, or they have been pruned, it is told to reload instead.
+"""
+import logging
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+COALESCE_SECONDS = 1.0
+# Deltas older than this are pruned; clients that were away longer resync
+RETENTION_HOURS = 24
+PRUNE_EVERY_SECONDS = 600
+# Largest backlog replayed on resume before asking the client to resync
+MAX_BACKLOG = 500
+
+# Transitions that undo each other; a pair inside one window cancels out
+OPPOSITES = {
+    'router.online': 'router.offline',
+    'router.offline': 'router.online',
+    'device.joined': 'device.left',
+    'device.left': 'device.joined',
+}
+
+
+def status_group(tenant_id):
+    return f'status_{tenant_id}'
+
+
+def serialize_event(event):
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'key': event.key,
+        'data': event.payload,
+        'at': event.created_at.isoformat(),
+    }
+
+
+class StatusEventBuffer:
+    """Per-tenant coalescing buffer flushed on a timer thread"""
+
+    def __init__(self, delay=COALESCE_SECONDS):
+        self.delay = delay
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def add(self, tenant_id, event_type, key, payload):
+        with self._lock:
+            events = self._pending.setdefault(tenant_id, {})
+            # Re-insert so the coalesced event keeps the position of its latest occurrence
+            previous = events.pop(key, None)
+            if previous is None or OPPOSITES.get(previous[0]) != event_type:
+                events[key] = (event_type, payload)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Failed to flush status events: {e}")
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """Store and broadcast everything buffered so far. Returns the number of events sent."""
+        from .models import StatusEvent
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._timer = None
+
+        sent = 0
+        for tenant_id, events in pending.items():
+            rows = StatusEvent.objects.bulk_create([
+                StatusEvent(tenant_id=tenant_id, event_type=event_type, key=key, payload=payload)
+                for key, (event_type, payload) in events.items()
+            ])
+            self.publish(tenant_id, rows)
+            sent += len(rows)
+
+        if time.monotonic() - self._last_prune > PRUNE_EVERY_SECONDS:
+            self._last_prune = time.monotonic()
+            prune_status_events()
+        return sent
+
+    @staticmethod
+    def publish(tenant_id, rows):
+        channel_layer = get_channel_layer()
+        if channel_layer is None or not rows:
+            return
+        async_to_sync(channel_layer.group_send)(status_group(tenant_id), {
+            'type': 'status.deltas',
+            'cursor': rows[-1].id,
+            'events': [serialize_event(row) for row in rows],
+        })
+
+
+status_buffer = StatusEventBuffer()
+
+
+def emit(tenant_id, event_type, key, payload=None):
+    """Queue a status delta for the tenant's dashboards once the current transaction commits"""
+    if not tenant_id:
+        return
+    transaction.on_commit(lambda: status_buffer.add(tenant_id, event_type, key, payload or {}))
+
+
+def latest_cursor(tenant_id):
+    from .models import StatusEvent
+
+    return StatusEvent.objects.filter(tenant_id=tenant_id).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def live_counters(tenant_id):
+    """
+    The counters the router and device deltas adjust, with the cursor they
+    are current to. router.online/offline track RouterConfig.is_online and
+    device.joined/left track active ConnectedDevice rows.
+    """
+    from router_manager.models import ConnectedDevice, RouterConfig
+
+    # Cursor first: a change that lands in between is counted and replayed, not lost
+    cursor = latest_cursor(tenant_id)
+    routers = RouterConfig.objects.filter(tenant_id=tenant_id).aggregate(
+        total=Count('id'), online=Count('id', filter=Q(is_online=True))
+    )
+    return {
+        'cursor': cursor,
+        'total_routers': routers['total'],
+        'online_routers': routers['online'],
+        'online_devices': ConnectedDevice.objects.filter(
+            router__router_config__tenant_id=tenant_id, is_active=True
+        ).count(),
+    }
+
+
+def events_since(tenant_id, cursor):
+    """
+    (events, cursor, complete) for deltas after `cursor`. `complete` is
+    False when the gap cannot be replayed and the client should reload.
+    """
+    from .models import StatusEvent
+
+    oldest = StatusEvent.objects.order_by('id').values_list('id', flat=True).first()
+    if oldest is not None and cursor < oldest - 1:
+        # Deltas after the cursor may have been pruned
+        return [], latest_cursor(tenant_id), False
+    rows = list(StatusEvent.objects.filter(tenant_id=tenant_id, id__gt=cursor).order_by('id')[:MAX_BACKLOG + 1])
+    if len(rows) > MAX_BACKLOG:
+        return [], latest_cursor(tenant_id), False
+    return [serialize_event(row) for row in rows], (rows[-1].id if rows else cursor), True
+
+
+def prune_status_events():
+    from .models import StatusEvent
+
+    cutoff = timezone.now() - timezone.timedelta(hours=RETENTION_HOURS)
+    deleted, _ = StatusEvent.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,87 @@
+# accounts/tenant_cache.py
+import copy
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Tenant
+
+# Hosts that never map to a tenant subdomain
+RESERVED_SUBDOMAINS = ['www', 'admin', 'api', 'app']
+
+
+class TenantResolutionCache:
+    """
+    In-process host -> tenant cache used by TenantMiddleware.
+
+    Unknown hosts are cached as misses too (negative caching) so that
+    bare platform domains don't hit the database on every request.
+    Entries are dropped from Tenant post_save/post_delete signals; the TTL
+    bounds staleness across worker processes that didn't see the signal.
+    """
+
+    def __init__(self, ttl=None, negative_ttl=None):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'TENANT_CACHE_TTL', 300)
+        self.negative_ttl = negative_ttl if negative_ttl is not None else getattr(
+            settings, 'TENANT_CACHE_NEGATIVE_TTL', 60
+        )
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, host, resolver):
+        """Return the tenant for host, calling resolver(host) on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(host)
+            if entry and entry[1] > now:
+                self.hits += 1
+                tenant = entry[0]
+                # Hand out a copy so request-level mutations never leak
+                return copy.copy(tenant) if tenant is not None else None
+            self.misses += 1
+
+        tenant = resolver(host)
+        ttl = self.ttl if tenant is not None else self.negative_ttl
+        with self._lock:
+            self._entries[host] = (tenant, time.monotonic() + ttl)
+        return copy.copy(tenant) if tenant is not None else None
+
+    def invalidate_tenant(self, tenant):
+        """Drop every host that resolved to this tenant plus its known hosts"""
+        with self._lock:
+            stale = [
+                host for host, (cached, _) in self._entries.items()
+                if cached is not None and cached.pk == tenant.pk
+            ]
+            for host in stale:
+                del self._entries[host]
+            # A new or renamed tenant may now claim a previously unknown host
+            for host in self._hosts_for(tenant):
+                self._entries.pop(host, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'size': len(self._entries),
+            }
+
+    @staticmethod
+    def _hosts_for(tenant):
+        hosts = [f"{tenant.subdomain}.mneti.com"]
+        if tenant.custom_domain:
+            hosts.append(tenant.custom_domain)
+        return hosts
+
+
+tenant_cache = TenantResolutionCache()
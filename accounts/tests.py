@@ -1,3 +1,61 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from accounts import sms_dispatch
+from accounts.models import BulkSMS, CustomUser, SMSDailyStats, SMSLog, SMSProviderConfig, Tenant
+from accounts.sms_service import SMSService
+
+
+class CampaignTakeoverTests(TransactionTestCase):
+    """A dispatcher that loses its lease mid-send must not duplicate or overwrite the new holder's work"""
+
+    def setUp(self):
+        self.tenant = Tenant.objects.create(name='Acme', subdomain='acme')
+        admin = CustomUser.objects.create(username='admin', role='isp_admin', tenant=self.tenant)
+        SMSProviderConfig.objects.create(
+            tenant=self.tenant, provider_name='smsalert', api_key='user', api_secret='key',
+            sender_id='ACME', max_sms_per_second=100, max_sms_per_day=1000,
+        )
+        customers = CustomUser.objects.bulk_create([
+            CustomUser(username=f'customer{i}', role='customer', tenant=self.tenant, phone=f'0700000{i:03d}')
+            for i in range(6)
+        ])
+        self.campaign = BulkSMS.objects.create(
+            tenant=self.tenant, admin=admin, custom_message='Hello {username}', status='sending'
+        )
+        self.campaign.recipients.set(customers)
+        self.sent_to = []
+
+    def fake_send(self, service, phones, message, sender_id=None):
+        self.sent_to.extend(phones)
+        if len(self.sent_to) == 1:
+            # The first dispatcher stalls past its lease and a second one takes the campaign over
+            BulkSMS.objects.filter(pk=self.campaign.pk).update(
+                dispatch_heartbeat=timezone.now() - timezone.timedelta(seconds=sms_dispatch.LEASE_SECONDS * 2)
+            )
+            self.takeover = sms_dispatch.dispatch_campaign(self.campaign.pk)
+        return {phone: (True, {'message_id': 'ref', 'cost': 1}) for phone in phones}
+
+    def test_takeover_sends_no_duplicates(self):
+        # Renew on every send so the first dispatcher notices the takeover straight away
+        with mock.patch.object(sms_dispatch, 'RENEW_SECONDS', 0), \
+                mock.patch.object(SMSService, 'send_to_numbers', autospec=True, side_effect=self.fake_send):
+            result = sms_dispatch.dispatch_campaign(self.campaign.pk)
+
+        self.assertEqual(result[0], False)
+        self.assertEqual(self.takeover[0], True)
+        self.assertEqual(len(self.sent_to), 6)
+        self.assertEqual(len(set(self.sent_to)), 6)
+
+        # The takeover failed the interrupted log; the first dispatcher's late result must not overwrite it
+        logs = SMSLog.objects.filter(bulk_sms=self.campaign)
+        self.assertEqual(logs.count(), 6)
+        self.assertEqual(logs.filter(status='failed').count(), 1)
+        self.assertEqual(logs.filter(status='sent').count(), 5)
+
+        campaign = BulkSMS.objects.get(pk=self.campaign.pk)
+        self.assertEqual((campaign.status, campaign.sent_count, campaign.failed_count), ('completed', 5, 1))
+        stats = SMSDailyStats.objects.get(tenant=self.tenant)
+        self.assertEqual((stats.sent_count, stats.failed_count), (5, 1))
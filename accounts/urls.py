@@ -11,7 +11,7 @@ from django.contrib.auth import views as auth_views
 from django.urls import include
 from billing import views as billing_views
 from accounts.views_isp import (
-    api_bulk_create_customers, api_validate_customer_import, download_import_template, isp_customer_payments, isp_import_customers, isp_import_preview, isp_import_results, mark_payment_completed, delete_payment, download_payment_receipt,
+    api_bulk_create_customers, api_validate_customer_import, download_import_template, isp_customer_payments, isp_import_customers, isp_import_preview, isp_import_results, api_import_job_status, mark_payment_completed, delete_payment, download_payment_receipt,
     bulk_mark_payments_completed, export_payments_csv, isp_create_manual_payment
 )
 
@@ -23,6 +23,7 @@ path('login/', views.login_view, name='login'),
 path('logout/', views.logout_view, name='logout'),
 path('register/', views.register, name='register'),
 path('dashboard/', views.dashboard_router, name='dashboard_router'),
+path('branding/<uuid:tenant_id>/<str:css_hash>.css', views.tenant_branding_css, name='tenant_branding_css'),
 
 # Payment API endpoints
 path('api/payments/<int:payment_id>/details/', views_isp.api_payment_details, name='api_payment_details'),
@@ -90,6 +91,7 @@ path('superadmin/dashboard/', views_superadmin.superadmin_dashboard, name='super
 path('superadmin/analytics/', views_superadmin.superadmin_analytics, name='superadmin_analytics'),
 path('superadmin/settings/', views_superadmin.superadmin_settings, name='superadmin_settings'),
 path('superadmin/kill-switch/', views_superadmin.superadmin_kill_switch, name='superadmin_kill_switch'),
+path('superadmin/api/tenant-cache-stats/', views_superadmin.superadmin_tenant_cache_stats, name='superadmin_tenant_cache_stats'),
 
 # ============================================
 # SUPERADMIN - USER MANAGEMENT
@@ -303,6 +305,7 @@ path('isp/map/', views_maps.isp_customer_map, name='isp_customer_map'),
 
 # Map API endpoints
 path('api/get-customer-locations/', views_maps.get_customer_locations, name='get_customer_locations'),
+path('api/customer-map-clusters/', views_maps.get_customer_map_clusters, name='get_customer_map_clusters'),
 path('api/save-customer-location/', views_maps.save_customer_location, name='save_customer_location'),
 path('api/customer/<int:customer_id>/verify-location/', views_maps.verify_customer_location, name='verify_customer_location'),
 path('api/customer/<int:customer_id>/location-history/', views_maps.get_customer_location_history, name='get_customer_location_history'),
@@ -327,6 +330,7 @@ path('customers/<int:customer_id>/payments/create-auto/',
 path('customers/import/', isp_import_customers, name='isp_import_customers'),
 path('customers/import/preview/', isp_import_preview, name='isp_import_preview'),
 path('customers/import/results/', isp_import_results, name='isp_import_results'),
+path('customers/import/<int:job_id>/status/', api_import_job_status, name='api_import_job_status'),
 path('customers/import/download-template/', download_import_template, name='download_import_template'),
 path('customers/import/validate/', api_validate_customer_import, name='api_validate_customer_import'),
 path('customers/import/bulk-create/', api_bulk_create_customers, name='api_bulk_create_customers'),
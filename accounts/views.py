@@ -1808,4 +1808,23 @@ def regenerate_backup_codes(request):
             'regenerated': True,
         })
     
-    return render(request, 'accounts/regenerate_backup_codes.html')
\ No newline at end of file
+    return render(request, 'accounts/regenerate_backup_codes.html')
+
+@require_http_methods(["GET", "HEAD"])
+def tenant_branding_css(request, tenant_id, css_hash):
+    """
+    Serve a tenant's compiled branding stylesheet.
+    The URL carries the content hash, so responses can be cached forever.
+    """
+    tenant = Tenant.objects.filter(id=tenant_id).only('branding_css', 'branding_css_hash').first()
+    if not tenant or not tenant.branding_css_hash:
+        return HttpResponse(status=404)
+    
+    # Stale hash (colours changed since the page was rendered) - point at the current one
+    if tenant.branding_css_hash != css_hash:
+        return redirect('tenant_branding_css', tenant_id=tenant_id, css_hash=tenant.branding_css_hash)
+    
+    response = HttpResponse(tenant.branding_css, content_type='text/css; charset=utf-8')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response['ETag'] = f'"{tenant.branding_css_hash}"'
+    return response
@@ -11,7 +11,7 @@ from django.http import JsonResponse, HttpResponseForbidden, HttpResponse
 from django.utils import timezone
 from datetime import timedelta, datetime
 from django.views.decorators.csrf import csrf_exempt
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, Sum, Q, OuterRef, Subquery, Case, When, Value, BooleanField
 import json, csv, io, traceback
 from accounts.models import BulkSMS, CustomUser, SMSLog, SMSProviderConfig, SMSTemplate, Tenant, LoginActivity
 from router_manager.models import ConnectedDevice, Router, Device, RouterConfig, PortForwardingRule
@@ -25,13 +25,23 @@ import pandas as pd
 import socket
 import uuid
 from router_manager.forms import ISPAddRouterForm, ISPPortForwardingForm, ISPEditRouterForm
+from accounts.dashboard_stats import get_isp_dashboard_stats
+from accounts import status_events
+from accounts.pagination import keyset_paginate
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from decimal import Decimal
 import logging
 
-
+# Rows per page on the customer management table
+CUSTOMERS_PER_PAGE = 25
+SMS_LOGS_PER_PAGE = 50
+IMPORT_ROWS_PER_PAGE = 50
+# Accounts per bulk-create request
+BULK_CREATE_MAX = 1000
+# Larger requests are staged as an import job and created in the background
+BULK_CREATE_SYNC_MAX = 25
 
 
 def get_isp_base_context(request):
@@ -60,33 +70,14 @@ def isp_dashboard(request):
     tenant = request.user.tenant
     
     # ISP analytics - only show data for the current tenant
-    total_customers = CustomUser.objects.filter(tenant=tenant, role='customer').count()
-    active_customers = CustomUser.objects.filter(tenant=tenant, role='customer', is_active_customer=True).count()
-    overdue_customers = CustomUser.objects.filter(
-        tenant=tenant, 
-        role='customer',
-        next_payment_date__lt=timezone.now()
-    ).count()
-    
-    # Router and device queries - FIXED: Use proper relationships
-    total_routers = Router.objects.filter(user__tenant=tenant).count()
-    online_routers = Router.objects.filter(user__tenant=tenant, is_online=True).count()
-    
-    # For devices, we need to go through the router relationship
-    total_devices = Device.objects.filter(router__user__tenant=tenant).count()
-    online_devices = Device.objects.filter(router__user__tenant=tenant, is_online=True).count()
-    
-    # Revenue calculations
-    tenant_customer_ids = CustomUser.objects.filter(tenant=tenant, role='customer').values_list('id', flat=True)
-    monthly_revenue = Payment.objects.filter(
-        user_id__in=tenant_customer_ids,
-        status='completed',
-        created_at__gte=timezone.now() - timedelta(days=30)
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    stats = get_isp_dashboard_stats(tenant)
+    # Uncached, so the live status stream can resume from the same point
+    live = status_events.live_counters(tenant.id)
     
     # Recent activity
     recent_payments = Payment.objects.filter(
-        user_id__in=tenant_customer_ids
+        user__tenant=tenant,
+        user__role='customer'
     ).select_related('user', 'plan').order_by('-created_at')[:10]
     
     overdue_accounts = CustomUser.objects.filter(
@@ -95,61 +86,25 @@ def isp_dashboard(request):
         next_payment_date__lt=timezone.now()
     )[:10]
     
-    # Device type distribution - FIXED: Use proper relationship
-    device_types = Device.objects.filter(router__user__tenant=tenant).values('device_type').annotate(
-        count=Count('id')
-    )
-    
-    device_distribution = {
-        'labels': [item['device_type'].title() if item['device_type'] else 'Unknown' for item in device_types],
-        'data': [item['count'] for item in device_types]
-    }
-
-    # Revenue timeseries (last 12 months)
-    now = timezone.now()
-    months = []
-    revenue_series = []
-    for i in range(11, -1, -1):
-        month_dt = (now.replace(day=1) - timedelta(days=1)).replace(day=1) - timedelta(days=30*i)
-        label = month_dt.strftime('%b %Y')
-        months.append(label)
-        start = month_dt.replace(day=1)
-        last_day = calendar.monthrange(month_dt.year, month_dt.month)[1]
-        end = month_dt.replace(day=last_day, hour=23, minute=59, second=59)
-        month_total = Payment.objects.filter(
-            user_id__in=tenant_customer_ids,
-            status='completed',
-            created_at__gte=start,
-            created_at__lte=end
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        revenue_series.append(float(month_total))
-
-    # Plan distribution - FIXED: use tenant instead of user
-    plan_qs = SubscriptionPlan.objects.filter(tenant=tenant, is_active=True).values('name').annotate(count=Count('id'))
-    plan_labels = [p['name'] for p in plan_qs]
-    plan_counts = [p['count'] for p in plan_qs]
-
-    # Overdue vs Paid
-    paid_customers = total_customers - overdue_customers
-    
     context = {
         'tenant': tenant,
-        'total_customers': total_customers,
-        'active_customers': active_customers,
-        'overdue_customers': overdue_customers,
-        'total_routers': total_routers,
-        'online_routers': online_routers,
-        'total_devices': total_devices,
-        'online_devices': online_devices,
-        'monthly_revenue': monthly_revenue,
+        'total_customers': stats['total_customers'],
+        'active_customers': stats['active_customers'],
+        'overdue_customers': stats['overdue_customers'],
+        'total_routers': live['total_routers'],
+        'online_routers': live['online_routers'],
+        'total_devices': stats['total_devices'],
+        'online_devices': live['online_devices'],
+        'status_cursor': live['cursor'],
+        'monthly_revenue': stats['monthly_revenue'],
         'recent_payments': recent_payments,
         'overdue_accounts': overdue_accounts,
-        'device_distribution': json.dumps(device_distribution),
-        'revenue_months': json.dumps(months),
-        'revenue_series': json.dumps(revenue_series),
-        'plan_labels': json.dumps(plan_labels),
-        'plan_counts': json.dumps(plan_counts),
-        'overdue_paid': json.dumps([overdue_customers, paid_customers]),
+        'device_distribution': json.dumps(stats['device_distribution']),
+        'revenue_months': json.dumps(stats['revenue_months']),
+        'revenue_series': json.dumps(stats['revenue_series']),
+        'plan_labels': json.dumps(stats['plan_labels']),
+        'plan_counts': json.dumps(stats['plan_counts']),
+        'overdue_paid': json.dumps([stats['overdue_customers'], stats['paid_customers']]),
     }
     
     return render(request, 'accounts/isp_dashboard.html', context)
@@ -160,47 +115,13 @@ def isp_dashboard_api(request):
         return HttpResponseForbidden("Access denied")
 
     tenant = request.user.tenant
-
-    tenant_customer_ids = CustomUser.objects.filter(tenant=tenant, role='customer').values_list('id', flat=True)
-
-    # Revenue timeseries (last 12 months)
-    now = timezone.now()
-    months = []
-    revenue_series = []
-    for i in range(11, -1, -1):
-        month_dt = (now.replace(day=1) - timedelta(days=1)).replace(day=1) - timedelta(days=30*i)
-        label = month_dt.strftime('%b %Y')
-        months.append(label)
-        start = month_dt.replace(day=1)
-        last_day = calendar.monthrange(month_dt.year, month_dt.month)[1]
-        end = month_dt.replace(day=last_day, hour=23, minute=59, second=59)
-        month_total = Payment.objects.filter(
-            user_id__in=tenant_customer_ids,
-            status='completed',
-            created_at__gte=start,
-            created_at__lte=end
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        revenue_series.append(float(month_total))
-
-    # Device distribution
-    device_types = Device.objects.filter(router__user__tenant=tenant).values('device_type').annotate(count=Count('id'))
-    device_distribution = {
-        'labels': [item['device_type'].title() if item['device_type'] else 'Unknown' for item in device_types],
-        'data': [item['count'] for item in device_types]
-    }
-
-    # Plan distribution
-    plan_qs = SubscriptionPlan.objects.filter(tenant=tenant, is_active=True).values('name').annotate(count=Count('id'))
-    plan_labels = [p['name'] for p in plan_qs]
-    plan_counts = [p['count'] for p in plan_qs]
-
-    # Overdue vs Paid
-    total_customers = CustomUser.objects.filter(tenant=tenant, role='customer').count()
-    overdue_customers = CustomUser.objects.filter(tenant=tenant, role='customer', next_payment_date__lt=timezone.now()).count()
-    paid_customers = total_customers - overdue_customers
+    stats = get_isp_dashboard_stats(tenant)
 
     # Recent payments (serialized)
-    recent_payments_qs = Payment.objects.filter(user_id__in=tenant_customer_ids).select_related('user', 'plan').order_by('-created_at')[:10]
+    recent_payments_qs = Payment.objects.filter(
+        user__tenant=tenant,
+        user__role='customer'
+    ).select_related('user', 'plan').order_by('-created_at')[:10]
     recent_payments = []
     for p in recent_payments_qs:
         recent_payments.append({
@@ -214,12 +135,12 @@ def isp_dashboard_api(request):
 
     data = {
         'success': True,
-        'revenue_months': months,
-        'revenue_series': revenue_series,
-        'device_distribution': device_distribution,
-        'plan_labels': plan_labels,
-        'plan_counts': plan_counts,
-        'overdue_paid': [overdue_customers, paid_customers],
+        'revenue_months': stats['revenue_months'],
+        'revenue_series': stats['revenue_series'],
+        'device_distribution': stats['device_distribution'],
+        'plan_labels': stats['plan_labels'],
+        'plan_counts': stats['plan_counts'],
+        'overdue_paid': [stats['overdue_customers'], stats['paid_customers']],
         'recent_payments': recent_payments,
     }
 
@@ -281,59 +202,95 @@ def isp_customer_management(request):
         return HttpResponseForbidden("Access denied")
     
     tenant = request.user.tenant
+    now = timezone.now()
     
     # Get customers for the current tenant only
-    customers = CustomUser.objects.filter(tenant=tenant, role='customer').order_by('registration_status', '-registration_date')
-
-    # Count pending approvals for the badge
-    pending_count = CustomUser.objects.filter(
-        tenant=tenant, 
-        role='customer',
-        registration_status='pending'
-    ).count()
+    base_customers = CustomUser.objects.filter(tenant=tenant, role='customer')
+    
+    # Page-level stats in one aggregate
+    stats = base_customers.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active_customer=True)),
+        overdue=Count('id', filter=Q(next_payment_date__lt=now)),
+        pending=Count('id', filter=Q(registration_status='pending')),
+    )
     
     # Active plans for the current tenant
     tenant_plans = SubscriptionPlan.objects.filter(tenant=tenant, is_active=True)
-
+    
+    # Current plan, device counts and overdue flag come from one query
+    current_plan = Subscription.objects.filter(
+        user=OuterRef('pk'), is_active=True
+    ).order_by('-created_at')
+    customers = base_customers.annotate(
+        current_plan_id=Subquery(current_plan.values('plan_id')[:1]),
+        current_plan_name=Subquery(current_plan.values('plan__name')[:1]),
+        total_devices=Count('devices'),
+        online_devices=Count('devices', filter=Q(devices__is_online=True)),
+        is_payment_overdue=Case(
+            When(next_payment_date__lt=now, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    )
+    
     # Filtering
     status_filter = request.GET.get('status', 'all')
     if status_filter == 'active':
         customers = customers.filter(is_active_customer=True)
     elif status_filter == 'overdue':
-        customers = customers.filter(next_payment_date__lt=timezone.now())
+        customers = customers.filter(next_payment_date__lt=now)
     elif status_filter == 'inactive':
         customers = customers.filter(is_active_customer=False)
     
-    # Calculate additional stats for each customer
-    for customer in customers:
-        # Get subscription info
-        subscription = Subscription.objects.filter(user=customer, is_active=True).first()
-        customer.current_plan = subscription.plan if subscription else None
-        
-        # Get device counts
-        customer.total_devices = Device.objects.filter(user=customer).count()
-        customer.online_devices = Device.objects.filter(user=customer, is_online=True).count()
-        
-        # Payment overdue calculation
-        if customer.next_payment_date:
-            customer.is_payment_overdue = customer.next_payment_date < timezone.now()
-            if customer.is_payment_overdue:
-                customer.days_overdue = (timezone.now() - customer.next_payment_date).days
+    # Server-side search
+    search_query = request.GET.get('q', '').strip()
+    if search_query:
+        customers = customers.filter(
+            Q(username__icontains=search_query) |
+            Q(email__icontains=search_query) |
+            Q(phone__icontains=search_query) |
+            Q(first_name__icontains=search_query) |
+            Q(last_name__icontains=search_query) |
+            Q(company_account_number__icontains=search_query)
+        )
     
-    # Get stats for dashboard
-    total_customers = customers.count()
-    active_customers = customers.filter(is_active_customer=True).count()
-    overdue_customers = customers.filter(next_payment_date__lt=timezone.now()).count()
+    # Keyset pagination, newest registrations first
+    page = keyset_paginate(
+        customers,
+        ('-registration_date', '-id'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=CUSTOMERS_PER_PAGE,
+    )
+    for customer in page:
+        if customer.is_payment_overdue:
+            customer.days_overdue = (now - customer.next_payment_date).days
+    
+    # Sidebar cards only need a handful of rows
+    recent_customers = base_customers.only(
+        'id', 'username', 'registration_date'
+    ).order_by('-registration_date')[:3]
+    overdue_list = list(
+        base_customers.filter(next_payment_date__lt=now)
+        .only('id', 'username', 'next_payment_date')
+        .order_by('next_payment_date')[:3]
+    )
+    for customer in overdue_list:
+        customer.days_overdue = (now - customer.next_payment_date).days
     
     context = {
-        'customers': customers,
+        'customers': page,
+        'recent_customers': recent_customers,
+        'overdue_list': overdue_list,
         'status_filter': status_filter,
+        'search_query': search_query,
         'tenant_plans': tenant_plans,
         'tenant': tenant,
-        'pending_count': pending_count,
-        'total_customers': total_customers,
-        'active_customers': active_customers,
-        'overdue_customers': overdue_customers,
+        'pending_count': stats['pending'],
+        'total_customers': stats['total'],
+        'active_customers': stats['active'],
+        'overdue_customers': stats['overdue'],
         'page_title': 'Customer Management',
         'page_subtitle': 'Manage and monitor your internet customers',
     }
@@ -4388,6 +4345,19 @@ def isp_create_manual_payment(request, customer_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+def _current_import_job(request, tenant):
+    """The import job referenced by ?job= or the session, scoped to the tenant"""
+    from accounts.models import CustomerImportJob
+    
+    from accounts.customer_import import expire_if_stale
+    
+    job_id = request.GET.get('job') or request.session.get('import_job_id')
+    if not job_id:
+        return None
+    job = CustomerImportJob.objects.filter(id=job_id, tenant=tenant).first()
+    return expire_if_stale(job) if job else None
+
+
 @login_required
 def isp_import_customers(request):
     """Import customers from CSV/Excel file"""
@@ -4398,6 +4368,7 @@ def isp_import_customers(request):
     available_plans = SubscriptionPlan.objects.filter(tenant=tenant, is_active=True)
     
     if request.method == 'POST':
+        from accounts.customer_import import READERS, create_import_job, read_text
         action = request.POST.get('action')
         
         if action == 'upload_file':
@@ -4409,43 +4380,13 @@ def isp_import_customers(request):
                 messages.error(request, 'Please select a file to upload')
                 return redirect('isp_import_customers')
             
+            if file_type not in READERS:
+                messages.error(request, 'Unsupported file format')
+                return redirect('isp_import_customers')
+            
             try:
-                # Read file based on type
-                if file_type == 'csv':
-                    # Read CSV file
-                    file_content = uploaded_file.read().decode('utf-8')
-                    csv_data = csv.reader(io.StringIO(file_content))
-                    headers = next(csv_data)
-                    
-                    # Convert to list of dictionaries
-                    customers_data = []
-                    for row in csv_data:
-                        if len(row) == len(headers):
-                            customer_dict = {}
-                            for i, header in enumerate(headers):
-                                customer_dict[header.strip().lower()] = row[i].strip()
-                            customers_data.append(customer_dict)
-                
-                elif file_type in ['xlsx', 'xls']:
-                    # Read Excel file
-                    df = pd.read_excel(uploaded_file)
-                    customers_data = df.to_dict('records')
-                
-                else:
-                    messages.error(request, 'Unsupported file format')
-                    return redirect('isp_import_customers')
-                
-                # Store in session for preview
-                request.session['import_customers_data'] = customers_data
-                request.session['import_file_type'] = file_type
-                request.session['import_file_name'] = uploaded_file.name
-                
-                # Get sample data for preview
-                sample_data = customers_data[:5] if len(customers_data) > 5 else customers_data
-                
-                messages.success(request, f'File uploaded successfully! Found {len(customers_data)} records.')
-                return redirect('isp_import_preview')
-                
+                # Rows are streamed from the file into the staging table
+                job = create_import_job(tenant, request.user, uploaded_file.name, file_type, READERS[file_type](uploaded_file))
             except Exception as e:
                 messages.error(request, f'Error reading file: {str(e)}')
                 return redirect('isp_import_customers')
@@ -4453,49 +4394,23 @@ def isp_import_customers(request):
         elif action == 'import_direct':
             # Direct import from form
             customers_text = request.POST.get('customers_text')
-            if not customers_text:
+            if not customers_text or not customers_text.strip():
                 messages.error(request, 'Please enter customer data')
                 return redirect('isp_import_customers')
             
-            try:
-                # Parse text input (comma or tab separated)
-                lines = customers_text.strip().split('\n')
-                if not lines:
-                    messages.error(request, 'No data found in text input')
-                    return redirect('isp_import_customers')
-                
-                # Detect delimiter
-                first_line = lines[0]
-                if '\t' in first_line:
-                    delimiter = '\t'
-                else:
-                    delimiter = ','
-                
-                # Parse lines
-                customers_data = []
-                for line in lines:
-                    if line.strip():
-                        parts = [p.strip() for p in line.split(delimiter)]
-                        if len(parts) >= 2:  # At least username and email
-                            customers_data.append({
-                                'username': parts[0],
-                                'email': parts[1] if len(parts) > 1 else '',
-                                'phone': parts[2] if len(parts) > 2 else '',
-                                'first_name': parts[3] if len(parts) > 3 else '',
-                                'last_name': parts[4] if len(parts) > 4 else '',
-                                'address': parts[5] if len(parts) > 5 else '',
-                            })
-                
-                request.session['import_customers_data'] = customers_data
-                request.session['import_file_type'] = 'text'
-                request.session['import_file_name'] = 'manual_input.txt'
-                
-                messages.success(request, f'Data parsed successfully! Found {len(customers_data)} records.')
-                return redirect('isp_import_preview')
-                
-            except Exception as e:
-                messages.error(request, f'Error parsing data: {str(e)}')
-                return redirect('isp_import_customers')
+            job = create_import_job(tenant, request.user, 'manual_input.txt', 'text', read_text(customers_text))
+        
+        else:
+            return redirect('isp_import_customers')
+        
+        # Only the job id is kept in the session
+        request.session['import_job_id'] = job.id
+        messages.success(
+            request,
+            f'File uploaded successfully! Found {job.total_rows} records'
+            + (f', {job.invalid_rows} with errors.' if job.invalid_rows else '.')
+        )
+        return redirect('isp_import_preview')
     
     context = {
         'tenant': tenant,
@@ -4518,15 +4433,13 @@ def isp_import_preview(request):
         return HttpResponseForbidden("Access denied")
     
     tenant = request.user.tenant
+    job = _current_import_job(request, tenant)
     
-    # Get data from session
-    customers_data = request.session.get('import_customers_data', [])
-    file_type = request.session.get('import_file_type', 'csv')
-    file_name = request.session.get('import_file_name', '')
-    
-    if not customers_data:
+    if not job or job.status == 'cancelled':
         messages.error(request, 'No import data found. Please upload a file first.')
         return redirect('isp_import_customers')
+    if job.status != 'staged':
+        return redirect(f"{reverse('isp_import_results')}?job={job.id}")
     
     available_plans = SubscriptionPlan.objects.filter(tenant=tenant, is_active=True)
     
@@ -4536,152 +4449,60 @@ def isp_import_preview(request):
         if action == 'process_import':
             # Process the import
             default_plan_id = request.POST.get('default_plan')
-            generate_passwords = request.POST.get('generate_passwords') == 'on'
-            send_welcome_email = request.POST.get('send_welcome_email') == 'on'
-            auto_activate = request.POST.get('auto_activate') == 'on'
             
-            try:
-                default_plan = None
-                if default_plan_id:
-                    default_plan = SubscriptionPlan.objects.get(id=default_plan_id, tenant=tenant, is_active=True)
-                
-                results = {
-                    'total': len(customers_data),
-                    'successful': 0,
-                    'failed': 0,
-                    'errors': [],
-                    'customers': []
-                }
-                
-                for i, customer_data in enumerate(customers_data):
-                    try:
-                        # Extract customer data
-                        username = customer_data.get('username', '').strip()
-                        email = customer_data.get('email', '').strip()
-                        phone = customer_data.get('phone', '').strip()
-                        first_name = customer_data.get('first_name', '').strip()
-                        last_name = customer_data.get('last_name', '').strip()
-                        address = customer_data.get('address', '').strip()
-                        
-                        # Validate required fields
-                        if not username:
-                            results['errors'].append(f'Row {i+1}: Username is required')
-                            results['failed'] += 1
-                            continue
-                        
-                        # Check if username already exists
-                        if CustomUser.objects.filter(username=username).exists():
-                            results['errors'].append(f'Row {i+1}: Username "{username}" already exists')
-                            results['failed'] += 1
-                            continue
-                        
-                        # Generate password if needed
-                        if generate_passwords:
-                            password = CustomUser.objects.make_random_password(length=10)
-                        else:
-                            # Use username + '123' as default password
-                            password = f"{username}123"
-                        
-                        # Create user
-                        new_user = CustomUser.objects.create_user(
-                            username=username,
-                            email=email if email else f"{username}@example.com",
-                            password=password
-                        )
-                        
-                        new_user.tenant = tenant
-                        new_user.role = 'customer'
-                        new_user.phone = phone
-                        new_user.first_name = first_name
-                        new_user.last_name = last_name
-                        new_user.address = address
-                        
-                        # Generate account number
-                        timestamp = int(timezone.now().timestamp())
-                        new_user.company_account_number = f"{tenant.id:03d}{timestamp % 1000000:06d}"
-                        
-                        new_user.is_active_customer = auto_activate
-                        new_user.registration_status = 'approved' if auto_activate else 'pending'
-                        new_user.registration_date = timezone.now()
-                        
-                        if auto_activate:
-                            new_user.approval_date = timezone.now()
-                            new_user.approved_by = request.user
-                        
-                        new_user.save()
-                        
-                        # Create subscription if plan is selected
-                        if default_plan:
-                            Subscription.objects.create(
-                                user=new_user,
-                                plan=default_plan,
-                                is_active=auto_activate,
-                                start_date=timezone.now(),
-                                end_date=timezone.now() + timedelta(days=default_plan.duration_days)
-                            )
-                            
-                            if auto_activate:
-                                new_user.next_payment_date = timezone.now() + timedelta(days=default_plan.duration_days)
-                                new_user.save()
-                        
-                        results['successful'] += 1
-                        results['customers'].append({
-                            'username': username,
-                            'email': new_user.email,
-                            'password': password if generate_passwords else 'Set by user',
-                            'status': 'Active' if auto_activate else 'Pending'
-                        })
-                        
-                    except Exception as e:
-                        results['errors'].append(f'Row {i+1}: {str(e)}')
-                        results['failed'] += 1
-                        print(f"Error importing customer {customer_data}: {e}")
-                        traceback.print_exc()
-                
-                # Store results in session for results page
-                request.session['import_results'] = results
-                request.session['import_summary'] = {
-                    'total': results['total'],
-                    'successful': results['successful'],
-                    'failed': results['failed']
-                }
-                
-                # Clear import data from session
-                if 'import_customers_data' in request.session:
-                    del request.session['import_customers_data']
-                
-                messages.success(request, f'Import completed! {results["successful"]} successful, {results["failed"]} failed.')
-                return redirect('isp_import_results')
-                
-            except Exception as e:
-                messages.error(request, f'Error processing import: {str(e)}')
+            if default_plan_id and not available_plans.filter(id=default_plan_id).exists():
+                messages.error(request, 'Selected plan not found')
+                return redirect('isp_import_preview')
+            
+            if not job.valid_rows:
+                messages.error(request, 'There are no valid rows to import')
+                return redirect('isp_import_preview')
+            
+            from accounts.customer_import import queue_import
+            queue_import(job, {
+                'default_plan_id': str(default_plan_id) if default_plan_id else None,
+                'generate_passwords': request.POST.get('generate_passwords') == 'on',
+                'send_welcome_email': request.POST.get('send_welcome_email') == 'on',
+                'auto_activate': request.POST.get('auto_activate') == 'on',
+            })
+            
+            messages.success(request, f'Import started for {job.valid_rows} customers.')
+            return redirect(f"{reverse('isp_import_results')}?job={job.id}")
         
         elif action == 'cancel_import':
-            # Clear session data
-            if 'import_customers_data' in request.session:
-                del request.session['import_customers_data']
+            job.delete()
+            request.session.pop('import_job_id', None)
             messages.info(request, 'Import cancelled')
             return redirect('isp_import_customers')
     
-    # Prepare data for preview
-    preview_data = []
-    for i, customer in enumerate(customers_data[:10]):  # Show first 10 rows
-        preview_data.append({
-            'row': i + 1,
-            'username': customer.get('username', ''),
-            'email': customer.get('email', ''),
-            'phone': customer.get('phone', ''),
-            'first_name': customer.get('first_name', ''),
-            'last_name': customer.get('last_name', ''),
-            'address': customer.get('address', ''),
-        })
+    # Page through the staged rows
+    row_filter = request.GET.get('rows', 'all')
+    rows = job.rows.all()
+    if row_filter in ('valid', 'invalid'):
+        rows = rows.filter(status=row_filter)
+    page = keyset_paginate(
+        rows,
+        ('id',),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=IMPORT_ROWS_PER_PAGE,
+    )
+    preview_data = [
+        dict(row.data, row=row.row_number, status=row.status, error=row.error)
+        for row in page
+    ]
     
     context = {
         'tenant': tenant,
+        'job': job,
+        'page': page,
+        'row_filter': row_filter,
         'preview_data': preview_data,
-        'total_records': len(customers_data),
-        'file_name': file_name,
-        'file_type': file_type,
+        'total_records': job.total_rows,
+        'valid_records': job.valid_rows,
+        'invalid_records': job.invalid_rows,
+        'file_name': job.file_name,
+        'file_type': job.file_type,
         'available_plans': available_plans,
         'page_title': 'Preview Import',
         'page_subtitle': 'Review customer data before import',
@@ -4702,16 +4523,36 @@ def isp_import_results(request):
         return HttpResponseForbidden("Access denied")
     
     tenant = request.user.tenant
+    job = _current_import_job(request, tenant)
     
-    results = request.session.get('import_results', {})
-    summary = request.session.get('import_summary', {})
-    
-    if not results:
+    if not job or job.status in ('staged', 'cancelled'):
         messages.error(request, 'No import results found')
         return redirect('isp_import_customers')
     
+    generate_passwords = job.options.get('generate_passwords')
+    imported = job.rows.filter(status='imported').order_by('id')[:10]
+    problems = job.rows.filter(status__in=['invalid', 'failed']).order_by('id')[:20]
+    results = {
+        'customers': [
+            {
+                'username': row.data['username'],
+                'email': row.data['email'] or f"{row.data['username']}@example.com",
+                'password': row.password if generate_passwords else 'Set by user',
+                'status': 'Active' if job.options.get('auto_activate') else 'Pending',
+            }
+            for row in imported
+        ],
+        'errors': [f'Row {row.row_number}: {row.error}' for row in problems],
+    }
+    summary = {
+        'total': job.total_rows,
+        'successful': job.imported_rows,
+        'failed': job.invalid_rows + job.failed_rows,
+    }
+    
     context = {
         'tenant': tenant,
+        'job': job,
         'results': results,
         'summary': summary,
         'page_title': 'Import Results',
@@ -4726,6 +4567,21 @@ def isp_import_results(request):
     return render(request, 'accounts/isp_import_results.html', context)
 
 
+@login_required
+def api_import_job_status(request, job_id):
+    """Progress of a customer import job"""
+    if request.user.role not in ['isp_admin', 'isp_staff']:
+        return JsonResponse({'success': False, 'error': 'Access denied'}, status=403)
+    
+    from accounts.models import CustomerImportJob
+    from accounts.customer_import import job_status
+    job = CustomerImportJob.objects.filter(id=job_id, tenant=request.user.tenant).first()
+    if not job:
+        return JsonResponse({'success': False, 'error': 'Import job not found'}, status=404)
+    
+    return JsonResponse({'success': True, 'job': job_status(job)})
+
+
 @login_required
 def download_import_template(request):
     """Download CSV template for customer import"""
@@ -4822,6 +4678,10 @@ def api_bulk_create_customers(request):
         return JsonResponse({'success': False, 'error': 'POST method required'})
     
     try:
+        from accounts.customer_import import create_import_job, purge_old_jobs, queue_import
+        from accounts.models import CustomerImportJob, CustomerImportRow
+        from accounts.provisioning import bulk_provision_customers, existing_usernames
+        
         tenant = request.user.tenant
         
         username_prefix = request.POST.get('username_prefix', 'customer')
@@ -4833,100 +4693,108 @@ def api_bulk_create_customers(request):
         generate_passwords = request.POST.get('generate_passwords') == 'on'
         
         # Limit to reasonable number
-        if count > 100:
-            count = 100
+        count = max(0, min(count, BULK_CREATE_MAX))
         
         # Get plan if selected
         default_plan = None
         if plan_id:
             try:
                 default_plan = SubscriptionPlan.objects.get(id=plan_id, tenant=tenant, is_active=True)
-            except SubscriptionPlan.DoesNotExist:
+            except (SubscriptionPlan.DoesNotExist, ValidationError):
                 pass
         
-        created_count = 0
-        customers_data = []
+        usernames = [f"{username_prefix}{start_number + i:03d}" for i in range(count)]
         
-        for i in range(count):
-            try:
-                # Generate customer data
-                customer_num = start_number + i
-                username = f"{username_prefix}{customer_num:03d}"
-                email = f"{username}{email_domain}"
-                
-                # Check if username already exists
-                if CustomUser.objects.filter(username=username).exists():
-                    continue
-                
-                # Generate password
-                if generate_passwords:
-                    password = CustomUser.objects.make_random_password(length=10)
-                else:
-                    password = f"{username}123"
-                
-                # Create user
-                new_user = CustomUser.objects.create_user(
-                    username=username,
-                    email=email,
-                    password=password
-                )
-                
-                new_user.tenant = tenant
-                new_user.role = 'customer'
-                new_user.is_active_customer = auto_activate
-                new_user.registration_status = 'approved' if auto_activate else 'pending'
-                new_user.registration_date = timezone.now()
-                
-                # Generate account number
-                timestamp = int(timezone.now().timestamp())
-                new_user.company_account_number = f"{tenant.id:03d}{timestamp % 1000000:06d}"
-                
-                if auto_activate:
-                    new_user.approval_date = timezone.now()
-                    new_user.approved_by = request.user
-                
-                new_user.save()
-                
-                # Create subscription if plan is selected
-                if default_plan:
-                    Subscription.objects.create(
-                        user=new_user,
-                        plan=default_plan,
-                        is_active=auto_activate,
-                        start_date=timezone.now(),
-                        end_date=timezone.now() + timedelta(days=default_plan.duration_days)
-                    )
-                    
-                    if auto_activate:
-                        new_user.next_payment_date = timezone.now() + timedelta(days=default_plan.duration_days)
-                        new_user.save()
-                
-                created_count += 1
-                customers_data.append({
-                    'username': username,
-                    'email': email,
-                    'password': password,
-                    'status': 'Active' if auto_activate else 'Pending'
-                })
-                
-            except Exception as e:
-                print(f"Error creating customer {username}: {e}")
+        if count > BULK_CREATE_SYNC_MAX:
+            # Hashing hundreds of passwords takes minutes on one CPU: stage them and import in the background
+            job = create_import_job(
+                tenant, request.user, f"Bulk create: {username_prefix}", 'bulk',
+                ((row_number, {'username': username, 'email': f"{username}{email_domain}"})
+                 for row_number, username in enumerate(usernames, start=1)),
+            )
+            queue_import(job, {
+                'default_plan_id': str(default_plan.id) if default_plan else None,
+                'generate_passwords': generate_passwords,
+                'auto_activate': auto_activate,
+            })
+            request.session['import_job_id'] = job.id
+            return JsonResponse({
+                'success': True,
+                'queued': True,
+                'job_id': job.id,
+                'status_url': reverse('api_import_job_status', args=[job.id]),
+                'message': f'Creating {job.valid_rows} customers in the background',
+                'redirect_url': f"{reverse('isp_import_results')}?job={job.id}"
+            }, status=202)
+        
+        taken = existing_usernames(usernames)
+        
+        accounts = []
+        for username in usernames:
+            if username in taken:
                 continue
+            accounts.append({
+                'username': username,
+                'email': f"{username}{email_domain}",
+                'password': CustomUser.objects.make_random_password(length=10) if generate_passwords else f"{username}123",
+            })
         
-        # Store results in session
-        request.session['bulk_create_results'] = {
-            'created_count': created_count,
-            'customers': customers_data
-        }
+        customers = bulk_provision_customers(
+            tenant, accounts, plan=default_plan, auto_activate=auto_activate, approved_by=request.user
+        )
+        
+        # Recorded as a finished import so the results page can show it
+        purge_old_jobs()
+        now = timezone.now()
+        job = CustomerImportJob.objects.create(
+            tenant=tenant,
+            created_by=request.user,
+            file_name=f"Bulk create: {username_prefix}",
+            file_type='bulk',
+            status='completed',
+            options={
+                'default_plan_id': str(default_plan.id) if default_plan else None,
+                'generate_passwords': generate_passwords,
+                'auto_activate': auto_activate,
+            },
+            total_rows=count,
+            valid_rows=len(customers),
+            invalid_rows=len(taken),
+            processed_rows=len(customers),
+            imported_rows=len(customers),
+            started_at=now,
+            finished_at=now,
+        )
+        created = {customer.username: customer for customer in customers}
+        passwords = {account['username']: account['password'] for account in accounts}
+        rows = []
+        for row_number, username in enumerate(usernames, start=1):
+            customer = created.get(username)
+            rows.append(CustomerImportRow(
+                job=job,
+                row_number=row_number,
+                data={
+                    'username': username,
+                    'email': customer.email if customer else f"{username}{email_domain}",
+                    'phone': '', 'first_name': '', 'last_name': '', 'address': '',
+                },
+                status='imported' if customer else 'invalid',
+                error='' if customer else f'Username "{username}" already exists',
+                customer=customer,
+                password=passwords[username] if customer and generate_passwords else '',
+            ))
+        CustomerImportRow.objects.bulk_create(rows, batch_size=500)
+        request.session['import_job_id'] = job.id
         
         return JsonResponse({
             'success': True,
-            'created_count': created_count,
-            'message': f'Successfully created {created_count} customers',
-            'redirect_url': reverse('isp_import_results')
+            'created_count': len(customers),
+            'message': f'Successfully created {len(customers)} customers',
+            'redirect_url': f"{reverse('isp_import_results')}?job={job.id}"
         })
         
     except Exception as e:
+        logging.getLogger(__name__).error(f"Bulk customer creation failed: {e}")
         return JsonResponse({'success': False, 'error': str(e)})
 
 @login_required
@@ -5106,18 +4974,23 @@ def isp_sms_compose(request):
                     campaign.total_recipients = recipients.count()
                     campaign.save()
                     
+                    # Estimate from the segment count of each personalised message
+                    from .sms_templates import compile_message
+                    compiled = compile_message(template.content if template else custom_message)
+                    segments = compiled.count_segments(campaign.recipients.all())
+                    estimate = f'{segments} SMS parts, est. cost {segments * sms_provider.cost_per_sms:.2f}'
+                    
                     # Send immediately if scheduled for now
                     if schedule_type == 'now':
-                        # Queue for sending
-                        from .sms_service import send_bulk_sms_to_customers
-                        success, result = send_bulk_sms_to_customers(campaign)
-                        
-                        if success:
-                            messages.success(request, f'Bulk SMS campaign started! {result}')
-                        else:
-                            messages.error(request, f'Failed to start campaign: {result}')
+                        # Sent in the background once the campaign is committed
+                        from .sms_dispatch import queue_campaign
+                        queue_campaign(campaign)
+                        messages.success(
+                            request,
+                            f'Bulk SMS campaign started! Sending to {campaign.total_recipients} customers ({estimate}).'
+                        )
                     else:
-                        messages.success(request, f'Bulk SMS campaign scheduled for {scheduled_datetime}')
+                        messages.success(request, f'Bulk SMS campaign scheduled for {scheduled_datetime} ({estimate})')
                     
                     return redirect('isp_sms_campaign_detail', campaign_id=campaign.id)
                     
@@ -5164,17 +5037,13 @@ def isp_sms_campaign_detail(request, campaign_id):
     # Get SMS logs for this campaign
     sms_logs = SMSLog.objects.filter(bulk_sms=campaign).select_related('customer')
     
-    # Get delivery statistics
-    stats = {
-        'total': sms_logs.count(),
-        'sent': sms_logs.filter(status='sent').count(),
-        'delivered': sms_logs.filter(status='delivered').count(),
-        'failed': sms_logs.filter(status='failed').count(),
-        'pending': sms_logs.filter(status='pending').count(),
-    }
+    # Get delivery statistics and cost in one query
+    from .sms_service import summarize_sms_logs
+    stats = summarize_sms_logs(sms_logs)
+    total_cost = stats['cost']
     
-    # Calculate cost
-    total_cost = sum([log.cost for log in sms_logs if log.cost])
+    # Latest messages only; the full list is paged in the SMS logs view
+    sms_logs = sms_logs.order_by('-id')[:SMS_LOGS_PER_PAGE]
     
     context = {
         'tenant': tenant,
@@ -5395,6 +5264,7 @@ def isp_sms_logs(request):
     date_from = request.GET.get('date_from')
     date_to = request.GET.get('date_to')
     customer_id = request.GET.get('customer_id')
+    campaign_id = request.GET.get('campaign')
     
     # Query logs
     logs = SMSLog.objects.filter(tenant=tenant).select_related('customer', 'bulk_sms')
@@ -5412,16 +5282,17 @@ def isp_sms_logs(request):
     if customer_id:
         logs = logs.filter(customer_id=customer_id)
     
-    # Order and paginate
-    logs = logs.order_by('-sent_at', '-created_at')
+    if campaign_id:
+        logs = logs.filter(bulk_sms_id=campaign_id)
     
-    paginator = Paginator(logs, 50)
-    page = request.GET.get('page', 1)
-    
-    try:
-        logs_page = paginator.page(page)
-    except (PageNotAnInteger, EmptyPage):
-        logs_page = paginator.page(1)
+    # Keyset pagination, newest first
+    logs_page = keyset_paginate(
+        logs,
+        ('-id',),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        page_size=SMS_LOGS_PER_PAGE,
+    )
     
     # Get customers for filter dropdown
     customers = CustomUser.objects.filter(
@@ -5430,11 +5301,18 @@ def isp_sms_logs(request):
         phone__isnull=False
     ).exclude(phone__exact='')[:100]
     
-    # Statistics
-    total_logs = logs.count()
-    total_sent = logs.filter(status='sent').count()
-    total_failed = logs.filter(status='failed').count()
-    total_cost = sum([log.cost for log in logs if log.cost])
+    # Statistics: the daily counters when unfiltered, otherwise one aggregate over the filtered logs
+    from .sms_service import get_sms_statistics, summarize_sms_logs
+    if status_filter or date_from or date_to or customer_id or campaign_id:
+        stats = summarize_sms_logs(logs)
+    else:
+        totals = get_sms_statistics(tenant)
+        stats = {
+            'total': totals['total_count'],
+            'sent': totals['total_successful'],
+            'failed': totals['total_failed'],
+            'cost': totals['total_cost'],
+        }
     
     context = {
         'tenant': tenant,
@@ -5444,12 +5322,8 @@ def isp_sms_logs(request):
         'date_from': date_from,
         'date_to': date_to,
         'customer_id': customer_id,
-        'stats': {
-            'total': total_logs,
-            'sent': total_sent,
-            'failed': total_failed,
-            'cost': total_cost,
-        },
+        'campaign_id': campaign_id,
+        'stats': stats,
         'page_title': 'SMS Logs',
         'page_subtitle': 'View SMS sending history',
         'breadcrumbs': [
@@ -5496,27 +5370,23 @@ def api_send_quick_sms(request):
             return JsonResponse({'success': False, 'error': 'No valid customers found'})
         
         # Create bulk SMS campaign
-        campaign = BulkSMS.objects.create(
-            tenant=tenant,
-            admin=request.user,
-            custom_message=message,
-            status='sending',
-            total_recipients=customers.count()
-        )
-        campaign.recipients.set(customers)
-        
-        # Send SMS
-        from .sms_service import send_bulk_sms_to_customers
-        success, result = send_bulk_sms_to_customers(campaign)
+        from .sms_dispatch import queue_campaign
+        with transaction.atomic():
+            campaign = BulkSMS.objects.create(
+                tenant=tenant,
+                admin=request.user,
+                custom_message=message,
+                status='draft',
+                total_recipients=customers.count()
+            )
+            campaign.recipients.set(customers)
+            queue_campaign(campaign)
         
-        if success:
-            return JsonResponse({
-                'success': True,
-                'message': f'Quick SMS sent to {campaign.sent_count} customers',
-                'campaign_id': campaign.id
-            })
-        else:
-            return JsonResponse({'success': False, 'error': result})
+        return JsonResponse({
+            'success': True,
+            'message': f'Quick SMS queued for {campaign.total_recipients} customers',
+            'campaign_id': campaign.id
+        })
             
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
@@ -13,81 +13,16 @@ import hashlib
 from django.views import View
 from decimal import Decimal, InvalidOperation
 from .models import CustomUser, CustomerLocation, ISPZone
+from .zones import zone_contains, recount_zones
+from .customer_map import (
+    get_customer_features, zone_features, parse_bbox, parse_zoom, cluster_features, map_summary, map_extent,
+)
 from billing.models import Subscription
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-# Helper function to determine pin color
-def get_pin_color(user, subscription):
-    """Determine pin color based on user status"""
-    try:
-        # If no location or unverified
-        if not getattr(user, 'latitude') or not getattr(user, 'longitude'):
-            return '#9CA3AF'  # Gray - No location
-        
-        if not getattr(user, 'location_verified', False):
-            return '#FBBF24'  # Yellow - Unverified
-        
-        # Check if user is active customer
-        if not getattr(user, 'is_active_customer', False):
-            return '#DC2626'  # Red - Inactive customer
-        
-        # Check subscription status
-        if subscription and subscription.is_active:
-            days_remaining = getattr(subscription, 'days_remaining', 0)
-            
-            # Check if subscription is currently active (between start and end dates)
-            now = timezone.now()
-            is_currently_active = (
-                subscription.start_date <= now <= subscription.end_date
-            )
-            
-            if not is_currently_active:
-                return '#DC2626'  # Red - Subscription not active
-            
-            # Determine color based on days remaining and online status
-            if days_remaining <= 0:
-                return '#EF4444'  # Red - Expired
-            elif days_remaining <= 3:
-                return '#F97316'  # Orange - Expiring soon (≤3 days)
-            elif days_remaining <= 7:
-                return '#EAB308'  # Yellow - Expiring (≤7 days)
-            else:
-                # Check online status - THIS IS THE KEY PART
-                try:
-                    from router_manager.models import Device, Router
-                    
-                    # Check if user has any router
-                    user_router = Router.objects.filter(user=user).first()
-                    
-                    if user_router:
-                        # Check if router is online
-                        if user_router.is_online:
-                            return '#10B981'  # Green - Online and active
-                        else:
-                            # Check if any devices are online (backup check)
-                            online_devices = Device.objects.filter(router=user_router, is_online=True).count()
-                            if online_devices > 0:
-                                return '#10B981'  # Green - Online via devices
-                            else:
-                                return '#3B82F6'  # Blue - Offline but active subscription
-                    else:
-                        # No router assigned yet
-                        return '#8B5CF6'  # Purple - No router assigned
-                        
-                except (ImportError, Exception) as e:
-                    print(f"Error checking online status for {user.username}: {e}")
-                    return '#3B82F6'  # Blue - Default if Device model not available
-        else:
-            return '#8B5CF6'  # Purple - No subscription
-    
-    except Exception as e:
-        print(f"Error in get_pin_color for user {user.username}: {e}")
-        return '#6B7280'  # Default gray
-    
-
 @login_required
 def customer_map(request):
     """Customer view: Set and view their location"""
@@ -204,10 +139,6 @@ def save_customer_location(request):
             user.address = address
         user.save()
         
-        # Clear cache after saving location
-        cache_key = f'customer_locations_{request.user.tenant.id}'
-        cache.delete(cache_key)
-        
         return JsonResponse({
             'success': True,
             'message': 'Location saved successfully',
@@ -225,195 +156,54 @@ def save_customer_location(request):
 @login_required
 @require_http_methods(['GET'])
 def get_customer_locations(request):
-    """Get customer locations for ISP map (AJAX) with caching"""
+    """Customer pins and service zones for the ISP map, as GeoJSON (AJAX)"""
     if request.user.role not in ['isp_admin', 'isp_staff']:
         return JsonResponse({'success': False, 'error': 'Access denied'})
     
     tenant = request.user.tenant
+    features = list(get_customer_features(tenant.id).values())
     
-    # Create cache key
-    cache_key = f'customer_locations_{tenant.id}'
-    
-    # Try to get from cache first
-    cached_data = cache.get(cache_key)
-    if cached_data:
-        print(f"========== USING CACHED DATA ==========")
-        return JsonResponse(cached_data)
-    
-    print(f"========== GENERATING FRESH DATA ==========")
-    print(f"Request user: {request.user.username}")
-    print(f"User role: {request.user.role}")
-    print(f"Tenant: {tenant}")
-    
-    # Get customers with location data
-    customers_with_location = CustomUser.objects.filter(
-        tenant=tenant,
-        role='customer'
-    ).exclude(
-        latitude__isnull=True,
-        longitude__isnull=True
-    ).select_related('tenant').prefetch_related('subscriptions')
-    
-    print(f"Customers with location data: {customers_with_location.count()}")
-    
-    locations = []
-    
-    # Import here to avoid circular imports
-    from router_manager.models import Router, Device
-    from billing.models import Subscription
+    response_data = {
+        'success': True,
+        'customers': {'type': 'FeatureCollection', 'features': features},
+        'zones': {'type': 'FeatureCollection', 'features': zone_features(tenant.id, len(features))},
+        'total': len(features),
+        'timestamp': timezone.now().isoformat(),
+    }
     
-    for user in customers_with_location:
-        try:
-            # Get active subscription
-            subscription = Subscription.objects.filter(
-                user=user,
-                is_active=True,
-                end_date__gte=timezone.now()
-            ).first()
-            
-            # Determine pin color based on status
-            pin_color = get_pin_color(user, subscription)
-            
-            # Get online status
-            is_online = False
-            online_devices = 0
-            
-            try:
-                # Check router status
-                user_router = Router.objects.filter(user=user).first()
-                
-                if user_router:
-                    is_online = user_router.is_online
-                    
-                    # Count online devices as backup
-                    if not is_online:
-                        online_devices = Device.objects.filter(
-                            router=user_router, 
-                            is_online=True
-                        ).count()
-                        is_online = online_devices > 0
-                
-            except Exception as e:
-                print(f"Error checking online status for {user.username}: {e}")
-            
-            # Prepare location data
-            location_data = {
-                'id': user.id,
-                'username': user.username,
-                'full_name': user.get_full_name() or user.username,
-                'email': user.email or f'{user.username}@example.com',
-                'latitude': float(user.latitude) if user.latitude else 0,
-                'longitude': float(user.longitude) if user.longitude else 0,
-                'address': user.address or 'No address specified',
-                'pin_color': pin_color,
-                'is_online': is_online,
-                'online_devices': online_devices,
-                'is_active_customer': getattr(user, 'is_active_customer', False),
-                'subscription': {
-                    'has_subscription': bool(subscription),
-                    'plan_name': subscription.plan.name if subscription and subscription.plan else 'No Plan',
-                    'days_remaining': subscription.days_remaining if subscription else 0,
-                    'is_active': subscription.is_active if subscription else False,
-                    'start_date': subscription.start_date.isoformat() if subscription and subscription.start_date else None,
-                    'end_date': subscription.end_date.isoformat() if subscription and subscription.end_date else None,
-                } if subscription else {
-                    'has_subscription': False,
-                    'plan_name': 'No Plan',
-                    'days_remaining': 0,
-                    'is_active': False,
-                    'start_date': None,
-                    'end_date': None,
-                },
-                'router': {
-                    'has_router': bool(user_router),
-                    'is_online': user_router.is_online if user_router else False,
-                    'model': user_router.model if user_router else None,
-                } if user_router else {
-                    'has_router': False,
-                    'is_online': False,
-                    'model': None,
-                },
-                'location_verified': getattr(user, 'location_verified', False),
-                'phone': getattr(user, 'phone', ''),
-                'last_login': user.last_login.isoformat() if user.last_login else None,
-            }
-            
-            locations.append(location_data)
-            
-            print(f"Added customer {user.username}: "
-                  f"lat={user.latitude}, "
-                  f"lng={user.longitude}, "
-                  f"color={pin_color}, "
-                  f"active={getattr(user, 'is_active_customer', False)}, "
-                  f"online={is_online}")
-            
-        except Exception as e:
-            print(f"Error processing customer {user.id}: {e}")
-            import traceback
-            traceback.print_exc()
+    return JsonResponse(response_data, json_dumps_params={'separators': (',', ':')})
+
+
+@login_required
+@require_http_methods(['GET'])
+def get_customer_map_clusters(request):
+    """
+    Viewport-aware customer map data (AJAX).
+    ?bbox=min_lng,min_lat,max_lng,max_lat&zoom=N returns grid clusters with
+    per-colour counts, or individual pins once zoomed in far enough.
+    """
+    if request.user.role not in ['isp_admin', 'isp_staff']:
+        return JsonResponse({'success': False, 'error': 'Access denied'})
     
-    # Get zones
-    zones = ISPZone.objects.filter(tenant=tenant, is_active=True)
-    zone_data = []
+    zoom = parse_zoom(request.GET.get('zoom'))
+    if zoom is None:
+        return JsonResponse({'success': False, 'error': 'Invalid zoom'}, status=400)
+    boxes = parse_bbox(request.GET.get('bbox')) or [(-180.0, -90.0, 180.0, 90.0)]
     
-    for zone in zones:
-        try:
-            zone_data.append({
-                'id': zone.id,
-                'name': zone.name,
-                'color': zone.color or '#3B82F6',
-                'geojson': zone.geojson if zone.geojson else {},
-                'bounds': {
-                    'min_lat': float(zone.min_lat) if zone.min_lat else -1.5,
-                    'max_lat': float(zone.max_lat) if zone.max_lat else -1.0,
-                    'min_lng': float(zone.min_lng) if zone.min_lng else 36.5,
-                    'max_lng': float(zone.max_lng) if zone.max_lng else 37.0,
-                } if zone.min_lat else {
-                    'min_lat': -1.5,
-                    'max_lat': -1.0,
-                    'min_lng': 36.5,
-                    'max_lng': 37.0,
-                },
-                'customer_count': getattr(zone, 'customer_count', 0)
-            })
-            print(f"Added zone {zone.name}")
-        except Exception as e:
-            print(f"Error processing zone {zone.id}: {e}")
-    
-    # If no zones, add a default zone
-    if not zone_data:
-        zone_data.append({
-            'id': 'default',
-            'name': 'Default Zone',
-            'color': '#3B82F6',
-            'geojson': {},
-            'bounds': {
-                'min_lat': -1.5,
-                'max_lat': -1.0,
-                'min_lng': 36.5,
-                'max_lng': 37.0,
-            },
-            'customer_count': len(locations)
-        })
-        print("Added default zone")
+    tenant_id = request.user.tenant.id
+    visible, clustered = cluster_features(tenant_id, boxes, zoom)
     
     response_data = {
         'success': True,
-        'locations': locations,
-        'zones': zone_data,
-        'total': len(locations),
+        'zoom': zoom,
+        'clustered': clustered,
+        'features': {'type': 'FeatureCollection', 'features': visible},
+        'summary': map_summary(tenant_id),
+        'extent': map_extent(tenant_id),
         'timestamp': timezone.now().isoformat(),
-        'cache_key': cache_key,
     }
     
-    # Cache the data for 5 minutes
-    cache.set(cache_key, response_data, 300)  # 5 minutes cache
-    
-    print(f"========== RESPONSE DATA CACHED ==========")
-    print(f"Returning {len(locations)} locations and {len(zone_data)} zones")
-    print(f"Cached with key: {cache_key}")
-    
-    return JsonResponse(response_data, safe=False)
+    return JsonResponse(response_data, json_dumps_params={'separators': (',', ':')})
 
 
 @login_required
@@ -488,10 +278,6 @@ def verify_customer_location(request, customer_id):
         
         customer_user.save()
         
-        # Clear cache after verification
-        cache_key = f'customer_locations_{customer_user.tenant.id}'
-        cache.delete(cache_key)
-        
         return JsonResponse({
             'success': True,
             'message': 'Location verified successfully',
@@ -641,10 +427,6 @@ def bulk_update_customer_locations(request):
                     results['errors'].append(f"Error processing row {row}: {str(e)}")
                     results['failed'] += 1
             
-            # Clear cache after bulk update
-            cache_key = f'customer_locations_{tenant.id}'
-            cache.delete(cache_key)
-            
             return JsonResponse({
                 'success': True,
                 'message': f'Processed {results["success"]} locations successfully, {results["failed"]} failed',
@@ -672,13 +454,12 @@ def assign_customer_to_zone(request, customer_id, zone_id):
         if not customer_user.has_location:
             return JsonResponse({'success': False, 'error': 'Customer has no location set'})
         
-        # Verify customer is within zone boundaries
-        if (zone.min_lat <= customer_user.latitude <= zone.max_lat and 
-            zone.min_lng <= customer_user.longitude <= zone.max_lng):
+        # Verify customer is within the zone polygon
+        if zone_contains(zone, customer_user.latitude, customer_user.longitude):
             
-            # You might want to add a field to track zone assignment
-            # For now, we'll just return success
-            zone.update_customer_count()  # Update zone statistics
+            previous_zone_id = customer_user.service_zone_id
+            CustomUser.objects.filter(pk=customer_user.pk).update(service_zone=zone)
+            recount_zones([zone.id, previous_zone_id])
             
             return JsonResponse({
                 'success': True,
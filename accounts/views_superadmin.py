@@ -10,13 +10,15 @@ from django.contrib import messages
 from django.utils import timezone
 from datetime import timedelta, datetime
 from django.db.models import Count, Sum, Q, F, Case, When, Avg
-from django.db.models.functions import ExtractYear, ExtractMonth
+from django.db.models.functions import ExtractYear, ExtractMonth, TruncMonth
 import json
 import requests
 from django.conf import settings
 from django.urls import reverse
 from accounts import models
-from accounts.models import AdminLog, AdminLog, Tenant, CustomUser, LoginActivity, VerificationLog
+from accounts.models import AdminLog, AdminLog, Tenant, CustomUser, LoginActivity, VerificationLog, TenantDailyMetrics
+from accounts import metrics
+from accounts.tenant_cache import tenant_cache
 from router_manager.models import Router, Device
 from billing.models import Payment, SubscriptionPlan, Subscription, PaystackConfiguration
 from django.db.models import Value, Case, When, DecimalField, Avg  # CORRECT
@@ -44,15 +46,11 @@ def superadmin_dashboard(request):
     # Add pending approvals count
     pending_approvals = CustomUser.objects.filter(registration_status='pending').count()
     
-    # Revenue calculations - Fixed relationship
-    total_revenue = Payment.objects.filter(status='completed').aggregate(
-        total=Sum('amount')
-    )['total'] or 0
+    # Revenue is customers' completed payments, as rolled up in TenantDailyMetrics
+    total_revenue = metrics.total_revenue()
     
-    monthly_revenue = Payment.objects.filter(
-        status='completed',
-        created_at__gte=timezone.now() - timedelta(days=30)
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    today = timezone.localdate()
+    monthly_revenue = metrics.revenue_between(metrics.last_days_start(30, today), today)
     
     # Recent activity - Fixed relationships
     recent_tenants = Tenant.objects.all().order_by('-created_at')[:5]
@@ -85,25 +83,27 @@ def superadmin_dashboard(request):
         'data': user_growth_data
     }
     
-    # Revenue by month (last 6 months) - Fixed
-    revenue_months = []
-    revenue_data = []
-    for i in range(5, -1, -1):
-        month_start = timezone.now().replace(day=1) - timedelta(days=30*i)
-        month_name = month_start.strftime('%b')
-        
-        month_revenue = Payment.objects.filter(
-            status='completed',
-            created_at__year=month_start.year,
-            created_at__month=month_start.month
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        revenue_months.append(month_name)
-        revenue_data.append(float(month_revenue))
+    # Revenue by month (last 6 months) - one GROUP BY over the daily rollup
+    month_starts = []
+    month_start = today.replace(day=1)
+    for _ in range(6):
+        month_starts.append(month_start)
+        month_start = (month_start - timedelta(days=1)).replace(day=1)
+    month_starts.reverse()
+    revenue_by_month = dict(
+        TenantDailyMetrics.objects.filter(date__gte=month_starts[0])
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(total=Sum('revenue'))
+        .values_list('month', 'total')
+    )
+    revenue_months = [month.strftime('%b') for month in month_starts]
+    revenue_data = [float(revenue_by_month.get(month, 0)) for month in month_starts]
     
-    # System metrics
-    online_routers = Router.objects.filter(is_online=True).count()
-    online_devices = Device.objects.filter(is_online=True).count()
+    # System metrics - today's gauges from the rollup
+    gauges = metrics.platform_gauges(today)
+    online_routers = gauges['online_routers']
+    online_devices = gauges['online_devices']
     
     # FIXED: Critical alerts calculation - Use date-based filtering instead of is_active field
     now = timezone.now()
@@ -729,6 +729,8 @@ def superadmin_kill_switch(request):
         if action == 'disable_platform':
             # Disable all tenants and customers
             Tenant.objects.update(is_active=False)
+            # Queryset updates skip post_save, so drop cached host lookups here
+            tenant_cache.clear()
             CustomUser.objects.filter(role='customer').update(is_active_customer=False)
             
             # Block all online devices
@@ -739,6 +741,7 @@ def superadmin_kill_switch(request):
         elif action == 'enable_platform':
             # Re-enable platform
             Tenant.objects.update(is_active=True)
+            tenant_cache.clear()
             CustomUser.objects.filter(role='customer').update(is_active_customer=True)
             Device.objects.update(is_blocked=False)
             
@@ -772,6 +775,14 @@ def superadmin_kill_switch(request):
     
     return render(request, 'admin/superadmin_kill_switch.html', context)
 
+@staff_member_required
+def superadmin_tenant_cache_stats(request):
+    """Hit/miss counters for the in-process tenant resolution cache"""
+    if not request.user.is_superuser:
+        return HttpResponseForbidden("Access denied")
+    
+    return JsonResponse({'success': True, 'stats': tenant_cache.stats()})
+
 @staff_member_required
 def superadmin_analytics(request):
     if not request.user.is_superuser:
@@ -1387,41 +1398,26 @@ def superadmin_tenant_analytics(request, tenant_id):
         return HttpResponseForbidden("Access denied")
     
     tenant = get_object_or_404(Tenant, id=tenant_id)
-    days = int(request.GET.get('days', 30))
+    days = max(1, int(request.GET.get('days', 30)))
     
     # Date range calculations
     end_date = timezone.now()
-    start_date = end_date - timedelta(days=days)
     
-    # Revenue calculations
-    total_revenue = Payment.objects.filter(
-        user__tenant=tenant,
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    
-    period_revenue = Payment.objects.filter(
-        user__tenant=tenant,
-        status='completed',
-        created_at__gte=start_date
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    # Revenue and customer figures come from the TenantDailyMetrics rollup
+    today = timezone.localdate()
+    period_start = metrics.last_days_start(days, today)
+    rollup = TenantDailyMetrics.objects.filter(tenant=tenant).aggregate(
+        revenue=Sum('revenue'),
+        new_customers=Sum('new_customers', filter=Q(date__gte=period_start)),
+    )
+    total_revenue = rollup['revenue'] or Decimal('0')
+    period_revenue = metrics.revenue_between(period_start, today, tenant_id=tenant.id)
     
     # Customer statistics
-    active_customers = CustomUser.objects.filter(
-        tenant=tenant,
-        role='customer',
-        is_active_customer=True
-    ).count()
-    
-    new_customers = CustomUser.objects.filter(
-        tenant=tenant,
-        role='customer',
-        date_joined__gte=start_date
-    ).count()
-    
-    total_customers = CustomUser.objects.filter(
-        tenant=tenant,
-        role='customer'
-    ).count()
+    active_customers = metrics.get_today_metrics(tenant).active_customers
+    new_customers = rollup['new_customers'] or 0
+    # Counted live: the rollup only sees joins, not later tenant or role changes
+    total_customers = CustomUser.objects.filter(tenant=tenant, role='customer').count()
     
     # Payment statistics
     payment_stats_query = Payment.objects.filter(user__tenant=tenant).aggregate(
@@ -1450,50 +1446,33 @@ def superadmin_tenant_analytics(request, tenant_id):
         avg_revenue_per_customer = total_revenue / Decimal(str(total_customers))
     
     # Revenue growth calculation
-    previous_period_end = start_date - timedelta(days=1)
-    previous_period_start = previous_period_end - timedelta(days=days)
-    
-    previous_revenue = Payment.objects.filter(
-        user__tenant=tenant,
-        status='completed',
-        created_at__gte=previous_period_start,
-        created_at__lte=previous_period_end
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    previous_period_end = period_start - timedelta(days=1)
+    previous_revenue = metrics.revenue_between(
+        metrics.last_days_start(days, previous_period_end), previous_period_end, tenant_id=tenant.id
+    )
     
     revenue_growth = Decimal('0')
     if previous_revenue > 0:
         revenue_growth = round(((period_revenue - previous_revenue) / previous_revenue) * 100, 1)
     
-    # Revenue trend data (daily)
-    revenue_data = []
-    for i in range(days, 0, -1):
-        date = end_date - timedelta(days=i)
-        daily_revenue = Payment.objects.filter(
-            user__tenant=tenant,
-            status='completed',
-            created_at__date=date.date()
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        revenue_data.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'revenue': float(daily_revenue)
-        })
+    # Revenue trend and customer growth (daily) from the rollup
+    dates = metrics.last_n_days(days, today)
+    daily_revenue = metrics.daily_series(tenant.id, dates[0], dates[-1], 'revenue')
+    daily_new_customers = metrics.daily_series(tenant.id, dates[0], dates[-1], 'new_customers')
+    
+    revenue_data = [
+        {'date': date.strftime('%Y-%m-%d'), 'revenue': float(daily_revenue.get(date, 0))}
+        for date in dates
+    ]
     
-    # Customer growth data
+    # Walk back from the live total so the series ends at the current count
     customer_data = []
-    cumulative_customers = 0
-    for i in range(days, 0, -1):
-        date = end_date - timedelta(days=i)
-        # Get total customers up to this date
-        customers_up_to_date = CustomUser.objects.filter(
-            tenant=tenant,
-            role='customer',
-            date_joined__date__lte=date.date()
-        ).count()
-        
+    cumulative_customers = total_customers - sum(daily_new_customers.values())
+    for date in dates:
+        cumulative_customers += daily_new_customers.get(date, 0)
         customer_data.append({
             'date': date.strftime('%Y-%m-%d'),
-            'customers': customers_up_to_date
+            'customers': cumulative_customers
         })
     
     # Top plans by revenue
@@ -1546,36 +1525,26 @@ def superadmin_tenant_analytics(request, tenant_id):
         else:
             plan['trend'] = 100.0 if current_revenue > 0 else 0.0
     
-    # Monthly performance
+    # Monthly performance - one GROUP BY over the rollup for seven months
+    month_starts = []
+    month_start = today.replace(day=1)
+    for _ in range(7):
+        month_starts.append(month_start)
+        month_start = (month_start - timedelta(days=1)).replace(day=1)
+    month_starts.reverse()
+    monthly_rollup = {
+        row['month']: row
+        for row in TenantDailyMetrics.objects.filter(tenant=tenant, date__gte=month_starts[0])
+        .annotate(month=TruncMonth('date'))
+        .values('month')
+        .annotate(revenue=Sum('revenue'), customers=Sum('new_customers'))
+    }
+    
     monthly_performance = []
-    for i in range(5, -1, -1):
-        month_start = end_date.replace(day=1) - timedelta(days=30*i)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        month_revenue = Payment.objects.filter(
-            user__tenant=tenant,
-            status='completed',
-            created_at__gte=month_start,
-            created_at__lte=month_end
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        month_customers = CustomUser.objects.filter(
-            tenant=tenant,
-            role='customer',
-            date_joined__gte=month_start,
-            date_joined__lte=month_end
-        ).count()
-        
-        # Previous month for growth calculation
-        prev_month_start = month_start - timedelta(days=30)
-        prev_month_end = month_start - timedelta(days=1)
-        
-        prev_month_revenue = Payment.objects.filter(
-            user__tenant=tenant,
-            status='completed',
-            created_at__gte=prev_month_start,
-            created_at__lte=prev_month_end
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    for previous_month, month_start in zip(month_starts, month_starts[1:]):
+        month_revenue = monthly_rollup.get(month_start, {}).get('revenue') or Decimal('0')
+        month_customers = monthly_rollup.get(month_start, {}).get('customers') or 0
+        prev_month_revenue = monthly_rollup.get(previous_month, {}).get('revenue') or Decimal('0')
         
         growth = Decimal('0')
         if prev_month_revenue > 0:
@@ -0,0 +1,267 @@
+# accounts/zones.py
+"""
+Point-in-polygon assignment of customers to ISP service zones.
+
+Each tenant's active zones are compiled into a ZoneIndex: the polygons
+from ISPZone.geojson (bounding box when none is stored) plus a uniform
+grid over their extent, where each cell lists the zones whose bounds
+touch it. Lookups only run the even-odd ray test against the zones of
+the point's cell. Bulk runs do the same with NumPy over every customer
+at once.
+
+Where zones overlap, the smallest one wins.
+"""
+import threading
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+
+from .models import CustomUser, ISPZone
+
+# Grid cells per axis over the extent of a tenant's zones
+GRID_CELLS = 32
+BULK_UPDATE_BATCH = 1000
+
+_index_lock = threading.Lock()
+_indexes = {}
+
+
+def _rings_from_geojson(geojson):
+    """List of polygons, each a list of rings ([[lng, lat], ...]); first ring is the outer boundary"""
+    if not geojson:
+        return []
+    kind = geojson.get('type')
+    if kind == 'FeatureCollection':
+        polygons = []
+        for feature in geojson.get('features') or []:
+            polygons.extend(_rings_from_geojson(feature))
+        return polygons
+    if kind == 'Feature':
+        return _rings_from_geojson(geojson.get('geometry'))
+    if kind == 'Polygon':
+        return [geojson.get('coordinates') or []]
+    if kind == 'MultiPolygon':
+        return list(geojson.get('coordinates') or [])
+    return []
+
+
+def _bbox_polygon(zone):
+    min_lng, min_lat = float(zone.min_lng), float(zone.min_lat)
+    max_lng, max_lat = float(zone.max_lng), float(zone.max_lat)
+    return [[[[min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat], [min_lng, max_lat]]]]
+
+
+def _points_in_ring(lngs, lats, ring):
+    """Even-odd ray test of many points against one ring"""
+    x1, y1 = ring[:, 0], ring[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    inside = np.zeros(lngs.shape, dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(len(x1)):
+            crosses = (y1[i] > lats) != (y2[i] > lats)
+            if not crosses.any():
+                continue
+            x_at = (x2[i] - x1[i]) * (lats - y1[i]) / (y2[i] - y1[i]) + x1[i]
+            inside ^= crosses & (lngs < x_at)
+    return inside
+
+
+def _ring_area(ring):
+    x, y = ring[:, 0], ring[:, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+class _Zone:
+    def __init__(self, zone_id, polygons):
+        self.id = zone_id
+        self.polygons = [
+            [np.asarray(ring, dtype=float)[:, :2] for ring in polygon if len(ring) >= 3]
+            for polygon in polygons
+        ]
+        self.polygons = [polygon for polygon in self.polygons if polygon]
+        points = np.concatenate([polygon[0] for polygon in self.polygons]) if self.polygons else np.empty((0, 2))
+        self.bounds = (points[:, 0].min(), points[:, 1].min(), points[:, 0].max(), points[:, 1].max()) if len(points) else None
+        self.area = sum(_ring_area(polygon[0]) for polygon in self.polygons)
+
+    def contains(self, lngs, lats):
+        inside = np.zeros(lngs.shape, dtype=bool)
+        for outer, *holes in self.polygons:
+            in_polygon = _points_in_ring(lngs, lats, outer)
+            for hole in holes:
+                in_polygon &= ~_points_in_ring(lngs, lats, hole)
+            inside |= in_polygon
+        return inside
+
+
+class ZoneIndex:
+    """Uniform-grid spatial index over one tenant's zone polygons"""
+
+    def __init__(self, zones):
+        compiled = []
+        for zone in zones:
+            polygons = _rings_from_geojson(zone.geojson) or _bbox_polygon(zone)
+            item = _Zone(zone.id, polygons)
+            if item.bounds:
+                compiled.append(item)
+        # Smallest first, so nested zones win over the ones that contain them
+        self.zones = sorted(compiled, key=lambda item: item.area)
+
+        if not self.zones:
+            self.extent = None
+            return
+        bounds = np.array([item.bounds for item in self.zones])
+        self.extent = (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+        self.cell_width = max((self.extent[2] - self.extent[0]) / GRID_CELLS, 1e-9)
+        self.cell_height = max((self.extent[3] - self.extent[1]) / GRID_CELLS, 1e-9)
+
+        # cells[z] is a flat boolean map of the grid cells zone z overlaps
+        self.cells = np.zeros((len(self.zones), GRID_CELLS * GRID_CELLS), dtype=bool)
+        for z, item in enumerate(self.zones):
+            col0, row0 = self._cell(item.bounds[0], item.bounds[1])
+            col1, row1 = self._cell(item.bounds[2], item.bounds[3])
+            grid = self.cells[z].reshape(GRID_CELLS, GRID_CELLS)
+            grid[row0:row1 + 1, col0:col1 + 1] = True
+
+    def _cell(self, lng, lat):
+        col = int(min(max((lng - self.extent[0]) // self.cell_width, 0), GRID_CELLS - 1))
+        row = int(min(max((lat - self.extent[1]) // self.cell_height, 0), GRID_CELLS - 1))
+        return col, row
+
+    def _cell_ids(self, lngs, lats):
+        """Flat grid cell per point, -1 outside the indexed extent"""
+        cols = np.floor((lngs - self.extent[0]) / self.cell_width).astype(int)
+        rows = np.floor((lats - self.extent[1]) / self.cell_height).astype(int)
+        # Points on the far edge of the extent belong to the last cell
+        cols[lngs == self.extent[2]] = GRID_CELLS - 1
+        rows[lats == self.extent[3]] = GRID_CELLS - 1
+        outside = (cols < 0) | (cols >= GRID_CELLS) | (rows < 0) | (rows >= GRID_CELLS)
+        cell_ids = rows * GRID_CELLS + cols
+        cell_ids[outside] = -1
+        return cell_ids
+
+    def locate_many(self, lngs, lats):
+        """Zone id per point (0 where no zone contains it)"""
+        lngs = np.asarray(lngs, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        result = np.zeros(lngs.shape, dtype=np.int64)
+        if not self.zones or not len(lngs):
+            return result
+        cell_ids = self._cell_ids(lngs, lats)
+        unassigned = cell_ids >= 0
+        safe_cells = np.where(unassigned, cell_ids, 0)
+        for z, item in enumerate(self.zones):
+            candidates = np.flatnonzero(unassigned & self.cells[z][safe_cells])
+            if not len(candidates):
+                continue
+            hits = candidates[item.contains(lngs[candidates], lats[candidates])]
+            result[hits] = item.id
+            unassigned[hits] = False
+        return result
+
+    def locate(self, lng, lat):
+        """Zone id containing a single point, or None"""
+        zone_id = int(self.locate_many([float(lng)], [float(lat)])[0])
+        return zone_id or None
+
+
+def get_zone_index(tenant_id):
+    """
+    ZoneIndex for a tenant, rebuilt only when its zones change. The
+    signature query (ids and updated_at) is the only per-call cost.
+    """
+    zones = ISPZone.objects.filter(tenant_id=tenant_id, is_active=True)
+    signature = tuple(zones.order_by('id').values_list('id', 'updated_at'))
+    with _index_lock:
+        cached = _indexes.get(tenant_id)
+        if cached and cached[0] == signature:
+            return cached[1]
+    index = ZoneIndex(zones.only('id', 'geojson', 'min_lat', 'max_lat', 'min_lng', 'max_lng'))
+    with _index_lock:
+        _indexes[tenant_id] = (signature, index)
+    return index
+
+
+def zone_contains(zone, lat, lng):
+    """True point-in-polygon test for a single zone"""
+    return bool(ZoneIndex([zone]).locate(lng, lat))
+
+
+def recount_zones(zone_ids):
+    """Refresh customer_count for the given zones from their customers' assignments"""
+    zone_ids = {zone_id for zone_id in zone_ids if zone_id}
+    if not zone_ids:
+        return
+    counts = dict(
+        CustomUser.objects.filter(service_zone_id__in=zone_ids, role='customer')
+        .values('service_zone_id')
+        .annotate(count=Count('id'))
+        .values_list('service_zone_id', 'count')
+    )
+    for zone_id in zone_ids:
+        ISPZone.objects.filter(pk=zone_id).update(customer_count=counts.get(zone_id, 0))
+
+
+def assign_customer(customer, counted_zone_id=None):
+    """
+    Resolve and store one customer's zone. `counted_zone_id` is the zone
+    the stored counts currently include the customer in, when known.
+    Returns the zone id (or None).
+    """
+    zone_id = None
+    if customer.tenant_id and customer.latitude is not None and customer.longitude is not None:
+        zone_id = get_zone_index(customer.tenant_id).locate(customer.longitude, customer.latitude)
+
+    if zone_id != customer.service_zone_id:
+        CustomUser.objects.filter(pk=customer.pk).update(service_zone_id=zone_id)
+    if zone_id != counted_zone_id or zone_id != customer.service_zone_id:
+        recount_zones({zone_id, counted_zone_id, customer.service_zone_id})
+    customer.service_zone_id = zone_id
+    return zone_id
+
+
+def recompute_tenant_zones(tenant_id):
+    """
+    Assign every located customer of a tenant in one vectorised pass and
+    rewrite all zone counts. Returns (customers_checked, assignments_changed).
+    """
+    customers = CustomUser.objects.filter(tenant_id=tenant_id, role='customer')
+    rows = list(customers.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).values_list('id', 'longitude', 'latitude', 'service_zone_id'))
+
+    index = get_zone_index(tenant_id)
+    if rows:
+        ids, lngs, lats, current = zip(*rows)
+        located = index.locate_many(np.array(lngs, dtype=float), np.array(lats, dtype=float))
+    else:
+        ids, current, located = (), (), np.zeros(0, dtype=np.int64)
+
+    changed = {}
+    for customer_id, old_zone, new_zone in zip(ids, current, located):
+        new_zone = int(new_zone) or None
+        if new_zone != old_zone:
+            changed.setdefault(new_zone, []).append(customer_id)
+
+    with transaction.atomic():
+        for zone_id, customer_ids in changed.items():
+            for start in range(0, len(customer_ids), BULK_UPDATE_BATCH):
+                CustomUser.objects.filter(
+                    id__in=customer_ids[start:start + BULK_UPDATE_BATCH]
+                ).update(service_zone_id=zone_id)
+        # Customers who lost their coordinates drop out of every zone
+        customers.filter(service_zone__isnull=False).filter(
+            latitude__isnull=True
+        ).update(service_zone=None)
+        customers.filter(service_zone__isnull=False).filter(
+            longitude__isnull=True
+        ).update(service_zone=None)
+
+        zone_ids, zone_counts = np.unique(located[located > 0], return_counts=True)
+        counts = dict(zip(zone_ids.tolist(), zone_counts.tolist()))
+        zones = list(ISPZone.objects.filter(tenant_id=tenant_id))
+        for zone in zones:
+            zone.customer_count = counts.get(zone.id, 0)
+        ISPZone.objects.bulk_update(zones, ['customer_count'])
+
+    return len(rows), sum(len(customer_ids) for customer_ids in changed.values())
@@ -6,7 +6,8 @@ from .models import (
     DataVendor, BulkDataPackage, ISPBulkPurchase, DataDistributionLog,
     DataWallet, WalletTransaction, ExternalDataSource,
     DatabaseConnectionConfig, APIIntegrationConfig, DataImportLog,
-    BulkBandwidthPackage, ISPBandwidthPurchase, ISPDataPurchase
+    BulkBandwidthPackage, ISPBandwidthPurchase, ISPDataPurchase,
+    SubscriptionActivation
 )
 from django.utils import timezone
 
@@ -43,25 +44,25 @@ class PaymentAdmin(admin.ModelAdmin):
                 payment.status = 'completed'
                 payment.approved_by = request.user
                 payment.approval_date = timezone.now()
-                payment.save()  # This triggers auto-activation
+                payment.save()  # This queues subscription activation
                 
                 # Log the action
                 from django.contrib import messages
                 self.message_user(
                     request, 
-                    f"Payment {payment.reference} approved and subscription activated", 
+                    f"Payment {payment.reference} approved and queued for activation", 
                     messages.SUCCESS
                 )
         
-        self.message_user(request, f"{queryset.count()} payments approved and subscriptions activated.")
+        self.message_user(request, f"{queryset.count()} payments approved and queued for subscription activation.")
     
     @admin.action(description='Mark as completed (auto-activate)')
     def mark_as_completed(self, request, queryset):
         for payment in queryset:
             payment.status = 'completed'
-            payment.save()  # This triggers auto-activation
+            payment.save()  # This queues subscription activation
         
-        self.message_user(request, f"{queryset.count()} payments marked as completed and subscriptions activated.")
+        self.message_user(request, f"{queryset.count()} payments marked as completed and queued for subscription activation.")
     
     def save_model(self, request, obj, form, change):
         # If status changed to completed, log who approved it
@@ -73,6 +74,19 @@ class PaymentAdmin(admin.ModelAdmin):
                 
         super().save_model(request, obj, form, change)
 
+@admin.register(SubscriptionActivation)
+class SubscriptionActivationAdmin(admin.ModelAdmin):
+    list_display = ['payment', 'status', 'attempts', 'available_at', 'processed_at']
+    list_filter = ['status']
+    search_fields = ['payment__reference', 'payment__user__username']
+    readonly_fields = ['created_at', 'processed_at', 'last_error']
+    actions = ['retry_activations']
+    
+    @admin.action(description='Retry selected activations')
+    def retry_activations(self, request, queryset):
+        updated = queryset.exclude(status='done').update(status='pending', available_at=timezone.now())
+        self.message_user(request, f"{updated} activations queued for retry.")
+
 # Register other models
 @admin.register(SubscriptionPlan)
 class SubscriptionPlanAdmin(admin.ModelAdmin):
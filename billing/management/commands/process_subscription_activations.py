@@ -0,0 +1,57 @@
+# billing/management/commands/process_subscription_activations.py
+import time
+from django.core.management.base import BaseCommand
+from billing.services import activation_queue
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Activate subscriptions for completed payments queued by Payment.save()'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of queued payments to process per batch',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep draining the queue instead of exiting when it is empty',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=5.0,
+            help='Seconds to wait between polls when the queue is empty (with --loop)',
+        )
+    
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        
+        queued = activation_queue.enqueue_missed()
+        if queued:
+            self.stdout.write(f"Queued {queued} completed payments missing activation")
+        
+        while True:
+            results = activation_queue.process_batch(batch_size=batch_size)
+            processed = sum(results.values())
+            
+            if processed:
+                self.stdout.write(
+                    f"Activated: {results['activated']}, "
+                    f"Skipped: {results['skipped']}, Failed: {results['failed']}"
+                )
+            
+            if processed >= batch_size:
+                # Queue still has work - go again immediately
+                continue
+            
+            if not options['loop']:
+                break
+            
+            time.sleep(options['sleep'])
+        
+        self.stdout.write(self.style.SUCCESS("Subscription activation queue drained"))
@@ -1183,16 +1183,63 @@ class Payment(models.Model):
     
     def save(self, *args, **kwargs):
         # Check if status changed to completed
+        became_completed = False
         if self.pk:
-            old_payment = Payment.objects.get(pk=self.pk)
-            if old_payment.status != 'completed' and self.status == 'completed':
-                # Status changed to completed, trigger auto-activation
-                self.auto_activate_subscription()
+            old_payment = Payment.objects.filter(pk=self.pk).only('status').first()
+            if old_payment and old_payment.status != 'completed' and self.status == 'completed':
+                became_completed = True
         elif self.status == 'completed':
             # New payment marked as completed
-            self.auto_activate_subscription()
+            became_completed = True
+        # Read by post_save receivers (billing.signals)
+        self._became_completed = became_completed
         
         super().save(*args, **kwargs)
+        
+        # Activation happens in the process_subscription_activations worker
+        if became_completed and not self.subscription_activated:
+            SubscriptionActivation.enqueue(self)
+
+
+class SubscriptionActivation(models.Model):
+    """
+    Durable queue of completed payments waiting for subscription activation.
+    Fed from Payment.save() and drained by process_subscription_activations.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='activation')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=tz.now)
+    created_at = models.DateTimeField(default=tz.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'subscription_activation_queue'
+        ordering = ['available_at']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+    
+    def __str__(self):
+        return f"Activation for {self.payment_id} - {self.status}"
+    
+    @classmethod
+    def enqueue(cls, payment):
+        """Queue a payment for activation; safe to call more than once"""
+        job, created = cls.objects.get_or_create(payment=payment)
+        if not created and job.status == 'failed':
+            job.status = 'pending'
+            job.available_at = tz.now()
+            job.save(update_fields=['status', 'available_at'])
+        return job
+
 
 class BulkBandwidthPackage(models.Model):
     """Model for bulk bandwidth packages sold by vendors"""
@@ -1,6 +1,7 @@
 # billing/services.py
+from django.db import transaction
 from django.utils import timezone
-from .models import Payment
+from .models import Payment, SubscriptionActivation
 import logging
 
 logger = logging.getLogger(__name__)
@@ -87,5 +88,120 @@ class SubscriptionService:
         
         return False
 
+
+
+class ActivationQueueService:
+    """Drains the SubscriptionActivation queue outside the request path"""
+    
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY_SECONDS = 60
+    
+    def enqueue_missed(self):
+        """
+        Queue completed payments that never reached the queue,
+        e.g. ones completed through a queryset update
+        """
+        missed = Payment.objects.filter(
+            status='completed',
+            subscription_activated=False,
+            plan__isnull=False,
+            activation__isnull=True,
+        )
+        jobs = [SubscriptionActivation(payment=payment) for payment in missed.only('id')]
+        SubscriptionActivation.objects.bulk_create(jobs, ignore_conflicts=True)
+        return len(jobs)
+    
+    def process_batch(self, batch_size=100):
+        """
+        Activate up to batch_size queued payments.
+        Returns a dict with activated/skipped/failed counts.
+        """
+        results = {'activated': 0, 'skipped': 0, 'failed': 0}
+        job_ids = list(
+            SubscriptionActivation.objects.filter(
+                status='pending',
+                available_at__lte=timezone.now()
+            ).order_by('available_at').values_list('id', flat=True)[:batch_size]
+        )
+        
+        for job_id in job_ids:
+            try:
+                outcome = self._process_job(job_id)
+            except Exception as e:
+                logger.error(f"Subscription activation job {job_id} failed: {e}")
+                self._record_failure(job_id, e)
+                results['failed'] += 1
+                continue
+            
+            if outcome:
+                results[outcome] += 1
+        
+        return results
+    
+    def activate_now(self, payment):
+        """
+        Run a completed payment's queued activation in the request, for
+        callers that show the result straight away. Shares the job lock and
+        subscription_activated flag with the worker, which then skips it;
+        a failure leaves the job for the worker to retry.
+        Returns 'activated', 'skipped' or None.
+        """
+        job = SubscriptionActivation.objects.filter(payment=payment).only('id').first()
+        if not job:
+            return None
+        try:
+            return self._process_job(job.id)
+        except Exception as e:
+            logger.error(f"Subscription activation for payment {payment.reference} failed: {e}")
+            self._record_failure(job.id, e)
+            return None
+    
+    @transaction.atomic
+    def _process_job(self, job_id):
+        # Another worker may hold this job - skip it rather than wait
+        job = SubscriptionActivation.objects.select_for_update(skip_locked=True).filter(
+            id=job_id, status='pending'
+        ).first()
+        if not job:
+            return None
+        
+        # Lock the payment so concurrent activations can't double-extend
+        payment = Payment.objects.select_for_update().get(pk=job.payment_id)
+        
+        outcome = 'skipped'
+        if payment.status == 'completed' and payment.plan_id and not payment.subscription_activated:
+            SubscriptionService.activate_user_subscription(
+                user=payment.user,
+                plan=payment.plan,
+                payment=payment
+            )
+            # Queryset update keeps Payment.save() and its signals out of the loop
+            Payment.objects.filter(pk=payment.pk).update(subscription_activated=True)
+            outcome = 'activated'
+            logger.info(f"Activated subscription for payment {payment.reference}")
+        
+        job.status = 'done'
+        job.attempts += 1
+        job.processed_at = timezone.now()
+        job.save(update_fields=['status', 'attempts', 'processed_at'])
+        return outcome
+    
+    def _record_failure(self, job_id, error):
+        job = SubscriptionActivation.objects.filter(id=job_id).first()
+        if not job:
+            return
+        job.attempts += 1
+        job.last_error = str(error)
+        if job.attempts >= self.MAX_ATTEMPTS:
+            job.status = 'failed'
+        else:
+            # Linear backoff before the next attempt
+            job.available_at = timezone.now() + timezone.timedelta(
+                seconds=self.RETRY_DELAY_SECONDS * job.attempts
+            )
+        job.save(update_fields=['attempts', 'last_error', 'status', 'available_at'])
+
+
 # Create singleton instance
-subscription_service = SubscriptionService()
\ No newline at end of file
+subscription_service = SubscriptionService()
+activation_queue = ActivationQueueService()
\ No newline at end of file
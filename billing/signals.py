@@ -2,63 +2,15 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
-from .models import Payment, Subscription
 import logging
 
 logger = logging.getLogger(__name__)
 
-@receiver(post_save, sender=Payment)
-def handle_payment_completion(sender, instance, created, **kwargs):
-    """
-    Automatically activate subscription when payment is completed
-    """
-    try:
-        # Only process if payment is completed and has a plan
-        if instance.status == 'completed' and instance.plan and instance.user:
-            
-            # Check if subscription was already activated
-            if instance.subscription_activated:
-                return
-            
-            # Check if user already has an active subscription
-            existing_sub = Subscription.objects.filter(
-                user=instance.user,
-                is_active=True
-            ).first()
-            
-            if existing_sub:
-                # Extend existing subscription
-                existing_sub.end_date = existing_sub.end_date + timezone.timedelta(days=instance.plan.duration_days)
-                existing_sub.save()
-                logger.info(f"Extended subscription for user {instance.user.username}")
-            else:
-                # Create new subscription
-                Subscription.objects.create(
-                    user=instance.user,
-                    plan=instance.plan,
-                    start_date=timezone.now(),
-                    end_date=timezone.now() + timezone.timedelta(days=instance.plan.duration_days),
-                    is_active=True
-                )
-                logger.info(f"Created new subscription for user {instance.user.username}")
-            
-            # Update customer's next payment date
-            if instance.user.next_payment_date:
-                instance.user.next_payment_date = instance.user.next_payment_date + timezone.timedelta(days=instance.plan.duration_days)
-            else:
-                instance.user.next_payment_date = timezone.now() + timezone.timedelta(days=instance.plan.duration_days)
-            instance.user.save()
-            
-            # Mark payment as subscription activated
-            instance.subscription_activated = True
-            instance.save(update_fields=['subscription_activated'])
-            
-            logger.info(f"Auto-activated subscription for payment {instance.reference}")
-            
-    except Exception as e:
-        logger.error(f"Failed to auto-activate subscription for payment {instance.reference}: {e}")
+# Subscription activation for completed payments is queued from Payment.save()
+# and handled by the process_subscription_activations worker.
 
 from accounts.utils_module.map_updates import send_map_update
+from accounts import status_events
 
 @receiver(post_save, sender='billing.Subscription')
 def handle_subscription_activation(sender, instance, created, **kwargs):
@@ -114,4 +66,21 @@ def handle_payment_completion(sender, instance, created, **kwargs):
                 logger.info(f"Updated user {user.username} status after payment for plan {instance.plan.name}")
             
     except Exception as e:
-        logger.error(f"Error handling payment completion: {e}")
\ No newline at end of file
+        logger.error(f"Error handling payment completion: {e}")
+
+@receiver(post_save, sender='billing.Payment')
+def publish_payment_completed(sender, instance, created, **kwargs):
+    """Push a payment.completed delta to the tenant's dashboards when a payment completes"""
+    if not getattr(instance, '_became_completed', False) or not instance.user_id:
+        return
+    try:
+        user = instance.user
+        status_events.emit(user.tenant_id, 'payment.completed', f'payment:{instance.pk}', {
+            'payment_id': instance.pk,
+            'user_id': user.pk,
+            'username': user.username,
+            'amount': str(instance.amount),
+            'plan': instance.plan.name if instance.plan_id else None,
+        })
+    except Exception as e:
+        logger.error(f"Error publishing payment completion: {e}")
@@ -23,7 +23,7 @@ from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
 from django.views.decorators.csrf import csrf_exempt
 import json
 from accounts.models import CustomUser, Tenant
-from .services import subscription_service
+from .services import activation_queue
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 
 logger = logging.getLogger(__name__)
@@ -2147,12 +2147,8 @@ def payment_verify(request, reference):
                 plan = payment.plan
                 
                 if plan:
-                    # Use subscription service to handle activation
-                    subscription_service.activate_user_subscription(
-                        user=request.user,
-                        plan=plan,
-                        payment=payment
-                    )
+                    # payment.save() queued the activation; run it now so the plan is live on the next page
+                    activation_queue.activate_now(payment)
                     
                     messages.success(
                         request, 
@@ -2222,19 +2218,16 @@ def verify_payment_api(request):
                 # Payment successful
                 transaction_data = data['data']
                 
+                # Get the plan
+                plan = get_object_or_404(SubscriptionPlan, id=plan_id, tenant=tenant, is_active=True)
+                
                 payment.status = 'completed'
                 payment.paystack_reference = transaction_data.get('reference', reference)
+                payment.plan = plan
                 payment.save()
                 
-                # Get the plan
-                plan = get_object_or_404(SubscriptionPlan, id=plan_id, tenant=tenant, is_active=True)
-                
-                # Use subscription service to handle activation
-                subscription_service.activate_user_subscription(
-                    user=request.user,
-                    plan=plan,
-                    payment=payment
-                )
+                # payment.save() queued the activation; run it now so the response reflects it
+                activation_queue.activate_now(payment)
                 
                 return JsonResponse({
                     'status': 'success',
@@ -2429,8 +2422,7 @@ def _handle_new_recurring_payment(data):
                 payment_method='paystack'
             )
             
-            # Activate subscription
-            subscription_service.activate_user_subscription(user, plan, payment)
+            # Payment.save() queued the activation for process_subscription_activations
             
     except Exception as e:
         logger.error(f"Error handling recurring payment: {e}")
@@ -2598,14 +2590,8 @@ def paystack_webhook(request):
                     plan = payment.plan
                     
                     if plan:
-                        # Use subscription service to handle activation
-                        subscription_service.activate_user_subscription(
-                            user=payment.user,
-                            plan=plan,
-                            payment=payment
-                        )
-                        
-                        logger.info(f"Webhook: Subscription activated for {payment.user.username}")
+                        # Payment.save() queued the activation for process_subscription_activations
+                        logger.info(f"Webhook: Subscription activation queued for {payment.user.username}")
                     else:
                         logger.error(f"Webhook: No plan found for payment {reference}")
 
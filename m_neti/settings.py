@@ -64,7 +64,6 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'accounts.middleware.TenantMiddleware',
     'accounts.middleware.RoleAccessMiddleware',
-    'billing.middleware.AutoPaymentMiddleware',
     'accounts.middleware.TwoFactorMiddleware',
 
 ]
@@ -90,6 +89,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'm_neti.wsgi.application'
+ASGI_APPLICATION = 'm_neti.asgi.application'
 
 # Database
 
@@ -206,6 +206,10 @@ LOGGING = {
 
 ENCRYPTION_KEY = config('ENCRYPTION_KEY', default='')
 
+# Processes hashing passwords for bulk customer creation and imports.
+# Each one is a full Django process; the count is also capped by the CPUs the container may use.
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=2, cast=int)
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True if DEBUG else False
 CORS_ALLOWED_ORIGINS = [
@@ -234,6 +238,17 @@ CACHES = {
     }
 }
 
+# Channels: Redis when configured, otherwise in-process (single worker only)
+REDIS_URL = config('REDIS_URL', default='')
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels_redis.core.RedisChannelLayer',
+        'CONFIG': {'hosts': [REDIS_URL]},
+    } if REDIS_URL else {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    }
+}
+
 # Email settings (use environment variables)
 EMAIL_BACKEND = config('EMAIL_BACKEND', 
                       default='django.core.mail.backends.console.EmailBackend' if DEBUG 
@@ -271,6 +286,21 @@ ROUTER_MANAGER = {
     'PORT_RANGE_START': 10000,  # Start of port range for assignments
     'PORT_RANGE_END': 20000,   # End of port range for assignments
     'ENABLE_BACKGROUND_MONITOR': True,  # Enable/disable background monitoring
+    'MONITOR_WORKERS': 16,  # Routers polled concurrently
+    'MONITOR_MIN_INTERVAL': 60,  # Poll interval for failing or flapping routers
+    'MONITOR_MAX_INTERVAL': 1800,  # Longest back-off for healthy routers
+    'SESSION_IDLE_TIMEOUT': 120,  # Log out pooled router sessions idle this long
+    'SESSION_HEALTH_CHECK_AFTER': 30,  # Ping pooled sessions idle longer than this before reuse
+    'SESSION_MAX_AGE': 1800,  # Log in again after this long regardless
+    'DISCOVERY_CONCURRENCY': 256,  # Connection attempts in flight during a network scan
+    'DISCOVERY_TIMEOUT': 1.0,  # Seconds per port probe
+    'BULK_SYNC_WORKERS': 32,  # Shared pool for bulk router syncs
+    'BULK_SYNC_TENANT_CONCURRENCY': 8,  # Routers of one tenant syncing at once
+    'TELEMETRY_RETENTION_DAYS': {'raw': 2, '5m': 14, '1h': 400},  # Per telemetry resolution
+    'BREAKER_FAILURE_THRESHOLD': 3,  # Consecutive connection failures that open a router's circuit
+    'BREAKER_COOLDOWN': 30,  # Seconds before the first probe of an open circuit (doubles per failed probe)
+    'BREAKER_MAX_COOLDOWN': 600,  # Longest wait between probes
+    'BREAKER_MIN_TIMEOUT': 1.0,  # Floor for timeouts adapted from observed round trips
 }
 
 # Logging configuration
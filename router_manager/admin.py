@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import RouterConfig, Device, PortForwardingRule, Router, ConnectedDevice, RouterLog, GuestNetwork
+from .models import RouterConfig, Device, PortForwardingRule, Router, ConnectedDevice, RouterLog, GuestNetwork, BackgroundJob
 
 @admin.register(RouterConfig)
 class RouterConfigAdmin(admin.ModelAdmin):
@@ -121,6 +121,12 @@ class RouterLogAdmin(admin.ModelAdmin):
         return obj.message[:50] + '...' if len(obj.message) > 50 else obj.message
     short_message.short_description = 'Message'
 
+@admin.register(BackgroundJob)
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_type', 'status', 'processed', 'total', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('job_type', 'status', 'created_at')
+    readonly_fields = ('id', 'created_at', 'started_at', 'finished_at')
+
 @admin.register(GuestNetwork)
 class GuestNetworkAdmin(admin.ModelAdmin):
     list_display = ('router', 'ssid', 'enabled', 'bandwidth_limit', 'access_duration')
@@ -0,0 +1,160 @@
+# router_manager/breaker.py
+"""
+Per-router circuit breakers and adaptive timeouts.
+
+After BREAKER_FAILURE_THRESHOLD consecutive connection failures a router's
+circuit opens and calls fail immediately with RouterUnavailable instead of
+waiting out the connection timeout. Once the cooldown passes, one caller
+is let through as a probe (half-open): success closes the circuit, failure
+reopens it with the cooldown doubled, up to BREAKER_MAX_COOLDOWN.
+
+Request timeouts follow each router's recent round-trip times: the 95th
+percentile times RTT_TIMEOUT_FACTOR, clamped between BREAKER_MIN_TIMEOUT
+and CONNECTION_TIMEOUT. Routers without enough samples, and half-open
+probes, get the full CONNECTION_TIMEOUT.
+"""
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Round-trip samples kept per router
+RTT_WINDOW = 50
+# Samples needed before the timeout adapts
+MIN_RTT_SAMPLES = 5
+RTT_TIMEOUT_FACTOR = 4
+
+
+def _setting(name, default):
+    return getattr(settings, 'ROUTER_MANAGER', {}).get(name, default)
+
+
+class RouterUnavailable(Exception):
+    """Raised instead of contacting a router whose circuit is open"""
+
+
+class CircuitBreaker:
+    """Failure state and round-trip history of one router"""
+
+    def __init__(self, failure_threshold, cooldown, max_cooldown, min_timeout, max_timeout):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = cooldown
+        self.retry_at = 0.0
+        self.probe_started = None
+        self.rtts = deque(maxlen=RTT_WINDOW)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go to the router now; claims the probe when half-open"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN:
+                # A probe that never reported back must not block the router forever
+                if now - self.probe_started < self.max_timeout * 3:
+                    return False
+            elif now < self.retry_at:
+                return False
+            self.state = HALF_OPEN
+            self.probe_started = now
+            return True
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed"""
+        return max(0.0, self.retry_at - time.monotonic())
+
+    def record_success(self, rtts=()):
+        with self._lock:
+            self.rtts.extend(rtts)
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown = self.base_cooldown
+
+    def record_failure(self):
+        """Count a connection failure. Returns True when this opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            elif self.state == OPEN or self.failures < self.failure_threshold:
+                return False
+            self.state = OPEN
+            # Jitter keeps probes of routers that died together from lining up
+            self.retry_at = time.monotonic() + self.cooldown * random.uniform(0.9, 1.1)
+            return True
+
+    def timeout(self):
+        """Per-request timeout from the recent round trips"""
+        with self._lock:
+            if self.state != CLOSED or len(self.rtts) < MIN_RTT_SAMPLES:
+                return self.max_timeout
+            samples = sorted(self.rtts)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return round(min(self.max_timeout, max(self.min_timeout, p95 * RTT_TIMEOUT_FACTOR)), 2)
+
+    def as_dict(self):
+        with self._lock:
+            samples = sorted(self.rtts)
+            state, failures = self.state, self.failures
+        return {
+            'state': state,
+            'failures': failures,
+            'retry_in': round(self.retry_in(), 1) if state == OPEN else None,
+            'timeout': self.timeout(),
+            'rtt_p50': round(samples[len(samples) // 2], 3) if samples else None,
+            'rtt_samples': len(samples),
+        }
+
+
+class BreakerRegistry:
+    """One CircuitBreaker per RouterConfig, created on first use"""
+
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, config_id):
+        with self._lock:
+            breaker = self._breakers.get(config_id)
+            if breaker is None:
+                breaker = self._breakers[config_id] = CircuitBreaker(
+                    failure_threshold=_setting('BREAKER_FAILURE_THRESHOLD', 3),
+                    cooldown=_setting('BREAKER_COOLDOWN', 30),
+                    max_cooldown=_setting('BREAKER_MAX_COOLDOWN', 600),
+                    min_timeout=_setting('BREAKER_MIN_TIMEOUT', 1.0),
+                    max_timeout=_setting('CONNECTION_TIMEOUT', 10),
+                )
+            return breaker
+
+    def reset(self, config_id):
+        """Forget a router's failures, e.g. after its settings were changed"""
+        with self._lock:
+            self._breakers.pop(config_id, None)
+
+    def get_status(self):
+        """{config_id: breaker state} for routers that are not healthy"""
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {
+            config_id: breaker.as_dict()
+            for config_id, breaker in breakers
+            if breaker.state != CLOSED or breaker.failures
+        }
+
+
+# Shared by every RouterManagerService, so a circuit opened by the scheduler also protects views
+router_breakers = BreakerRegistry()
@@ -0,0 +1,119 @@
+# router_manager/bulk_sync.py
+"""
+Bulk device sync as a background job.
+
+All bulk sync jobs share one thread pool (BULK_SYNC_WORKERS). Each tenant
+also has a semaphore of BULK_SYNC_TENANT_CONCURRENCY slots, shared by all
+of that tenant's jobs, so one ISP with many routers cannot take over the
+pool. Each router's outcome is stored on the job as it finishes.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_tenant_slots = {}
+
+
+def _setting(name, default):
+    return getattr(settings, 'ROUTER_MANAGER', {}).get(name, default)
+
+
+def _executor():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=_setting('BULK_SYNC_WORKERS', 32), thread_name_prefix='BulkSync'
+            )
+        return _pool
+
+
+def tenant_slots(tenant_id):
+    """Semaphore capping how many of a tenant's routers sync at once"""
+    with _pool_lock:
+        if tenant_id not in _tenant_slots:
+            _tenant_slots[tenant_id] = threading.BoundedSemaphore(
+                _setting('BULK_SYNC_TENANT_CONCURRENCY', 8)
+            )
+        return _tenant_slots[tenant_id]
+
+
+def _sync_router(config_id):
+    """Worker: sync one router. Returns (success, message, seconds)."""
+    from .models import RouterConfig
+    from .services import router_manager
+
+    close_old_connections()
+    started = time.monotonic()
+    try:
+        config = RouterConfig.objects.filter(pk=config_id).first()
+        if config is None:
+            return False, "Router removed", 0.0
+        success, message = router_manager.sync_connected_devices(config)
+        return success, message, time.monotonic() - started
+    except Exception as e:
+        logger.error(f"Bulk sync failed for router {config_id}: {e}")
+        return False, str(e), time.monotonic() - started
+    finally:
+        close_old_connections()
+
+
+def run_bulk_sync_job(run):
+    """BackgroundJob target: sync every router of run.params['tenant_id']"""
+    from .models import RouterConfig
+
+    tenant_id = run.params['tenant_id']
+    remaining = deque(
+        RouterConfig.objects.filter(tenant_id=tenant_id).order_by('id').values_list('id', 'name')
+    )
+    run.set_total(len(remaining))
+
+    executor = _executor()
+    slots = tenant_slots(tenant_id)
+    pending = {}
+    while remaining or pending:
+        # Fill free tenant slots; only block for one when nothing is running yet
+        while remaining:
+            if pending:
+                if not slots.acquire(blocking=False):
+                    break
+            elif not slots.acquire(timeout=1):
+                break
+            config_id, name = remaining.popleft()
+            pending[executor.submit(_sync_router, config_id)] = (config_id, name)
+
+        if not pending:
+            continue
+        done, _ = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+        for future in done:
+            slots.release()
+            config_id, name = pending.pop(future)
+            success, message, seconds = future.result()
+            run.add_result({
+                'router_id': config_id,
+                'name': name,
+                'success': success,
+                'message': message,
+                'duration': round(seconds, 2),
+            })
+            run.advance()
+
+
+def active_bulk_sync(tenant):
+    """The tenant's unfinished bulk sync job, if any"""
+    from .jobs import stale_cutoff
+    from .models import BackgroundJob
+
+    return BackgroundJob.objects.filter(
+        tenant=tenant, job_type='bulk_sync', status__in=['pending', 'running'],
+        created_at__gte=stale_cutoff(),
+    ).first()
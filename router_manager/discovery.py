@@ -0,0 +1,219 @@
+# router_manager/discovery.py
+"""
+Asynchronous router discovery.
+
+Every host in the range is probed on the common management ports with
+asyncio, with at most DISCOVERY_CONCURRENCY connection attempts in flight
+and DISCOVERY_TIMEOUT seconds per attempt. Hosts that answer are
+fingerprinted: an open RouterOS API port means MikroTik, otherwise the
+web interface's landing page (title, Server header, redirect) is matched
+against known vendor login pages.
+
+The event loop runs on its own thread; iter_scan() hands events to the
+calling thread, so callers can use the ORM freely while a scan runs.
+"""
+import asyncio
+import ipaddress
+import logging
+import queue
+import re
+import ssl
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Checked in this order; the first open one is reported as the host's port
+PROBE_PORTS = [80, 443, 8080, 8443, 8728, 8729, 22, 23]
+HTTP_PORTS = [80, 8080, 443, 8443]
+TLS_PORTS = {443, 8443}
+ROUTEROS_API_PORTS = {8728, 8729}
+
+# Largest range scanned in one go (a /20)
+MAX_DISCOVERY_HOSTS = 4096
+# Bytes of the landing page read for fingerprinting
+MAX_PAGE_BYTES = 16384
+
+# Keys match RouterConfig.ROUTER_TYPES
+VENDOR_SIGNATURES = [
+    ('mikrotik', ('mikrotik', 'routeros', 'webfig')),
+    ('huawei', ('huawei', 'echolife', 'hg8245', 'hg8145', 'hs8546', 'eg8145')),
+    ('tenda', ('tenda',)),
+    ('tplink', ('tp-link', 'tplink')),
+    ('ubiquiti', ('ubiquiti', 'airos', 'unifi')),
+]
+
+TITLE_RE = re.compile(rb'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+_DONE = object()
+
+
+def _setting(name, default):
+    return getattr(settings, 'ROUTER_MANAGER', {}).get(name, default)
+
+
+def parse_network(network_range):
+    """ip_network for a range, rejecting ranges above MAX_DISCOVERY_HOSTS"""
+    network = ipaddress.ip_network(network_range, strict=False)
+    if network.num_addresses - 2 > MAX_DISCOVERY_HOSTS:
+        raise ValueError(f"Network {network} is too large to scan (max {MAX_DISCOVERY_HOSTS} hosts)")
+    return network
+
+
+def _tls_context():
+    # Router web interfaces use self-signed certificates
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+async def _probe(ip, port, timeout, semaphore):
+    async with semaphore:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+
+async def _fetch_landing_page(ip, port, timeout, semaphore):
+    """Raw response head and start of the body for GET /, or b''"""
+    request = (
+        f"GET / HTTP/1.0\r\nHost: {ip}\r\nUser-Agent: M-Neti-Discovery\r\nConnection: close\r\n\r\n"
+    ).encode()
+    async with semaphore:
+        writer = None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(ip, port, ssl=_tls_context() if port in TLS_PORTS else None),
+                timeout,
+            )
+            writer.write(request)
+            await asyncio.wait_for(writer.drain(), timeout)
+            data = b''
+            while len(data) < MAX_PAGE_BYTES:
+                chunk = await asyncio.wait_for(reader.read(MAX_PAGE_BYTES - len(data)), timeout)
+                if not chunk:
+                    break
+                data += chunk
+            return data
+        except (OSError, asyncio.TimeoutError, ssl.SSLError):
+            return b''
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+def fingerprint_page(page):
+    """(vendor, title, server) from a raw HTTP response"""
+    head, _, body = page.partition(b'\r\n\r\n')
+    headers = {}
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        headers[name.strip().lower()] = value.strip().decode('latin-1')
+
+    match = TITLE_RE.search(body)
+    title = match.group(1).decode('utf-8', 'replace').strip()[:100] if match else ''
+    server = headers.get(b'server', '')
+    haystack = ' '.join([title, server, headers.get(b'location', ''), body.decode('utf-8', 'replace')]).lower()
+    for vendor, signatures in VENDOR_SIGNATURES:
+        if any(signature in haystack for signature in signatures):
+            return vendor, title, server
+    return None, title, server
+
+
+async def _scan_host(ip, timeout, semaphore):
+    opened = await asyncio.gather(*(_probe(ip, port, timeout, semaphore) for port in PROBE_PORTS))
+    open_ports = [port for port, is_open in zip(PROBE_PORTS, opened) if is_open]
+    if not open_ports:
+        return None
+
+    result = {
+        'ip_address': ip,
+        'port': open_ports[0],
+        'open_ports': open_ports,
+        'status': 'reachable',
+        'vendor': None,
+        'title': '',
+        'server': '',
+    }
+    if ROUTEROS_API_PORTS & set(open_ports):
+        result['vendor'] = 'mikrotik'
+    for port in HTTP_PORTS:
+        if port not in open_ports:
+            continue
+        page = await _fetch_landing_page(ip, port, timeout, semaphore)
+        if not page:
+            continue
+        vendor, result['title'], result['server'] = fingerprint_page(page)
+        result['vendor'] = result['vendor'] or vendor
+        result['port'] = port
+        break
+    return result
+
+
+async def scan_network(network, emit, concurrency, timeout):
+    """Scan every host of `network`, calling emit(kind, payload) as hosts finish"""
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.ensure_future(_scan_host(str(ip), timeout, semaphore)) for ip in network.hosts()]
+    for task in asyncio.as_completed(tasks):
+        result = await task
+        emit('progress', 1)
+        if result:
+            emit('result', result)
+
+
+def iter_scan(network_range, concurrency=None, timeout=None):
+    """
+    Yield ('total', n), then ('progress', 1) per scanned host and
+    ('result', host) per reachable host, as the scan runs.
+    """
+    network = parse_network(network_range)
+    concurrency = concurrency or _setting('DISCOVERY_CONCURRENCY', 256)
+    timeout = timeout or _setting('DISCOVERY_TIMEOUT', 1.0)
+    events = queue.Queue()
+
+    def emit(kind, payload):
+        events.put((kind, payload))
+
+    def run():
+        try:
+            asyncio.run(scan_network(network, emit, concurrency, timeout))
+        except Exception as e:
+            events.put(('error', e))
+        finally:
+            events.put(_DONE)
+
+    yield 'total', sum(1 for _ in network.hosts())
+    threading.Thread(target=run, daemon=True, name=f"Discovery-{network}").start()
+    while True:
+        event = events.get()
+        if event is _DONE:
+            return
+        if event[0] == 'error':
+            raise event[1]
+        yield event
+
+
+def run_discovery_job(run):
+    """BackgroundJob target: scan run.params['network'] and stream hosts as results"""
+    from .models import RouterConfig
+
+    known = set(RouterConfig.objects.values_list('ip_address', flat=True))
+    for kind, payload in iter_scan(
+        run.params['network'], run.params.get('concurrency'), run.params.get('timeout')
+    ):
+        if kind == 'total':
+            run.set_total(payload)
+        elif kind == 'progress':
+            run.advance(payload)
+        else:
+            payload['already_configured'] = payload['ip_address'] in known
+            run.add_result(payload)
@@ -0,0 +1,137 @@
+# router_manager/jobs.py
+"""
+Background jobs for router operations too slow for a request.
+
+start_job() stores a BackgroundJob and runs `target(run)` on a daemon
+thread once the row is committed. The target reports through the JobRun:
+set_total(), advance() and add_result(). Progress and results are written
+back at most every FLUSH_SECONDS, so clients polling the job by id see
+results arrive while the job is still running.
+
+A job that is still pending or running STALE_JOB_SECONDS after it was
+created is assumed lost with its process, and is reported as failed.
+"""
+import logging
+import threading
+import time
+
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SECONDS = 1.0
+# Unfinished jobs older than this are assumed lost with their process
+STALE_JOB_SECONDS = 3600
+
+
+class JobRun:
+    """Progress reporter handed to a job's target; safe to call from several threads"""
+
+    def __init__(self, job):
+        self.job = job
+        self.total = 0
+        self.processed = 0
+        self.results = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    @property
+    def params(self):
+        return self.job.params
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+        self.flush(force=True)
+
+    def advance(self, count=1):
+        with self._lock:
+            self.processed += count
+        self.flush()
+
+    def add_result(self, result):
+        with self._lock:
+            self.results.append(result)
+        self.flush()
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._last_flush < FLUSH_SECONDS:
+                return
+            self._last_flush = now
+            values = {'total': self.total, 'processed': self.processed, 'results': list(self.results)}
+        BackgroundJob.objects.filter(pk=self.job.pk).update(**values)
+
+
+def _run(job_id, target):
+    close_old_connections()
+    job = BackgroundJob.objects.get(pk=job_id)
+    run = JobRun(job)
+    BackgroundJob.objects.filter(pk=job_id).update(status='running', started_at=timezone.now())
+    try:
+        target(run)
+        status, error = 'completed', ''
+    except Exception as e:
+        logger.error(f"Background job {job_id} ({job.job_type}) failed: {e}")
+        status, error = 'failed', str(e)
+    try:
+        run.flush(force=True)
+        BackgroundJob.objects.filter(pk=job_id).update(status=status, error=error, finished_at=timezone.now())
+    finally:
+        close_old_connections()
+
+
+def start_job(job_type, target, params=None, tenant=None, user=None):
+    """Create a job and start `target(run)` in the background. Returns the BackgroundJob."""
+    job = BackgroundJob.objects.create(
+        job_type=job_type,
+        params=params or {},
+        tenant=tenant,
+        created_by=user if user and user.is_authenticated else None,
+    )
+    thread = threading.Thread(
+        target=_run, args=(job.pk, target), daemon=True, name=f"RouterJob-{job.pk}"
+    )
+    transaction.on_commit(thread.start)
+    return job
+
+
+def stale_cutoff():
+    return timezone.now() - timezone.timedelta(seconds=STALE_JOB_SECONDS)
+
+
+def expire_if_stale(job):
+    """Mark an unfinished job failed once it passes the stale cutoff. Returns the job."""
+    if job.is_finished or job.created_at >= stale_cutoff():
+        return job
+    job.status = 'failed'
+    job.error = job.error or 'Job stopped responding; its process most likely exited'
+    job.finished_at = timezone.now()
+    BackgroundJob.objects.filter(pk=job.pk, status__in=['pending', 'running']).update(
+        status=job.status, error=job.error, finished_at=job.finished_at
+    )
+    return job
+
+
+def serialize_job(job, since=0):
+    """Job state for polling clients; results from index `since` onwards"""
+    expire_if_stale(job)
+    results = job.results[since:]
+    return {
+        'job_id': str(job.pk),
+        'job_type': job.job_type,
+        'status': job.status,
+        'total': job.total,
+        'processed': job.processed,
+        'progress': job.progress_percentage,
+        'results': results,
+        'next': since + len(results),
+        'error': job.error,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
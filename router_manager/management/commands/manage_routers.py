@@ -106,6 +106,7 @@ class Command(BaseCommand):
         if routers:
             self.stdout.write(f'Found {len(routers)} potential routers:')
             for router in routers:
-                self.stdout.write(f"  • {router['ip_address']}:{router['port']}")
+                vendor = router.get('vendor') or 'unknown vendor'
+                self.stdout.write(f"  • {router['ip_address']}:{router['port']} ({vendor})")
         else:
             self.stdout.write(self.style.WARNING('No routers found'))
\ No newline at end of file
@@ -0,0 +1,12 @@
+# router_manager/management/commands/rollup_telemetry.py
+from django.core.management.base import BaseCommand
+from router_manager import telemetry
+
+class Command(BaseCommand):
+    help = 'Downsample router and device telemetry into 5 minute and hourly rollups and prune old samples'
+
+    def handle(self, *args, **options):
+        written, pruned = telemetry.rollup_telemetry()
+        self.stdout.write(self.style.SUCCESS(
+            f'Telemetry rollup completed: {written} buckets written, {pruned} expired rows pruned'
+        ))
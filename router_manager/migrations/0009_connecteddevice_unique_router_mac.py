@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:04
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.db.models.functions import Upper
+
+
+def drop_duplicate_devices(apps, schema_editor):
+    """Uppercase stored MACs, as device sync writes them, then keep the most recently seen row for each (router, mac_address)"""
+    ConnectedDevice = apps.get_model('router_manager', 'ConnectedDevice')
+    ConnectedDevice.objects.update(mac_address=Upper('mac_address'))
+    duplicates = (
+        ConnectedDevice.objects.values('router_id', 'mac_address')
+        .annotate(rows=Count('id'), latest=Max('last_seen'))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        rows = ConnectedDevice.objects.filter(
+            router_id=duplicate['router_id'], mac_address=duplicate['mac_address']
+        ).order_by('-last_seen', '-id')
+        keep = rows.values_list('id', flat=True).first()
+        rows.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('router_manager', '0008_alter_routerconfig_options_router_router_config_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_devices, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='connecteddevice',
+            constraint=models.UniqueConstraint(fields=('router', 'mac_address'), name='unique_connected_device_per_router'),
+        ),
+    ]
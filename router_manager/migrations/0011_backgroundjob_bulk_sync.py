@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('router_manager', '0010_backgroundjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='backgroundjob',
+            name='job_type',
+            field=models.CharField(choices=[('discovery', 'Network Discovery'), ('bulk_sync', 'Bulk Router Sync')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('router_manager', '0011_backgroundjob_bulk_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RouterTelemetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('is_online', models.BooleanField()),
+                ('client_count', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telemetry', to='router_manager.routerconfig')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeviceTelemetryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('5m', '5 minutes'), ('1h', '1 hour')], max_length=2)),
+                ('bucket', models.DateTimeField()),
+                ('rate_samples', models.PositiveIntegerField(default=0)),
+                ('rx_sum', models.BigIntegerField(default=0)),
+                ('rx_max', models.PositiveIntegerField(default=0)),
+                ('tx_sum', models.BigIntegerField(default=0)),
+                ('tx_max', models.PositiveIntegerField(default=0)),
+                ('signal_samples', models.PositiveIntegerField(default=0)),
+                ('signal_sum', models.IntegerField(default=0)),
+                ('signal_min', models.SmallIntegerField(blank=True, null=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telemetry_rollups', to='router_manager.connecteddevice')),
+            ],
+            options={
+                'ordering': ['bucket'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeviceTelemetry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recorded_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('rx_rate', models.PositiveIntegerField(blank=True, null=True)),
+                ('tx_rate', models.PositiveIntegerField(blank=True, null=True)),
+                ('signal_strength', models.SmallIntegerField(blank=True, null=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telemetry', to='router_manager.connecteddevice')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RouterTelemetryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(choices=[('5m', '5 minutes'), ('1h', '1 hour')], max_length=2)),
+                ('bucket', models.DateTimeField()),
+                ('samples', models.PositiveIntegerField(default=0)),
+                ('online_samples', models.PositiveIntegerField(default=0)),
+                ('client_samples', models.PositiveIntegerField(default=0)),
+                ('clients_sum', models.PositiveIntegerField(default=0)),
+                ('clients_max', models.PositiveSmallIntegerField(default=0)),
+                ('config', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='telemetry_rollups', to='router_manager.routerconfig')),
+            ],
+            options={
+                'ordering': ['bucket'],
+                'indexes': [models.Index(fields=['resolution', 'bucket'], name='router_mana_resolut_6d2cd8_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='routertelemetryrollup',
+            constraint=models.UniqueConstraint(fields=('config', 'resolution', 'bucket'), name='unique_router_telemetry_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='routertelemetry',
+            index=models.Index(fields=['recorded_at'], name='router_mana_recorde_49cff4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='routertelemetry',
+            index=models.Index(fields=['config', 'recorded_at'], name='router_mana_config__67c5cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicetelemetryrollup',
+            index=models.Index(fields=['resolution', 'bucket'], name='router_mana_resolut_a85cdd_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='devicetelemetryrollup',
+            constraint=models.UniqueConstraint(fields=('device', 'resolution', 'bucket'), name='unique_device_telemetry_bucket'),
+        ),
+        migrations.AddIndex(
+            model_name='devicetelemetry',
+            index=models.Index(fields=['recorded_at'], name='router_mana_recorde_0fe020_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devicetelemetry',
+            index=models.Index(fields=['device', 'recorded_at'], name='router_mana_device__152d1e_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_router_config(apps, schema_editor):
+    """Copy each rule's ISP router from its customer router, then deactivate clashing ports"""
+    PortForwardingRule = apps.get_model('router_manager', 'PortForwardingRule')
+    Router = apps.get_model('router_manager', 'Router')
+    for router in Router.objects.exclude(router_config=None).only('id', 'router_config_id'):
+        PortForwardingRule.objects.filter(router_id=router.id).update(router_config_id=router.router_config_id)
+
+    seen = set()
+    rules = PortForwardingRule.objects.filter(is_active=True).exclude(router_config=None).order_by('id')
+    for rule_id, config_id, port in rules.values_list('id', 'router_config_id', 'external_port'):
+        if (config_id, port) in seen:
+            PortForwardingRule.objects.filter(id=rule_id).update(is_active=False)
+        seen.add((config_id, port))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('router_manager', '0012_telemetry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portforwardingrule',
+            name='router_config',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='forwarded_ports', to='router_manager.routerconfig'),
+        ),
+        migrations.RunPython(backfill_router_config, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='portforwardingrule',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('router_config', 'external_port'), name='unique_active_external_port_per_router'),
+        ),
+    ]
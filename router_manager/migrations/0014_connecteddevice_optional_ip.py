@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('router_manager', '0013_portforwardingrule_router_config'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='connecteddevice',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, null=True),
+        ),
+    ]
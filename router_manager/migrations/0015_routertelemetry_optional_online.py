@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('router_manager', '0014_connecteddevice_optional_ip'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='routertelemetry',
+            name='is_online',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
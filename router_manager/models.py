@@ -340,7 +340,7 @@ class ConnectedDevice(models.Model):
     
     router = models.ForeignKey(Router, on_delete=models.CASCADE, related_name='connected_devices')
     name = models.CharField(max_length=100, blank=True)
-    ip_address = models.GenericIPAddressField()
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
     mac_address = models.CharField(max_length=17)
     device_type = models.CharField(max_length=15, choices=DEVICE_TYPES, default='other')
     connection_type = models.CharField(max_length=15, choices=CONNECTION_TYPES, default='wireless_2.4')
@@ -362,9 +362,12 @@ class ConnectedDevice(models.Model):
             models.Index(fields=['router', 'last_seen']),
             models.Index(fields=['mac_address']),
         ]
+        constraints = [
+            models.UniqueConstraint(fields=['router', 'mac_address'], name='unique_connected_device_per_router'),
+        ]
     
     def __str__(self):
-        return f"{self.name or 'Unknown Device'} - {self.ip_address}"
+        return f"{self.name or 'Unknown Device'} - {self.ip_address or self.mac_address}"
     
     @property
     def is_online(self):
@@ -416,6 +419,151 @@ class RouterLog(models.Model):
         return f"{self.router} - {self.log_type} - {self.created_at}"
 
 
+class RouterTelemetry(models.Model):
+    """Raw per-poll sample of a router's state; append-only, pruned after rollup"""
+    config = models.ForeignKey(RouterConfig, on_delete=models.CASCADE, related_name='telemetry')
+    recorded_at = models.DateTimeField(default=timezone.now)
+    # Null on client count samples from device sync; only status checks record presence
+    is_online = models.BooleanField(null=True, blank=True)
+    client_count = models.PositiveSmallIntegerField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at']),
+            models.Index(fields=['config', 'recorded_at']),
+        ]
+    
+    def __str__(self):
+        state = 'clients' if self.is_online is None else 'online' if self.is_online else 'offline'
+        return f"{self.config} - {state} - {self.recorded_at}"
+
+
+class DeviceTelemetry(models.Model):
+    """Raw per-poll sample of a connected device's link; rates in kbps, signal in dBm"""
+    device = models.ForeignKey('ConnectedDevice', on_delete=models.CASCADE, related_name='telemetry')
+    recorded_at = models.DateTimeField(default=timezone.now)
+    rx_rate = models.PositiveIntegerField(null=True, blank=True)
+    tx_rate = models.PositiveIntegerField(null=True, blank=True)
+    signal_strength = models.SmallIntegerField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['recorded_at']),
+            models.Index(fields=['device', 'recorded_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.device_id} - {self.recorded_at}"
+
+
+TELEMETRY_RESOLUTIONS = [
+    ('5m', '5 minutes'),
+    ('1h', '1 hour'),
+]
+
+
+class RouterTelemetryRollup(models.Model):
+    """
+    RouterTelemetry downsampled into a time bucket. Sums and counts are
+    kept rather than averages so hourly buckets can be built from 5 minute ones.
+    """
+    config = models.ForeignKey(RouterConfig, on_delete=models.CASCADE, related_name='telemetry_rollups')
+    resolution = models.CharField(max_length=2, choices=TELEMETRY_RESOLUTIONS)
+    bucket = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+    online_samples = models.PositiveIntegerField(default=0)
+    client_samples = models.PositiveIntegerField(default=0)
+    clients_sum = models.PositiveIntegerField(default=0)
+    clients_max = models.PositiveSmallIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['config', 'resolution', 'bucket'], name='unique_router_telemetry_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.config} - {self.resolution} - {self.bucket}"
+
+
+class DeviceTelemetryRollup(models.Model):
+    """DeviceTelemetry downsampled into a time bucket (see RouterTelemetryRollup)"""
+    device = models.ForeignKey('ConnectedDevice', on_delete=models.CASCADE, related_name='telemetry_rollups')
+    resolution = models.CharField(max_length=2, choices=TELEMETRY_RESOLUTIONS)
+    bucket = models.DateTimeField()
+    rate_samples = models.PositiveIntegerField(default=0)
+    rx_sum = models.BigIntegerField(default=0)
+    rx_max = models.PositiveIntegerField(default=0)
+    tx_sum = models.BigIntegerField(default=0)
+    tx_max = models.PositiveIntegerField(default=0)
+    signal_samples = models.PositiveIntegerField(default=0)
+    signal_sum = models.IntegerField(default=0)
+    signal_min = models.SmallIntegerField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['bucket']
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'resolution', 'bucket'], name='unique_device_telemetry_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['resolution', 'bucket']),
+        ]
+    
+    def __str__(self):
+        return f"{self.device_id} - {self.resolution} - {self.bucket}"
+
+
+class BackgroundJob(models.Model):
+    """Long-running router operation run off the request thread, polled by id"""
+    JOB_TYPES = [
+        ('discovery', 'Network Discovery'),
+        ('bulk_sync', 'Bulk Router Sync'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job_type = models.CharField(max_length=20, choices=JOB_TYPES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True, related_name='router_jobs')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='router_jobs')
+    params = models.JSONField(default=dict, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    results = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['job_type', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_job_type_display()} - {self.status} - {self.created_at}"
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+    
+    @property
+    def progress_percentage(self):
+        if not self.total:
+            return 100 if self.is_finished else 0
+        return round(self.processed * 100 / self.total, 1)
+
+
 class GuestNetwork(models.Model):
     router = models.OneToOneField(Router, on_delete=models.CASCADE, related_name='guest_network')
     ssid = models.CharField(max_length=32, default='ConnectWise_Guest')
@@ -438,6 +586,10 @@ class GuestNetwork(models.Model):
 
 class PortForwardingRule(models.Model):
     router = models.ForeignKey(Router, on_delete=models.CASCADE, related_name='port_rules')  # FIXED: Changed from RouterConfig to Router
+    # ISP router carrying the rule; external ports are unique per device
+    router_config = models.ForeignKey(
+        RouterConfig, on_delete=models.CASCADE, null=True, blank=True, related_name='forwarded_ports'
+    )
     customer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='port_rules')
     external_port = models.IntegerField()
     internal_ip = models.GenericIPAddressField()
@@ -450,6 +602,13 @@ class PortForwardingRule(models.Model):
 
     class Meta:
         db_table = 'port_forwarding_rules'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['router_config', 'external_port'],
+                condition=models.Q(is_active=True),
+                name='unique_active_external_port_per_router',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.external_port} -> {self.internal_ip}:{self.internal_port}"
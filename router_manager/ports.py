@@ -0,0 +1,78 @@
+# router_manager/ports.py
+"""
+External port allocation for port forwarding rules.
+
+A PortAllocator loads the router's active external ports once into a
+bytearray (one byte per port in the range), so free ports are found with
+bytearray.find() instead of membership tests per candidate. Allocations
+are made with the RouterConfig row locked, and the partial unique
+constraint on (router_config, external_port) for active rules catches
+anything the lock cannot (e.g. databases without SELECT ... FOR UPDATE).
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+FREE = 0
+USED = 1
+
+
+class PortsExhausted(Exception):
+    """No free external port left in the router's range"""
+
+
+class PortAllocator:
+    """Free/used map of one router's external port range"""
+
+    def __init__(self, start, end, used_ports=()):
+        self.start = start
+        self.end = end
+        self.bitmap = bytearray(end - start + 1)
+        for port in used_ports:
+            self.mark_used(port)
+
+    @classmethod
+    def for_router(cls, router_config, start, end):
+        """Allocator seeded with the router's active rules (one query)"""
+        from .models import PortForwardingRule
+
+        used_ports = PortForwardingRule.objects.filter(
+            router_config=router_config,
+            is_active=True,
+            external_port__gte=start,
+            external_port__lte=end,
+        ).values_list('external_port', flat=True)
+        return cls(start, end, used_ports)
+
+    def mark_used(self, port):
+        if self.start <= port <= self.end:
+            self.bitmap[port - self.start] = USED
+
+    def release(self, port):
+        if self.start <= port <= self.end:
+            self.bitmap[port - self.start] = FREE
+
+    def is_free(self, port):
+        return self.start <= port <= self.end and self.bitmap[port - self.start] == FREE
+
+    def free_ports(self, limit):
+        """Up to `limit` free ports, lowest first, without reserving them"""
+        ports = []
+        index = self.bitmap.find(FREE)
+        while index != -1 and len(ports) < limit:
+            ports.append(self.start + index)
+            index = self.bitmap.find(FREE, index + 1)
+        return ports
+
+    def allocate(self, count=1):
+        """Reserve and return `count` free ports, lowest first"""
+        ports = self.free_ports(count)
+        if len(ports) < count:
+            raise PortsExhausted(f"No available ports in range {self.start}-{self.end}")
+        for port in ports:
+            self.mark_used(port)
+        return ports
+
+    @property
+    def free_count(self):
+        return self.bitmap.count(FREE)
@@ -1,18 +1,84 @@
 # router_manager/router_drivers/__init__.py
 import importlib
+import threading
 from django.conf import settings
 import logging
 
+from .metrics import instrument
+
 logger = logging.getLogger(__name__)
 
+DRIVER_PATHS = {
+    'huawei': 'router_manager.router_drivers.huawei.HuaweiDriver',
+    'mikrotik': 'router_manager.router_drivers.mikrotik.MikroTikDriver',
+    'tenda': 'router_manager.router_drivers.tenda.TendaDriver',
+}
+
+# Operations a driver can declare in `capabilities`, and the method each one needs
+CAPABILITIES = {
+    'status': 'get_status',
+    'devices': 'get_connected_devices',
+    'wifi': 'change_wifi_settings',
+    'port_forwarding': 'create_port_forwarding',
+    'port_forwarding_rules': 'get_port_forwarding_rules',
+    'port_forwarding_delete': 'delete_port_forwarding',
+    'reboot': 'reboot',
+}
+
+# Driver methods timed into driver_metrics
+INSTRUMENTED_METHODS = (
+    'connect', 'disconnect', 'ping', 'get_status', 'get_connected_devices', 'change_wifi_settings',
+    'reboot', 'create_port_forwarding', 'delete_port_forwarding', 'get_port_forwarding_rules',
+)
+
 class RouterDriverBase:
     """Base class for all router drivers"""
     
+    router_type = None
+    capabilities = frozenset()
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for capability in cls.capabilities:
+            method = CAPABILITIES.get(capability)
+            if method is None:
+                raise TypeError(f"{cls.__name__} declares unknown capability: {capability}")
+            if getattr(cls, method) is getattr(RouterDriverBase, method, None):
+                raise TypeError(f"{cls.__name__} declares {capability} without implementing {method}")
+        for name in INSTRUMENTED_METHODS:
+            method = cls.__dict__.get(name)
+            if method and not getattr(method, '_instrumented', False):
+                setattr(cls, name, instrument(method, name))
+    
     def __init__(self, router_config):
         self.config = router_config
         self.session = None
+        # Set when the router rejects our login mid-session; the driver pool logs in again
+        self.auth_expired = False
+        # Per-request timeout; RouterManagerService adapts it to the router's observed round trips
+        self.timeout = getattr(settings, 'ROUTER_MANAGER', {}).get('CONNECTION_TIMEOUT', 10)
+        # Round-trip times (seconds) since the last take_latencies()
+        self.latencies = []
         self.logger = logging.getLogger(f'{__name__}.{self.__class__.__name__}')
     
+    def _watch_auth(self, session):
+        """Flag auth_expired whenever the router answers with a login challenge"""
+        def check_auth(response, *args, **kwargs):
+            if response.status_code in (401, 403) or '/login' in response.url:
+                self.auth_expired = True
+        session.hooks['response'].append(check_auth)
+    
+    def _track_latency(self, session):
+        """Record the round-trip time of every HTTP request made through `session`"""
+        def record(response, *args, **kwargs):
+            self.latencies.append(response.elapsed.total_seconds())
+        session.hooks['response'].append(record)
+    
+    def take_latencies(self):
+        """Round-trip times recorded since the last call"""
+        latencies, self.latencies = self.latencies, []
+        return latencies
+    
     def connect(self):
         """Establish connection to router"""
         raise NotImplementedError
@@ -25,6 +91,10 @@ class RouterDriverBase:
         """Get router status"""
         raise NotImplementedError
     
+    def ping(self):
+        """Cheap check that the current session still works"""
+        return bool((self.get_status() or {}).get('is_online'))
+    
     def get_connected_devices(self):
         """Get list of connected devices"""
         raise NotImplementedError
@@ -49,31 +119,74 @@ class RouterDriverBase:
         """Get all port forwarding rules"""
         raise NotImplementedError
 
+class DriverRegistry:
+    """
+    Router type -> driver class, imported once on first use. Import
+    failures are remembered too, so a broken driver costs one log line
+    instead of an import attempt per call.
+    """
+    
+    def __init__(self, paths):
+        self._paths = paths
+        self._classes = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+    
+    def get_class(self, router_type):
+        """Driver class for a router type, or None when there is none"""
+        router_type = (router_type or '').lower()
+        if router_type in self._classes:
+            return self._classes[router_type]
+        with self._lock:
+            if router_type not in self._classes:
+                self._classes[router_type] = self._load(router_type)
+        return self._classes[router_type]
+    
+    def _load(self, router_type):
+        if router_type not in self._paths:
+            self._errors[router_type] = f"No driver available for router type: {router_type}"
+            return None
+        module_path, class_name = self._paths[router_type].rsplit('.', 1)
+        try:
+            return getattr(importlib.import_module(module_path), class_name)
+        except (ImportError, AttributeError) as e:
+            logger.error(f"Failed to load driver {router_type}: {e}")
+            self._errors[router_type] = str(e)
+            return None
+    
+    def capabilities(self, router_type):
+        driver_class = self.get_class(router_type)
+        return driver_class.capabilities if driver_class else frozenset()
+    
+    def supports(self, router_type, capability):
+        return capability in self.capabilities(router_type)
+    
+    def get_driver(self, router_config):
+        driver_class = self.get_class(router_config.router_type)
+        if driver_class is None:
+            raise ValueError(self._errors.get(router_config.router_type.lower(), 'Driver unavailable'))
+        return driver_class(router_config)
+    
+    def get_status(self):
+        """Load state and capabilities of every known router type"""
+        status = {}
+        for router_type in sorted(self._paths):
+            driver_class = self.get_class(router_type)
+            status[router_type] = {
+                'available': driver_class is not None,
+                'capabilities': sorted(driver_class.capabilities) if driver_class else [],
+                'error': self._errors.get(router_type),
+            }
+        return status
+
+
+driver_registry = DriverRegistry(DRIVER_PATHS)
+
+
 class RouterDriverFactory:
     """Factory to create appropriate router driver"""
     
     @staticmethod
     def get_driver(router_config):
         """Get driver instance for router type"""
-        router_type = router_config.router_type.lower()
-        
-        driver_classes = {
-            'huawei': 'router_manager.router_drivers.huawei.HuaweiDriver',
-            'mikrotik': 'router_manager.router_drivers.mikrotik.MikroTikDriver',
-            'tenda': 'router_manager.router_drivers.tenda.TendaDriver',
-            'ubiquiti': 'router_manager.router_drivers.ubiquiti.UbiquitiDriver',
-            'tplink': 'router_manager.router_drivers.tplink.TPLinkDriver',
-        }
-        
-        if router_type not in driver_classes:
-            raise ValueError(f"No driver available for router type: {router_type}")
-        
-        module_path, class_name = driver_classes[router_type].rsplit('.', 1)
-        
-        try:
-            module = importlib.import_module(module_path)
-            driver_class = getattr(module, class_name)
-            return driver_class(router_config)
-        except (ImportError, AttributeError) as e:
-            logger.error(f"Failed to load driver {router_type}: {e}")
-            raise
\ No newline at end of file
+        return driver_registry.get_driver(router_config)
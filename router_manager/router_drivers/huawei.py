@@ -11,10 +11,15 @@ logger = logging.getLogger(__name__)
 class HuaweiDriver(RouterDriverBase):
     """Huawei router driver (supports HG8245H, HG8245Q, etc.)"""
     
+    router_type = 'huawei'
+    capabilities = frozenset({'status', 'devices', 'wifi', 'port_forwarding', 'port_forwarding_rules', 'reboot'})
+    
     def __init__(self, router_config):
         super().__init__(router_config)
         self.base_url = f"http://{self.config.ip_address}:{self.config.web_port}"
         self.session = requests.Session()
+        self._watch_auth(self.session)
+        self._track_latency(self.session)
         
     def connect(self):
         """Connect to Huawei router using digest auth"""
@@ -24,7 +29,7 @@ class HuaweiDriver(RouterDriverBase):
             
             # Test connection
             test_url = f"{self.base_url}/api/system/deviceinfo"
-            response = self.session.get(test_url, timeout=10)
+            response = self.session.get(test_url, timeout=self.timeout)
             
             if response.status_code == 200:
                 self.logger.info(f"Connected to Huawei router {self.config.ip_address}")
@@ -42,6 +47,11 @@ class HuaweiDriver(RouterDriverBase):
         if self.session:
             self.session.close()
     
+    def ping(self):
+        """Session check against the device info endpoint"""
+        response = self.session.get(f"{self.base_url}/api/system/deviceinfo", timeout=self.timeout)
+        return response.status_code == 200 and not self.auth_expired
+    
     def get_status(self):
         """Get router status"""
         try:
@@ -0,0 +1,115 @@
+# router_manager/router_drivers/metrics.py
+"""
+Per-vendor driver call metrics.
+
+Every driver operation is timed (see RouterDriverBase.__init_subclass__)
+and recorded here by router type and operation: call and error counts,
+a latency histogram and the most recent errors. Counters live in process
+memory and reset on restart.
+"""
+import functools
+import threading
+import time
+from collections import Counter
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class OperationStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.error_types = Counter()
+
+    def record(self, seconds, error):
+        self.calls += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        self.histogram[index] += 1
+        if error:
+            self.errors += 1
+            self.error_types[error] += 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of calls (None when unbounded)"""
+        target = self.calls * fraction
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else None
+        return None
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'error_rate': round(self.errors / self.calls, 3) if self.calls else 0,
+            'avg_seconds': round(self.total_seconds / self.calls, 3) if self.calls else 0,
+            'max_seconds': round(self.max_seconds, 3),
+            'p50_le': self.percentile(0.5),
+            'p95_le': self.percentile(0.95),
+            'histogram': dict(zip([f'le_{bound}' for bound in LATENCY_BUCKETS] + ['inf'], self.histogram)),
+            'error_types': dict(self.error_types.most_common(5)),
+        }
+
+
+class DriverMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, router_type, operation, seconds, error=None):
+        with self._lock:
+            stats = self._stats.get((router_type, operation))
+            if stats is None:
+                stats = self._stats[(router_type, operation)] = OperationStats()
+            stats.record(seconds, error)
+
+    def snapshot(self):
+        """{router_type: {operation: stats}}"""
+        with self._lock:
+            result = {}
+            for (router_type, operation), stats in sorted(self._stats.items()):
+                result.setdefault(router_type, {})[operation] = stats.as_dict()
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+driver_metrics = DriverMetrics()
+
+
+def _failure(result):
+    """Error label for a driver result that signals failure without raising"""
+    if result is False:
+        return 'failed'
+    if isinstance(result, dict) and (result.get('error') or result.get('is_online') is False):
+        return 'unavailable'
+    return None
+
+
+def instrument(method, operation):
+    """Wrap a driver method so each call is timed and recorded under the driver's router_type"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.monotonic()
+        error = None
+        try:
+            result = method(self, *args, **kwargs)
+            error = _failure(result)
+            return result
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            driver_metrics.record(self.router_type, operation, time.monotonic() - started, error)
+    wrapper._instrumented = True
+    return wrapper
@@ -1,31 +1,54 @@
 # router_manager/router_drivers/mikrotik.py
 from librouteros import connect
-from librouteros.exceptions import TrapError, ConnectionError
+from librouteros.exceptions import TrapError, FatalError, ConnectionClosed
 import logging
+import time
 from router_manager.router_drivers import RouterDriverBase
 
 logger = logging.getLogger(__name__)
 
+# Errors that mean the API session is gone (socket errors surface as OSError)
+SESSION_ERRORS = (ConnectionClosed, FatalError, OSError)
+
+# Columns requested from RouterOS (.proplist); everything else stays on the router
+LEASE_FIELDS = ['.id', 'mac-address', 'active-address', 'host-name']
+LEASE_KEY_FIELDS = ['.id', 'mac-address', 'active-address']
+REGISTRATION_FIELDS = ['mac-address', 'last-ip', 'interface', 'signal-strength', 'tx-rate', 'rx-rate']
+# Incremental lease polls fall back to a full projected fetch this often
+LEASE_FULL_REFRESH_SECONDS = 900
+# Leases per OR-query when fetching changed lease details
+LEASE_QUERY_CHUNK = 100
+
 class MikroTikDriver(RouterDriverBase):
     """MikroTik router driver using RouterOS API"""
     
+    router_type = 'mikrotik'
+    capabilities = frozenset({'status', 'devices', 'wifi', 'port_forwarding', 'port_forwarding_rules', 'reboot'})
+    
     def __init__(self, router_config):
         super().__init__(router_config)
+        self.connection = None
         self.api = None
+        self._lease_cache = {}
+        self._lease_refreshed_at = 0.0
         
     def connect(self):
         """Connect to MikroTik RouterOS API"""
         try:
-            self.api = connect(
+            started = time.monotonic()
+            self.connection = connect(
                 username=self.config.username,
                 password=self.config.password,
                 host=self.config.ip_address,
                 port=self.config.web_port or 8728,  # Default API port
-                timeout=10
+                timeout=self.timeout
             )
+            # The login exchange is the round trip we can time; commands stream lazily
+            self.latencies.append(time.monotonic() - started)
+            self.api = self._call
             self.logger.info(f"Connected to MikroTik router {self.config.ip_address}")
             return True
-        except (ConnectionError, TrapError) as e:
+        except SESSION_ERRORS + (TrapError,) as e:
             self.logger.error(f"Connection failed: {e}")
             return False
         except Exception as e:
@@ -34,8 +57,25 @@ class MikroTikDriver(RouterDriverBase):
     
     def disconnect(self):
         """Disconnect from API"""
-        if self.api:
-            self.api.close()
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+    
+    def _call(self, *args, **kwargs):
+        """Run an API command and read all replies, flagging a dropped session for the driver pool"""
+        started = time.monotonic()
+        try:
+            replies = list(self.connection(*args, **kwargs))
+            self.latencies.append(time.monotonic() - started)
+            return replies
+        except SESSION_ERRORS:
+            self.auth_expired = True
+            raise
+    
+    def ping(self):
+        """Session check with the cheapest API command"""
+        self.api('/system/identity/getall')
+        return True
     
     def get_status(self):
         """Get router status"""
@@ -64,40 +104,92 @@ class MikroTikDriver(RouterDriverBase):
             self.logger.error(f"Failed to get status: {e}")
             return {'is_online': False, 'error': str(e)}
     
-    def get_connected_devices(self):
-        """Get connected devices via DHCP leases and wireless registrations"""
-        devices = []
+    def _print(self, path, fields, *queries):
+        """Projected print: only `fields` come back, filtered by RouterOS query words"""
+        try:
+            return list(self.connection.rawCmd(f'{path}/print', f"=.proplist={','.join(fields)}", *queries))
+        except SESSION_ERRORS:
+            self.auth_expired = True
+            raise
+    
+    def _lease_details(self, lease_ids):
+        """Full projected rows for specific leases, OR-queried by .id in chunks"""
+        leases = []
+        for start in range(0, len(lease_ids), LEASE_QUERY_CHUNK):
+            chunk = lease_ids[start:start + LEASE_QUERY_CHUNK]
+            queries = [f'?.id={lease_id}' for lease_id in chunk]
+            if len(chunk) > 1:
+                queries.append('?#' + '|' * (len(chunk) - 1))
+            leases.extend(self._print('/ip/dhcp-server/lease', LEASE_FIELDS, *queries))
+        return leases
+    
+    def _active_leases(self):
+        """
+        Active leases by .id. Between full refreshes only the key columns
+        are listed; details are fetched for leases that are new or whose
+        address or MAC changed, the rest come from the previous poll (the
+        driver pool keeps this driver between polls).
+        """
+        now = time.monotonic()
+        if not self._lease_cache or now - self._lease_refreshed_at > LEASE_FULL_REFRESH_SECONDS:
+            leases = self._print('/ip/dhcp-server/lease', LEASE_FIELDS, '?active-address')
+            self._lease_refreshed_at = now
+            self._lease_cache = {lease['.id']: lease for lease in leases}
+            return self._lease_cache
         
+        current = {}
+        changed = []
+        for lease in self._print('/ip/dhcp-server/lease', LEASE_KEY_FIELDS, '?active-address'):
+            cached = self._lease_cache.get(lease['.id'])
+            if cached and all(cached.get(field) == lease.get(field) for field in LEASE_KEY_FIELDS):
+                current[lease['.id']] = cached
+            else:
+                changed.append(lease['.id'])
+        for lease in self._lease_details(changed):
+            current[lease['.id']] = lease
+        self._lease_cache = current
+        return current
+    
+    def _registrations(self):
         try:
-            # Get DHCP leases
-            leases = self.api('/ip/dhcp-server/lease/print')
-            for lease in leases:
-                if lease.get('active-address'):
-                    device = {
-                        'mac_address': lease.get('mac-address', ''),
-                        'ip_address': lease.get('active-address', ''),
-                        'hostname': lease.get('host-name', ''),
-                        'status': 'dhcp',
-                        'expires': lease.get('expires-after', ''),
-                    }
-                    devices.append(device)
+            return self._print('/interface/wireless/registration-table', REGISTRATION_FIELDS)
+        except TrapError:
+            # No legacy wireless package on this router
+            return []
+    
+    def get_connected_devices(self):
+        """Active DHCP leases joined with wireless registrations, one entry per MAC"""
+        try:
+            devices = {}
+            for lease in self._active_leases().values():
+                mac_address = (lease.get('mac-address') or '').upper()
+                if not mac_address:
+                    continue
+                devices[mac_address] = {
+                    'mac_address': mac_address,
+                    'ip_address': lease.get('active-address', ''),
+                    'hostname': lease.get('host-name', ''),
+                    'status': 'dhcp',
+                }
             
-            # Get wireless registrations
-            wireless_clients = self.api('/interface/wireless/registration-table/print')
-            for client in wireless_clients:
-                device = {
-                    'mac_address': client.get('mac-address', ''),
+            for client in self._registrations():
+                mac_address = (client.get('mac-address') or '').upper()
+                if not mac_address:
+                    continue
+                device = devices.setdefault(mac_address, {
+                    'mac_address': mac_address,
                     'ip_address': client.get('last-ip', ''),
-                    'hostname': client.get('last-ip', ''),  # MikroTik doesn't store hostname here
+                    'hostname': '',  # MikroTik doesn't store hostname here
+                    'status': 'wireless',
+                })
+                device.update({
                     'interface': client.get('interface', ''),
                     'signal_strength': client.get('signal-strength', ''),
                     'tx_rate': client.get('tx-rate', ''),
                     'rx_rate': client.get('rx-rate', ''),
-                    'status': 'wireless',
-                }
-                devices.append(device)
+                })
             
-            return devices
+            return list(devices.values())
             
         except Exception as e:
             self.logger.error(f"Failed to get devices: {e}")
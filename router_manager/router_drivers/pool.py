@@ -0,0 +1,214 @@
+# router_manager/router_drivers/pool.py
+"""
+Shared pool of authenticated router driver sessions.
+
+One connected driver is kept per RouterConfig and checked out exclusively,
+so back-to-back operations on a router reuse its login (Tenda token,
+Huawei digest session, MikroTik API socket) instead of logging in again.
+
+- Sessions used within HEALTH_CHECK_AFTER seconds are reused as-is; older
+  idle sessions are pinged first and replaced when the ping fails.
+- Sessions idle for longer than IDLE_TIMEOUT, or older than MAX_AGE, are
+  logged out and replaced.
+- A driver that saw an authentication failure during an operation is
+  logged in again and the operation retried once.
+- Changing a router's address, port, type or credentials replaces its
+  session.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from . import RouterDriverFactory
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, 'ROUTER_MANAGER', {}).get(name, default)
+
+
+def _fingerprint(router_config):
+    """Everything that requires a fresh login when it changes"""
+    parts = [
+        router_config.router_type, router_config.ip_address, router_config.web_port,
+        router_config.username, router_config.password,
+    ]
+    return hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+class PooledSession:
+    """A connected driver plus its bookkeeping"""
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+        self.driver = None
+        self.connected_at = None
+        self.last_used = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_connected(self):
+        return self.driver is not None
+
+    def close(self):
+        if self.driver is not None:
+            try:
+                self.driver.disconnect()
+            except Exception as e:
+                logger.debug(f"Error closing router session: {e}")
+        self.driver = None
+        self.connected_at = None
+
+
+class DriverPool:
+    """Keyed pool of router driver sessions, one per RouterConfig"""
+
+    def __init__(self):
+        self.idle_timeout = _setting('SESSION_IDLE_TIMEOUT', 120)
+        self.health_check_after = _setting('SESSION_HEALTH_CHECK_AFTER', 30)
+        self.max_age = _setting('SESSION_MAX_AGE', 1800)
+        # Longest wait for another thread's operation on the same router
+        self.checkout_timeout = _setting('CONNECTION_TIMEOUT', 10) * 3
+
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.stats = {'logins': 0, 'reused': 0, 'health_checks': 0, 'relogins': 0, 'expired': 0}
+
+    def _entry(self, router_config):
+        fingerprint = _fingerprint(router_config)
+        with self._lock:
+            entry = self._sessions.get(router_config.pk)
+            if entry is None or entry.fingerprint != fingerprint:
+                stale, entry = entry, PooledSession(fingerprint)
+                self._sessions[router_config.pk] = entry
+            else:
+                stale = None
+        if stale is not None:
+            with stale.lock:
+                stale.close()
+        return entry
+
+    def _login(self, entry, router_config, timeout=None):
+        entry.close()
+        try:
+            driver = RouterDriverFactory.get_driver(router_config)
+        except Exception as e:
+            logger.error(f"Failed to get driver for {router_config}: {e}")
+            return False
+        if timeout:
+            driver.timeout = timeout
+        self.stats['logins'] += 1
+        if not driver.connect():
+            return False
+        entry.driver = driver
+        entry.connected_at = entry.last_used = time.monotonic()
+        return True
+
+    def _ensure_session(self, entry, router_config, timeout=None):
+        """Reuse, health-check or replace the entry's session. Returns True when connected."""
+        now = time.monotonic()
+        if entry.is_connected:
+            idle = now - entry.last_used
+            if idle > self.idle_timeout or now - entry.connected_at > self.max_age:
+                self.stats['expired'] += 1
+                entry.close()
+            elif idle > self.health_check_after:
+                self.stats['health_checks'] += 1
+                if not self._ping(entry.driver):
+                    entry.close()
+        if entry.is_connected:
+            self.stats['reused'] += 1
+            return True
+        return self._login(entry, router_config, timeout)
+
+    @staticmethod
+    def _ping(driver):
+        try:
+            return driver.ping()
+        except Exception:
+            return False
+
+    def run(self, router_config, operation, close=False, timeout=None):
+        """
+        Run `operation(driver)` on the router's pooled session.
+        Returns (connected, result); result is None when not connected.
+        `close` drops the session afterwards (e.g. after a reboot).
+        `timeout` overrides the driver's per-request timeout.
+        """
+        entry = self._entry(router_config)
+        if not entry.lock.acquire(timeout=self.checkout_timeout):
+            logger.warning(f"Timed out waiting for a session to {router_config.name}")
+            return False, None
+        try:
+            if timeout and entry.is_connected:
+                entry.driver.timeout = timeout
+            if not self._ensure_session(entry, router_config, timeout):
+                return False, None
+
+            entry.driver.auth_expired = False
+            result = operation(entry.driver)
+            if entry.driver.auth_expired:
+                # The router dropped our login mid-operation: log in again and retry once
+                self.stats['relogins'] += 1
+                logger.info(f"Session to {router_config.name} expired, logging in again")
+                if not self._login(entry, router_config, timeout):
+                    return False, None
+                result = operation(entry.driver)
+
+            entry.last_used = time.monotonic()
+            return True, result
+        except Exception:
+            entry.close()
+            raise
+        finally:
+            if close or (entry.driver is not None and entry.driver.auth_expired):
+                entry.close()
+            entry.lock.release()
+
+    def discard(self, config_id):
+        """Log out and forget a router's session"""
+        with self._lock:
+            entry = self._sessions.pop(config_id, None)
+        if entry is not None:
+            with entry.lock:
+                entry.close()
+
+    def prune(self):
+        """Log out sessions that have been idle past IDLE_TIMEOUT. Returns how many were closed."""
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._sessions.items())
+        closed = 0
+        for config_id, entry in entries:
+            if not entry.lock.acquire(blocking=False):
+                continue  # In use, so not idle
+            try:
+                if entry.is_connected and now - entry.last_used > self.idle_timeout:
+                    entry.close()
+                    closed += 1
+                if not entry.is_connected:
+                    with self._lock:
+                        if self._sessions.get(config_id) is entry:
+                            del self._sessions[config_id]
+            finally:
+                entry.lock.release()
+        self.stats['expired'] += closed
+        return closed
+
+    def close_all(self):
+        with self._lock:
+            config_ids = list(self._sessions)
+        for config_id in config_ids:
+            self.discard(config_id)
+
+    def get_status(self):
+        with self._lock:
+            sessions = len(self._sessions)
+        return {'sessions': sessions, **self.stats}
+
+
+driver_pool = DriverPool()
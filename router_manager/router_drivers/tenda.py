@@ -10,10 +10,15 @@ logger = logging.getLogger(__name__)
 class TendaDriver(RouterDriverBase):
     """Tenda router driver (supports AC10, AC18, F3, F6, etc.)"""
     
+    router_type = 'tenda'
+    capabilities = frozenset({'status', 'devices', 'wifi', 'port_forwarding', 'reboot'})
+    
     def __init__(self, router_config):
         super().__init__(router_config)
         self.base_url = f"http://{self.config.ip_address}:{self.config.web_port}"
         self.session = requests.Session()
+        self._watch_auth(self.session)
+        self._track_latency(self.session)
         self.token = None
         self.stok = None
         
@@ -31,7 +36,7 @@ class TendaDriver(RouterDriverBase):
                 'password': password_hash,
             }
             
-            response = self.session.post(login_url, data=login_data, timeout=10)
+            response = self.session.post(login_url, data=login_data, timeout=self.timeout)
             
             if response.status_code == 200:
                 # Try to extract token from response
@@ -78,15 +83,20 @@ class TendaDriver(RouterDriverBase):
             }
             
             if data:
-                response = self.session.post(url, data=data, headers=headers, timeout=10)
+                response = self.session.post(url, data=data, headers=headers, timeout=self.timeout)
             else:
-                response = self.session.get(url, headers=headers, timeout=10)
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
             
             return response
         except Exception as e:
             self.logger.error(f"Request failed: {e}")
             return None
     
+    def ping(self):
+        """Session check without parsing the status payload"""
+        response = self._make_request("goform/getStatus")
+        return bool(response is not None and response.status_code == 200 and not self.auth_expired)
+    
     def get_status(self):
         """Get router status"""
         try:
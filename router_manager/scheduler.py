@@ -0,0 +1,323 @@
+# router_manager/scheduler.py
+"""
+Adaptive, concurrent polling for RouterMonitor.
+
+Every RouterConfig gets a poll state with its own interval. Due routers
+come off a priority queue (earliest due first) and are polled on a
+bounded thread pool, each with a jittered deadline. After each poll the
+interval adapts:
+
+- healthy routers back off towards MAX_INTERVAL
+- routers that flap, have just recovered, or have not been checked for
+  longer than MAX_INTERVAL are polled again at MIN_INTERVAL
+- routers that keep failing back off exponentially from MIN_INTERVAL
+
+Next due times are jittered too, so polls spread out instead of
+arriving in bursts.
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Outcomes remembered per router to detect flapping
+HISTORY_SIZE = 6
+# Online/offline transitions within the history that count as flapping
+FLAP_THRESHOLD = 2
+# Healthy routers stretch their interval by this factor per clean poll
+BACKOFF_FACTOR = 1.5
+# +/- fraction applied to next-due times and poll deadlines
+JITTER = 0.1
+# How often the router list is re-read from the database
+REFRESH_SECONDS = 60
+
+
+def _setting(name, default):
+    return getattr(settings, 'ROUTER_MANAGER', {}).get(name, default)
+
+
+def _jitter(seconds):
+    return seconds * random.uniform(1 - JITTER, 1 + JITTER)
+
+
+class RouterPollState:
+    """Scheduling state for one RouterConfig"""
+
+    def __init__(self, config_id, name, interval, due_at):
+        self.config_id = config_id
+        self.name = name
+        self.interval = interval
+        self.due_at = due_at
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.consecutive_failures = 0
+        self.last_latency = None
+        self.last_polled = None
+        self.last_message = ''
+        self.in_flight = False
+
+    @property
+    def flaps(self):
+        history = list(self.history)
+        return sum(1 for a, b in zip(history, history[1:]) if a != b)
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'interval': round(self.interval, 1),
+            'due_in': round(self.due_at - time.monotonic(), 1),
+            'latency': round(self.last_latency, 3) if self.last_latency is not None else None,
+            'consecutive_failures': self.consecutive_failures,
+            'flaps': self.flaps,
+            'last_message': self.last_message,
+            'in_flight': self.in_flight,
+        }
+
+
+class MonitorScheduler:
+    """Priority-queue scheduler that polls routers on a bounded thread pool"""
+
+    def __init__(self, service, base_interval=None):
+        self.service = service
+        self.base_interval = base_interval or _setting('SYNC_INTERVAL', 300)
+        self.min_interval = _setting('MONITOR_MIN_INTERVAL', 60)
+        self.max_interval = _setting('MONITOR_MAX_INTERVAL', 1800)
+        self.max_workers = _setting('MONITOR_WORKERS', 16)
+        # A poll is a status check plus a device sync, each bounded by the driver timeout
+        self.poll_deadline = _setting('CONNECTION_TIMEOUT', 10) * 3
+
+        self.states = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._last_refresh = None
+        self.last_cycle = None
+
+    # -- queue ---------------------------------------------------------------
+
+    def _push(self, state):
+        heapq.heappush(self._queue, (state.due_at, next(self._sequence), state.config_id))
+
+    def _schedule(self, state, interval):
+        state.interval = min(max(interval, self.min_interval), self.max_interval)
+        state.due_at = time.monotonic() + _jitter(state.interval)
+        self._push(state)
+
+    def _pop_due(self, limit):
+        """Up to `limit` due states in priority order, skipping stale queue entries"""
+        now = time.monotonic()
+        due, deferred = [], []
+        while self._queue and len(due) < limit:
+            due_at, _, config_id = self._queue[0]
+            if due_at > now:
+                break
+            heapq.heappop(self._queue)
+            state = self.states.get(config_id)
+            if not state or state.due_at != due_at:
+                continue  # Rescheduled or removed since this entry was pushed
+            if state.in_flight:
+                deferred.append(state)
+                continue
+            due.append(state)
+        for state in deferred:
+            self._push(state)
+        return due
+
+    def seconds_until_next_due(self):
+        with self._lock:
+            while self._queue:
+                due_at, _, config_id = self._queue[0]
+                state = self.states.get(config_id)
+                if state and state.due_at == due_at:
+                    return max(due_at - time.monotonic(), 0)
+                heapq.heappop(self._queue)
+        return self.base_interval
+
+    def refresh(self, force=False):
+        """Sync poll states with the RouterConfig table"""
+        from .models import RouterConfig
+
+        now = time.monotonic()
+        if not force and self._last_refresh and now - self._last_refresh < REFRESH_SECONDS:
+            return
+        self._last_refresh = now
+
+        stale_before = timezone.now() - timezone.timedelta(seconds=self.max_interval)
+        rows = RouterConfig.objects.values_list('id', 'name', 'is_online', 'last_checked')
+        seen = set()
+        with self._lock:
+            for config_id, name, is_online, last_checked in rows:
+                seen.add(config_id)
+                state = self.states.get(config_id)
+                if state is None:
+                    # New routers start spread over one base interval
+                    state = RouterPollState(config_id, name, self.base_interval, now + random.uniform(0, self.min_interval))
+                    state.history.append(bool(is_online))
+                    self.states[config_id] = state
+                    self._push(state)
+                elif last_checked is None or last_checked < stale_before:
+                    # Stale: nothing has checked this router for too long
+                    if state.due_at > now and not state.in_flight:
+                        state.due_at = now
+                        self._push(state)
+                state.name = name
+            for config_id in set(self.states) - seen:
+                del self.states[config_id]
+
+    # -- polling -------------------------------------------------------------
+
+    def _poll(self, config_id):
+        """Worker: check one router and sync its devices. Returns (success, message, latency)."""
+        from .models import RouterConfig
+
+        close_old_connections()
+        started = time.monotonic()
+        try:
+            config = RouterConfig.objects.filter(pk=config_id).first()
+            if config is None:
+                return False, 'Router removed', 0.0
+            success, message = self.service.test_connection(config)
+            if success:
+                self.service.sync_connected_devices(config)
+            return success, message, time.monotonic() - started
+        except Exception as e:
+            logger.error(f"Error monitoring router {config_id}: {e}")
+            return False, str(e), time.monotonic() - started
+        finally:
+            close_old_connections()
+
+    def _record(self, state, success, message, latency):
+        state.in_flight = False
+        was_online = state.history[-1] if state.history else None
+        state.history.append(success)
+        state.last_latency = latency
+        state.last_polled = timezone.now()
+        state.last_message = message
+
+        if success:
+            state.consecutive_failures = 0
+            if was_online is False or state.flaps >= FLAP_THRESHOLD:
+                interval = self.min_interval  # Just recovered or flapping: watch closely
+            else:
+                interval = state.interval * BACKOFF_FACTOR
+        else:
+            state.consecutive_failures += 1
+            if state.flaps >= FLAP_THRESHOLD:
+                interval = self.min_interval
+            else:
+                interval = self.min_interval * (2 ** (state.consecutive_failures - 1))
+            logger.warning(f"Router {state.name} is offline: {message}")
+        self._schedule(state, interval)
+
+    def _executor_for_cycle(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='RouterPoll')
+        return self._executor
+
+    def run_cycle(self, force=False, budget=None):
+        """
+        Poll every due router (every router when `force`) with at most
+        max_workers in flight. Polls that overrun their deadline are
+        counted as timeouts and rescheduled when their thread returns.
+        Returns the cycle report.
+        """
+        self.refresh(force=force)
+        budget = budget or self.base_interval
+        executor = self._executor_for_cycle()
+        started = time.monotonic()
+        report = {'polled': 0, 'succeeded': 0, 'failed': 0, 'timed_out': 0, 'latencies': {}}
+
+        with self._lock:
+            if force:
+                for state in self.states.values():
+                    if not state.in_flight:
+                        state.due_at = started
+                        self._push(state)
+        running = {}
+        submitting = True
+
+        while True:
+            with self._lock:
+                # Recounted every pass: late polls from earlier deadlines release their slot when they finish
+                in_flight = sum(1 for state in self.states.values() if state.in_flight)
+                free = self.max_workers - in_flight if submitting else 0
+                for state in self._pop_due(max(free, 0)):
+                    state.in_flight = True
+                    deadline = time.monotonic() + _jitter(self.poll_deadline)
+                    running[executor.submit(self._poll, state.config_id)] = (state, deadline)
+            if not running:
+                break
+
+            now = time.monotonic()
+            next_deadline = min(deadline for _, deadline in running.values())
+            done, _ = wait(running, timeout=max(next_deadline - now, 0), return_when=FIRST_COMPLETED)
+
+            with self._lock:
+                for future in done:
+                    state, _ = running.pop(future)
+                    success, message, latency = future.result()
+                    self._record(state, success, message, latency)
+                    report['polled'] += 1
+                    report['succeeded' if success else 'failed'] += 1
+                    report['latencies'][state.name] = round(latency, 3)
+
+                now = time.monotonic()
+                for future, (state, deadline) in list(running.items()):
+                    if now >= deadline:
+                        # Leave the thread to finish; its result still reschedules the router
+                        running.pop(future)
+                        future.add_done_callback(self._late_result(state))
+                        report['polled'] += 1
+                        report['timed_out'] += 1
+                        logger.warning(f"Router {state.name} poll exceeded its {self.poll_deadline}s deadline")
+
+            if submitting and time.monotonic() - started > budget:
+                logger.warning("Monitoring cycle budget exhausted; remaining routers stay queued")
+                submitting = False
+
+        report['duration'] = round(time.monotonic() - started, 3)
+        report['finished_at'] = timezone.now().isoformat()
+        if report['latencies']:
+            slowest = sorted(report['latencies'].items(), key=lambda item: item[1], reverse=True)
+            report['slowest'] = slowest[:10]
+        self.last_cycle = report
+        logger.info(
+            f"Monitoring cycle polled {report['polled']} routers in {report['duration']}s "
+            f"({report['failed']} failed, {report['timed_out']} timed out)"
+        )
+        return report
+
+    def _late_result(self, state):
+        def callback(future):
+            success, message, latency = future.result()
+            with self._lock:
+                self._record(state, success, message, latency)
+        return callback
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def get_status(self):
+        with self._lock:
+            routers = {state.config_id: state.as_dict() for state in self.states.values()}
+        return {
+            'max_workers': self.max_workers,
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+            'routers_tracked': len(routers),
+            'in_flight': sum(1 for state in routers.values() if state['in_flight']),
+            'last_cycle': self.last_cycle,
+            'routers': routers,
+        }
@@ -3,11 +3,21 @@ import logging
 import concurrent.futures
 from datetime import timedelta
 from django.utils import timezone
-from django.db import transaction
-from .router_drivers import RouterDriverFactory
+from django.db import IntegrityError, transaction
+from .breaker import RouterUnavailable, router_breakers
+from .ports import PortAllocator, PortsExhausted
+from .router_drivers import RouterDriverFactory, driver_registry
+from .router_drivers.metrics import driver_metrics
+from .router_drivers.pool import driver_pool
+from . import telemetry
+from accounts import status_events
 
 logger = logging.getLogger(__name__)
 
+# Fields a device sync refreshes from the router's report
+DEVICE_SYNC_FIELDS = ('name', 'ip_address', 'device_type', 'connection_type', 'signal_strength')
+DEVICE_SYNC_BATCH = 500
+
 
 class RouterManagerService:
     """On-demand service for managing router communications"""
@@ -26,32 +36,94 @@ class RouterManagerService:
             logger.error(f"Failed to get driver for {router_config}: {e}")
             return None
     
+    def run_on_router(self, router_config, operation, close=False):
+        """
+        driver_pool.run() behind the router's circuit breaker, with a request
+        timeout adapted to its round trips. Raises RouterUnavailable while the
+        circuit is open.
+        """
+        breaker = router_breakers.get(router_config.pk)
+        if not breaker.allow():
+            raise RouterUnavailable(
+                f"Router {router_config.name} is unreachable, next retry in {breaker.retry_in():.0f}s"
+            )
+        
+        rtts, lost = [], []
+        def timed(driver):
+            try:
+                return operation(driver)
+            except Exception as e:
+                # Network errors and dropped sessions count against the router; other errors don't
+                if isinstance(e, OSError) or driver.auth_expired:
+                    lost.append(e)
+                raise
+            finally:
+                rtts.extend(driver.take_latencies())
+        
+        connected = False
+        try:
+            connected, result = driver_pool.run(router_config, timed, close=close, timeout=breaker.timeout())
+        except Exception:
+            connected = not lost
+            raise
+        finally:
+            if connected:
+                breaker.record_success(rtts)
+            elif breaker.record_failure():
+                logger.warning(f"Circuit opened for router {router_config.name} after {breaker.failures} failures")
+        return connected, result
+    
+    def _unsupported(self, router_config, capability):
+        """Error message when the router's driver lacks `capability`, else None"""
+        if driver_registry.supports(router_config.router_type, capability):
+            return None
+        return f"{capability.replace('_', ' ').capitalize()} is not supported for {router_config.get_router_type_display()} routers"
+    
     def test_connection(self, router_config):
         """Test connection to router (on-demand)"""
         try:
-            driver = self.get_router_driver(router_config)
-            if not driver:
-                return False, "No driver available"
-            
-            if driver.connect():
-                status = driver.get_status()
-                driver.disconnect()
-                
-                if status and status.get('is_online'):
-                    # Update router status
-                    router_config.is_online = True
-                    router_config.last_checked = timezone.now()
-                    router_config.save()
-                    return True, "Connection successful"
-            
-            router_config.is_online = False
-            router_config.save()
-            return False, "Connection failed"
-            
+            unsupported = self._unsupported(router_config, 'status')
+            if unsupported:
+                return False, unsupported
+            
+            connected, status = self.run_on_router(router_config, lambda driver: driver.get_status())
+            online = bool(connected and status and status.get('is_online'))
+            message = "Connection successful" if online else "Connection failed"
+            
+            if online:
+                router_config.last_checked = timezone.now()
+                router_config.save(update_fields=['last_checked'])
+            self._set_online(router_config, online, message)
+            telemetry.record_router_sample(router_config, is_online=online)
+            return online, message
+            
+        except RouterUnavailable as e:
+            # Skipped polls of a dead router still count against its uptime
+            telemetry.record_router_sample(router_config, is_online=False)
+            return False, str(e)
         except Exception as e:
             logger.error(f"Connection test failed: {e}")
             return False, str(e)
     
+    def _set_online(self, router_config, online, message):
+        """
+        Store the check's result and emit router.online / router.offline
+        if it changed the row. The flip is a conditional UPDATE, so of
+        several overlapping checks only the one that flips it emits.
+        """
+        from .models import RouterConfig
+        
+        router_config.is_online = online
+        flipped = RouterConfig.objects.filter(pk=router_config.pk).exclude(is_online=online).update(is_online=online)
+        if not flipped:
+            return
+        status_events.emit(
+            router_config.tenant_id,
+            'router.online' if router_config.is_online else 'router.offline',
+            f'router:{router_config.pk}',
+            {'router_id': router_config.pk, 'name': router_config.name, 'message': message},
+        )
+    
     def get_router_status(self, router_config, force_check=False):
         """Get router status - cached or fresh (on-demand)"""
         # Use cached status if recent and not forced
@@ -78,68 +150,148 @@ class RouterManagerService:
     def sync_connected_devices(self, router_config):
         """Sync connected devices from router (on-demand)"""
         try:
-            driver = self.get_router_driver(router_config)
-            if not driver or not driver.connect():
-                return False, "Failed to connect to router"
+            unsupported = self._unsupported(router_config, 'devices')
+            if unsupported:
+                return False, unsupported
             
             # Get devices from router
-            devices_data = driver.get_connected_devices()
-            driver.disconnect()
+            connected, devices_data = self.run_on_router(
+                router_config, lambda driver: driver.get_connected_devices()
+            )
+            if not connected:
+                return False, "Failed to connect to router"
             
-            updated_count = 0
-            with transaction.atomic():
-                for device_data in devices_data:
-                    mac_address = device_data.get('mac_address', '').upper()
-                    if not mac_address:
-                        continue
-                    
-                    # Create or update device
-                    from .models import Router, RouterConfig, ConnectedDevice, PortForwardingRule, RouterLog
+            from .models import ConnectedDevice, RouterLog
 
-                    device, created = ConnectedDevice.objects.update_or_create(
-                        router=router_config.router,
-                        mac_address=mac_address,
-                        defaults={
-                            'name': device_data.get('hostname', ''),
-                            'ip_address': device_data.get('ip_address', ''),
-                            'device_type': self._detect_device_type(device_data),
-                            'connection_type': device_data.get('interface', 'wireless_2.4'),
-                            'signal_strength': device_data.get('signal_strength'),
-                            'last_seen': timezone.now(),
-                            'is_active': True,
-                        }
-                    )
-                    
-                    if not created:
-                        # Update existing device
-                        device.ip_address = device_data.get('ip_address', device.ip_address)
-                        device.name = device_data.get('hostname', device.name)
-                        device.last_seen = timezone.now()
-                        device.is_active = True
-                        device.save()
-                    
-                    updated_count += 1
+            seen = self._merge_device_data(devices_data)
+            telemetry.record_client_sample(router_config, len(seen))
+            
+            # Devices are stored against the customer router linked to this config
+            router = router_config.customer_routers.first()
+            if router is None:
+                return False, "No customer router linked to this configuration"
+            
+            now = timezone.now()
+            existing = {
+                device.mac_address.upper(): device
+                for device in ConnectedDevice.objects.filter(router=router)
+            }
+            
+            to_create, to_update, touched, joined = [], [], [], []
+            for mac_address, device_data in seen.items():
+                fields = {
+                    'name': device_data.get('hostname') or '',
+                    'ip_address': device_data.get('ip_address') or None,
+                    'device_type': self._detect_device_type(device_data),
+                    'connection_type': (device_data.get('interface') or 'wireless_2.4')[:15],
+                    'signal_strength': self._parse_signal_strength(device_data.get('signal_strength')),
+                }
+                device = existing.get(mac_address)
+                if device is None:
+                    # Devices without a lease yet are stored with no address and filled in on a later sync
+                    to_create.append(ConnectedDevice(
+                        router=router, mac_address=mac_address, last_seen=now, is_active=True, **fields
+                    ))
+                    joined.append((mac_address, fields['name'], fields['ip_address']))
+                    continue
+                
+                if not device.is_active:
+                    joined.append((mac_address, fields['name'] or device.name, fields['ip_address'] or device.ip_address))
                 
-                # Mark old devices as inactive
-                active_macs = {d.get('mac_address', '').upper() for d in devices_data}
-                ConnectedDevice.objects.filter(
-                    router=router_config.router,
-                    last_seen__lt=timezone.now() - timedelta(minutes=10)
-                ).update(is_active=False)
+                # Keep the stored name and address when the router does not report one
+                fields['name'] = fields['name'] or device.name
+                fields['ip_address'] = fields['ip_address'] or device.ip_address
+                if any(getattr(device, field) != value for field, value in fields.items()):
+                    for field, value in fields.items():
+                        setattr(device, field, value)
+                    device.last_seen = now
+                    device.is_active = True
+                    to_update.append(device)
+                else:
+                    touched.append(device.pk)
+            
+            # Devices not reported for a while are marked inactive
+            stale_before = now - timedelta(minutes=10)
+            left = [
+                device for mac_address, device in existing.items()
+                if mac_address not in seen and device.is_active and device.last_seen < stale_before
+            ]
+            deactivated = [device.pk for device in left]
+            
+            with transaction.atomic():
+                if to_create:
+                    ConnectedDevice.objects.bulk_create(
+                        to_create,
+                        batch_size=DEVICE_SYNC_BATCH,
+                        update_conflicts=True,
+                        unique_fields=['router', 'mac_address'],
+                        update_fields=list(DEVICE_SYNC_FIELDS) + ['last_seen', 'is_active'],
+                    )
+                if to_update:
+                    ConnectedDevice.objects.bulk_update(
+                        to_update,
+                        list(DEVICE_SYNC_FIELDS) + ['last_seen', 'is_active'],
+                        batch_size=DEVICE_SYNC_BATCH,
+                    )
+                if touched:
+                    ConnectedDevice.objects.filter(pk__in=touched).update(last_seen=now, is_active=True)
+                if deactivated:
+                    ConnectedDevice.objects.filter(pk__in=deactivated).update(is_active=False)
+            
+            updated_count = len(to_create) + len(to_update) + len(touched)
+            telemetry.record_device_samples(router, seen, self._parse_signal_strength)
+            
+            for mac_address, name, ip_address in joined:
+                status_events.emit(router_config.tenant_id, 'device.joined', f'device:{router.pk}:{mac_address}', {
+                    'router_id': router_config.pk, 'mac_address': mac_address, 'name': name, 'ip_address': ip_address,
+                })
+            for device in left:
+                status_events.emit(router_config.tenant_id, 'device.left', f'device:{router.pk}:{device.mac_address.upper()}', {
+                    'router_id': router_config.pk, 'mac_address': device.mac_address.upper(), 'name': device.name,
+                })
             
             # Log the sync
             RouterLog.objects.create(
-                router=router_config.router,
+                router=router,
                 log_type='connection',
                 message=f'Synced {updated_count} devices from router'
             )
             
             return True, f"Successfully synced {updated_count} devices"
             
+        except RouterUnavailable as e:
+            return False, str(e)
         except Exception as e:
             logger.error(f"Failed to sync devices: {e}")
             return False, str(e)
     
+    def _merge_device_data(self, devices_data):
+        """
+        One entry per MAC. Routers can report a device more than once (e.g.
+        DHCP lease and wireless registration); the first non-empty value
+        for each key wins.
+        """
+        merged = {}
+        for device_data in devices_data or []:
+            mac_address = (device_data.get('mac_address') or '').upper()
+            if not mac_address:
+                continue
+            entry = merged.setdefault(mac_address, {})
+            for key, value in device_data.items():
+                if value not in (None, '') and entry.get(key) in (None, ''):
+                    entry[key] = value
+        return merged
+    
+    def _parse_signal_strength(self, value):
+        """dBm as an int in [-100, 0], from values like -65 or '-65@6Mbps'"""
+        if value in (None, ''):
+            return None
+        try:
+            dbm = int(str(value).split('@')[0].strip())
+        except ValueError:
+            return None
+        return dbm if -100 <= dbm <= 0 else None
+    
     def _detect_device_type(self, device_data):
         """Detect device type from data"""
         hostname = (device_data.get('hostname', '') or '').lower()
@@ -158,12 +310,15 @@ class RouterManagerService:
     def get_port_forwarding_rules(self, router_config):
         """Get port forwarding rules from router (on-demand)"""
         try:
-            driver = self.get_router_driver(router_config)
-            if not driver or not driver.connect():
-                return False, "Failed to connect", []
+            unsupported = self._unsupported(router_config, 'port_forwarding_rules')
+            if unsupported:
+                return False, unsupported, []
             
-            rules_data = driver.get_port_forwarding_rules()
-            driver.disconnect()
+            connected, rules_data = self.run_on_router(
+                router_config, lambda driver: driver.get_port_forwarding_rules()
+            )
+            if not connected:
+                return False, "Failed to connect", []
             
             # Sync with database
             from .models import Router, RouterConfig, ConnectedDevice, PortForwardingRule, RouterLog
@@ -184,6 +339,8 @@ class RouterManagerService:
             
             return True, "Rules synced successfully", rules_data
             
+        except RouterUnavailable as e:
+            return False, str(e), []
         except Exception as e:
             logger.error(f"Failed to get port forwarding rules: {e}")
             return False, str(e), []
@@ -191,12 +348,15 @@ class RouterManagerService:
     def update_wifi_settings(self, router_config, ssid, password, security_type='wpa2'):
         """Update WiFi settings on router (on-demand)"""
         try:
-            driver = self.get_router_driver(router_config)
-            if not driver or not driver.connect():
-                return False, "Failed to connect"
+            unsupported = self._unsupported(router_config, 'wifi')
+            if unsupported:
+                return False, unsupported
             
-            success = driver.change_wifi_settings(ssid, password, security_type)
-            driver.disconnect()
+            connected, success = self.run_on_router(
+                router_config, lambda driver: driver.change_wifi_settings(ssid, password, security_type)
+            )
+            if not connected:
+                return False, "Failed to connect"
             
             if success:
                 from .models import Router, RouterConfig, ConnectedDevice, PortForwardingRule, RouterLog
@@ -221,6 +381,8 @@ class RouterManagerService:
             else:
                 return False, "Failed to update WiFi settings"
                 
+        except RouterUnavailable as e:
+            return False, str(e)
         except Exception as e:
             logger.error(f"Failed to update WiFi settings: {e}")
             return False, str(e)
@@ -229,19 +391,32 @@ class RouterManagerService:
                                    internal_ip, internal_port, protocol='tcp', description=""):
         """Create port forwarding rule on router (on-demand)"""
         try:
-            driver = self.get_router_driver(router_config)
-            if not driver or not driver.connect():
-                return False, "Failed to connect to router", None
+            unsupported = self._unsupported(router_config, 'port_forwarding')
+            if unsupported:
+                return False, unsupported, None
             
-            success = driver.create_port_forwarding(external_port, internal_ip, internal_port, protocol)
-            driver.disconnect()
+            from .models import Router, RouterConfig, ConnectedDevice, PortForwardingRule, RouterLog
+
+            customer_router = Router.objects.filter(user=customer).first()
+            if customer_router is None:
+                return False, f"{customer.username} has no router profile", None
+            if PortForwardingRule.objects.filter(
+                router_config=router_config, external_port=external_port, is_active=True
+            ).exists():
+                return False, f"Port {external_port} is already in use on this router", None
+            
+            connected, success = self.run_on_router(
+                router_config,
+                lambda driver: driver.create_port_forwarding(external_port, internal_ip, internal_port, protocol)
+            )
+            if not connected:
+                return False, "Failed to connect to router", None
             
             if success:
-                from .models import Router, RouterConfig, ConnectedDevice, PortForwardingRule, RouterLog
-
                 # Create database record
                 rule = PortForwardingRule.objects.create(
-                    router=router_config,
+                    router=customer_router,
+                    router_config=router_config,
                     customer=customer,
                     external_port=external_port,
                     internal_ip=internal_ip,
@@ -265,6 +440,8 @@ class RouterManagerService:
             
             return False, "Failed to create port forwarding on router", None
             
+        except RouterUnavailable as e:
+            return False, str(e), None
         except Exception as e:
             logger.error(f"Failed to create port forwarding: {e}")
             return False, str(e), None
@@ -272,17 +449,15 @@ class RouterManagerService:
     def delete_port_forwarding_rule(self, rule):
         """Delete port forwarding rule from router (on-demand)"""
         try:
-            driver = self.get_router_driver(rule.router)
-            if not driver or not driver.connect():
-                return False, "Failed to connect to router"
-            
-            # Note: This assumes driver has delete_port_forwarding method
-            # If not implemented, we'll just disable it locally
-            success = True
-            if hasattr(driver, 'delete_port_forwarding'):
-                success = driver.delete_port_forwarding(rule.external_port, rule.protocol)
-            
-            driver.disconnect()
+            # Drivers that can't delete rules remotely: just disable it locally
+            if rule.router_config and driver_registry.supports(rule.router_config.router_type, 'port_forwarding_delete'):
+                connected, success = self.run_on_router(
+                    rule.router_config, lambda driver: driver.delete_port_forwarding(rule.external_port, rule.protocol)
+                )
+                if not connected:
+                    return False, "Failed to connect to router"
+            else:
+                success = True
             
             if success:
                 rule.is_active = False
@@ -302,6 +477,8 @@ class RouterManagerService:
             
             return False, "Failed to remove port forwarding rule"
             
+        except RouterUnavailable as e:
+            return False, str(e)
         except Exception as e:
             logger.error(f"Failed to remove port forwarding: {e}")
             return False, str(e)
@@ -309,12 +486,14 @@ class RouterManagerService:
     def reboot_router(self, router_config):
         """Reboot router (on-demand)"""
         try:
-            driver = self.get_router_driver(router_config)
-            if not driver or not driver.connect():
-                return False, "Failed to connect"
+            unsupported = self._unsupported(router_config, 'reboot')
+            if unsupported:
+                return False, unsupported
             
-            success = driver.reboot()
-            driver.disconnect()
+            # The session does not survive the reboot
+            connected, success = self.run_on_router(router_config, lambda driver: driver.reboot(), close=True)
+            if not connected:
+                return False, "Failed to connect"
             
             if success:
                 router_config.is_online = False
@@ -334,6 +513,8 @@ class RouterManagerService:
             
             return False, "Failed to reboot router"
             
+        except RouterUnavailable as e:
+            return False, str(e)
         except Exception as e:
             logger.error(f"Failed to reboot router: {e}")
             return False, str(e)
@@ -355,118 +536,172 @@ class RouterManagerService:
 class PortManagementService:
     """On-demand service for managing customer port forwarding assignments"""
     
+    # Web port the customer's forwarded traffic lands on
+    DEFAULT_INTERNAL_PORT = 80
+    
     def __init__(self):
         self.port_range_start = 10000
         self.port_range_end = 20000
     
+    def get_allocator(self, router_config):
+        """Free/used port map of the router's forwarding range"""
+        return PortAllocator.for_router(router_config, self.port_range_start, self.port_range_end)
+    
     def assign_customer_port(self, customer, router_config):
         """Assign a unique external port for customer"""
-        from .models import Router, RouterConfig, ConnectedDevice, PortForwardingRule, RouterLog
-
-        # Get used ports
-        used_ports = PortForwardingRule.objects.filter(
-            router=router_config,
-            is_active=True
-        ).values_list('external_port', flat=True)
-        
-        # Find available port
-        for port in range(self.port_range_start, self.port_range_end + 1):
-            if port not in used_ports:
-                return port
-        
-        raise Exception("No available ports in range")
+        return self.get_allocator(router_config).allocate()[0]
     
     def get_available_ports(self, router_config, limit=10):
-        from .models import Router, RouterConfig, ConnectedDevice, PortForwardingRule, RouterLog
-
         """Get list of available ports for assignment"""
-        used_ports = PortForwardingRule.objects.filter(
-            router=router_config,
-            is_active=True
-        ).values_list('external_port', flat=True)
-        
-        available_ports = []
-        for port in range(self.port_range_start, self.port_range_end + 1):
-            if port not in used_ports:
-                available_ports.append(port)
-                if len(available_ports) >= limit:
-                    break
-        
-        return available_ports
+        return self.get_allocator(router_config).free_ports(limit)
     
-    def get_customer_ip(self, customer, router_config):
-        from .models import Router, RouterConfig, ConnectedDevice, PortForwardingRule, RouterLog
+    def _customer_ips(self, customers, router_config):
+        """{customer.pk: ip} from the router's active devices, matched on username in the hostname"""
+        from .models import ConnectedDevice
 
-        """Get customer's IP address from connected devices (on-demand)"""
-        try:
-            # Look for device with customer's username in hostname
-            device = ConnectedDevice.objects.filter(
-                router=router_config.router,
-                name__icontains=customer.username,
-                is_active=True
-            ).first()
-            
-            if device:
-                return device.ip_address
-            
-            # Fallback to any active device
-            device = ConnectedDevice.objects.filter(
-                router=router_config.router,
-                is_active=True
-            ).first()
-            
-            if device:
-                return device.ip_address
-            
+        devices = list(
+            ConnectedDevice.objects.filter(router__router_config=router_config, is_active=True)
+            .order_by('id').values_list('name', 'ip_address')
+        )
+        if not devices:
             # If no devices found, sync and try again
-            router_manager = RouterManagerService()
             success, message = router_manager.sync_connected_devices(router_config)
-            
             if success:
-                # Try again after sync
-                device = ConnectedDevice.objects.filter(
-                    router=router_config.router,
-                    is_active=True
-                ).first()
-                
-                if device:
-                    return device.ip_address
-            
-            return None
-            
+                devices = list(
+                    ConnectedDevice.objects.filter(router__router_config=router_config, is_active=True)
+                    .order_by('id').values_list('name', 'ip_address')
+                )
+        if not devices:
+            return {}
+        
+        ips = {}
+        for customer in customers:
+            username = customer.username.lower()
+            ips[customer.pk] = next(
+                (ip for name, ip in devices if username in (name or '').lower()),
+                devices[0][1],  # Fallback to any active device
+            )
+        return ips
+    
+    def get_customer_ip(self, customer, router_config):
+        """Get customer's IP address from connected devices (on-demand)"""
+        try:
+            return self._customer_ips([customer], router_config).get(customer.pk)
         except Exception as e:
             logger.error(f"Failed to get customer IP: {e}")
             return None
     
+    def _reserve_rules(self, router_config, wanted):
+        """
+        Allocate ports and store active rules for [(customer, customer_router, ip)]
+        with the router row locked. Returns the saved rules.
+        """
+        from .models import RouterConfig, PortForwardingRule
+
+        with transaction.atomic():
+            RouterConfig.objects.select_for_update().filter(pk=router_config.pk).first()
+            ports = self.get_allocator(router_config).allocate(len(wanted))
+            rules = [
+                PortForwardingRule(
+                    router=customer_router,
+                    router_config=router_config,
+                    customer=customer,
+                    external_port=port,
+                    internal_ip=ip,
+                    internal_port=self.DEFAULT_INTERNAL_PORT,
+                    protocol='tcp',
+                    is_active=True,
+                    description=f"Web access for {customer.username}",
+                )
+                for (customer, customer_router, ip), port in zip(wanted, ports)
+            ]
+            return PortForwardingRule.objects.bulk_create(rules)
+    
+    def bulk_setup_customer_port_forwarding(self, customers, router_config):
+        """
+        Set up port forwarding for many customers on one router: ports are
+        reserved in one locked transaction, then all rules are pushed over a
+        single router session. Rules the router rejects are removed again.
+        Returns [(customer, success, message, rule)] in input order.
+        """
+        from .models import Router, PortForwardingRule, RouterLog
+
+        customers = list(customers)
+        outcomes = {}
+        
+        unsupported = router_manager._unsupported(router_config, 'port_forwarding')
+        if unsupported:
+            return [(customer, False, unsupported, None) for customer in customers]
+        
+        customer_routers = {
+            router.user_id: router for router in Router.objects.filter(user__in=customers)
+        }
+        ips = self._customer_ips(customers, router_config)
+        wanted = []
+        for customer in customers:
+            if customer.pk not in customer_routers:
+                outcomes[customer.pk] = (False, f"{customer.username} has no router profile", None)
+            elif not ips.get(customer.pk):
+                outcomes[customer.pk] = (False, "Could not determine customer IP address", None)
+            else:
+                wanted.append((customer, customer_routers[customer.pk], ips[customer.pk]))
+        
+        rules = []
+        if wanted:
+            for attempt in range(3):
+                try:
+                    rules = self._reserve_rules(router_config, wanted)
+                    break
+                except IntegrityError:
+                    # Another process took one of the ports; re-read and retry
+                    logger.warning(f"Port allocation conflict on {router_config.name}, retrying")
+            else:
+                message = "Could not reserve ports, please retry"
+                for customer, _, _ in wanted:
+                    outcomes[customer.pk] = (False, message, None)
+        
+        if rules:
+            def push(driver):
+                return [
+                    bool(driver.create_port_forwarding(rule.external_port, rule.internal_ip, rule.internal_port, rule.protocol))
+                    for rule in rules
+                ]
+            
+            try:
+                connected, applied = router_manager.run_on_router(router_config, push)
+            except Exception as e:
+                logger.error(f"Port forwarding setup error on {router_config.name}: {e}")
+                connected, applied = False, None
+            if not connected or applied is None:
+                applied = [False] * len(rules)
+            
+            failed = [rule.pk for rule, ok in zip(rules, applied) if not ok]
+            if failed:
+                PortForwardingRule.objects.filter(pk__in=failed).delete()
+            
+            logs = []
+            for rule, ok in zip(rules, applied):
+                if ok:
+                    outcomes[rule.customer_id] = (True, f"Port {rule.external_port} assigned successfully", rule)
+                    logs.append(RouterLog(
+                        router=rule.router,
+                        log_type='config_change',
+                        message=f'Port forwarding created: {rule.external_port} -> {rule.internal_ip}:{rule.internal_port}'
+                    ))
+                else:
+                    message = "Failed to connect to router" if not connected else "Failed to create port forwarding on router"
+                    outcomes[rule.customer_id] = (False, message, None)
+            RouterLog.objects.bulk_create(logs)
+        
+        return [(customer, *outcomes[customer.pk]) for customer in customers]
+    
     def setup_customer_port_forwarding(self, customer, router_config):
         """Set up port forwarding for a customer (on-demand)"""
         try:
-            # Assign external port
-            external_port = self.assign_customer_port(customer, router_config)
-            
-            # Get customer's device IP
-            customer_ip = self.get_customer_ip(customer, router_config)
-            
-            if not customer_ip:
-                return False, "Could not determine customer IP address", None
-            
-            # Create port forwarding rule
-            router_manager = RouterManagerService()
-            success, message, rule = router_manager.create_port_forwarding_rule(
-                router_config=router_config,
-                customer=customer,
-                external_port=external_port,
-                internal_ip=customer_ip,
-                internal_port=80,  # Default web port
-                protocol='tcp',
-                description=f"Web access for {customer.username}"
-            )
-            
-            if success:
-                return True, f"Port {external_port} assigned successfully", rule
-            else:
-                return False, message, None
-                
+            _, success, message, rule = self.bulk_setup_customer_port_forwarding([customer], router_config)[0]
+            return success, message, rule
+        except PortsExhausted as e:
+            return False, str(e), None
         except Exception as e:
             logger.error(f"Port forwarding setup error: {e}")
             return False, str(e), None
@@ -484,43 +719,15 @@ def get_router_client(router_config):
 
 
 def discover_routers_in_network(network_range):
-    """Discover routers in a network range (on-demand)"""
-    import socket
-    import ipaddress
+    """Discover routers in a network range, blocking until the scan finishes"""
+    from .discovery import iter_scan
     
     discovered_routers = []
     
     try:
-        network = ipaddress.ip_network(network_range)
-        
-        # Common router ports to check
-        ports = [80, 443, 8080, 8443, 22, 23]
-        
-        for ip in network.hosts():
-            ip_str = str(ip)
-            
-            # Skip the network and broadcast addresses
-            if ip_str.endswith('.0') or ip_str.endswith('.255'):
-                continue
-            
-            for port in ports:
-                try:
-                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    sock.settimeout(1)  # 1 second timeout
-                    result = sock.connect_ex((ip_str, port))
-                    sock.close()
-                    
-                    if result == 0:
-                        # Port is open, likely a router
-                        discovered_routers.append({
-                            'ip_address': ip_str,
-                            'port': port,
-                            'status': 'reachable'
-                        })
-                        break  # Found a port, move to next IP
-                        
-                except:
-                    continue
+        for kind, payload in iter_scan(network_range):
+            if kind == 'result':
+                discovered_routers.append(payload)
     
     except Exception as e:
         logger.error(f"Router discovery failed: {e}")
@@ -537,6 +744,9 @@ def health_check():
         'online_routers': RouterConfig.objects.filter(is_online=True).count(),
         'total_port_rules': PortForwardingRule.objects.filter(is_active=True).count(),
         'service_status': 'active',
+        'drivers': driver_registry.get_status(),
+        'open_circuits': router_breakers.get_status(),
+        'driver_metrics': driver_metrics.snapshot(),
     }
     
     # Test connection to a sample router if any exist
@@ -561,13 +771,23 @@ def health_check():
 class RouterMonitor:
     """Background monitoring service for routers"""
     
+    # Shortest pause between scheduling passes
+    MIN_LOOP_WAIT = 5
+    
     def __init__(self):
-        from .models import RouterConfig
-        
         self.is_running = False
         self.monitoring_thread = None
         self.sync_interval = 300  # 5 minutes default
         self._stop_event = None
+        self._scheduler = None
+    
+    @property
+    def scheduler(self):
+        """Per-router adaptive scheduler, created on first use"""
+        if self._scheduler is None:
+            from .scheduler import MonitorScheduler
+            self._scheduler = MonitorScheduler(router_manager, base_interval=self.sync_interval)
+        return self._scheduler
     
     def start(self, interval=None):
         """Start background monitoring"""
@@ -605,12 +825,13 @@ class RouterMonitor:
         if self.monitoring_thread:
             self.monitoring_thread.join(timeout=5)
         
+        if self._scheduler:
+            self._scheduler.shutdown()
+        
         logger.info("RouterMonitor stopped")
     
     def _monitoring_loop(self):
         """Main monitoring loop"""
-        import time
-        
         logger.info("RouterMonitor loop started")
         
         while self.is_running and not self._stop_event.is_set():
@@ -619,43 +840,28 @@ class RouterMonitor:
             except Exception as e:
                 logger.error(f"Error in monitoring cycle: {e}")
             
-            # Sleep until next cycle or stop event
-            self._stop_event.wait(self.sync_interval)
+            # Sleep until the next router is due (never longer than the sync interval) or stop event
+            wait = min(max(self.scheduler.seconds_until_next_due(), self.MIN_LOOP_WAIT), self.sync_interval)
+            self._stop_event.wait(wait)
     
-    def _perform_monitoring_cycle(self):
-        """Perform one monitoring cycle"""
-        from .models import RouterConfig
-        from django.utils import timezone
-        
-        # Get all active router configs
-        router_configs = RouterConfig.objects.filter(is_online=True)
-        
-        logger.debug(f"Monitoring {router_configs.count()} routers")
-        
-        # Use existing RouterManagerService for operations
-        router_service = RouterManagerService()
-        
-        for config in router_configs:
-            try:
-                # Test connection
-                success, message = router_service.test_connection(config)
-                
-                if success:
-                    # Sync devices if online
-                    router_service.sync_connected_devices(config)
-                else:
-                    logger.warning(f"Router {config.name} is offline: {message}")
-                    
-            except Exception as e:
-                logger.error(f"Error monitoring router {config.name}: {e}")
-                continue
+    def _perform_monitoring_cycle(self, force=False):
+        """Poll the routers that are due, concurrently"""
+        self.scheduler.base_interval = self.sync_interval
+        report = self.scheduler.run_cycle(force=force)
+        driver_pool.prune()
+        return report
     
     def get_status(self):
         """Get monitor status"""
+        last_cycle = self.scheduler.last_cycle or {}
         return {
             'is_running': self.is_running,
             'sync_interval': self.sync_interval,
-            'thread_alive': self.monitoring_thread.is_alive() if self.monitoring_thread else False
+            'thread_alive': self.monitoring_thread.is_alive() if self.monitoring_thread else False,
+            'next_poll_in': round(self.scheduler.seconds_until_next_due(), 1),
+            'last_cycle': {key: value for key, value in last_cycle.items() if key != 'latencies'},
+            'slowest_routers': last_cycle.get('slowest', []),
+            'sessions': driver_pool.get_status(),
         }
     
     def set_sync_interval(self, interval):
@@ -678,9 +884,10 @@ class RouterMonitor:
         if not self.is_running:
             logger.warning("Monitor not running, starting one-time sync")
         
-        self._perform_monitoring_cycle()
+        report = self._perform_monitoring_cycle(force=True)
         
         logger.info("Forced sync completed")
+        return report
 
 
 # Add RouterMonitor to the exports and create an instance
@@ -0,0 +1,323 @@
+# router_manager/telemetry.py
+"""
+Router and device telemetry.
+
+Polls append raw samples: RouterTelemetry per RouterConfig (online state
+from test_connection, client count from sync_connected_devices), and
+DeviceTelemetry per reporting client (rx/tx rate, signal) from
+sync_connected_devices.
+
+rollup_telemetry() (run by the rollup_telemetry command every few
+minutes) downsamples closed 5 minute buckets from the raw rows, closed
+hourly buckets from the 5 minute rollups, then prunes each table past its
+retention. Dashboards read the rollups through router_series() and
+device_series(), which never touch raw rows.
+"""
+import logging
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, ExtractMinute, Floor, TruncHour
+from django.utils import timezone
+
+from .models import (
+    RouterTelemetry, DeviceTelemetry, RouterTelemetryRollup, DeviceTelemetryRollup,
+)
+
+logger = logging.getLogger(__name__)
+
+BUCKET_MINUTES = 5
+# Spans up to this long are served from 5 minute rollups, longer ones from hourly
+FINE_RESOLUTION_SPAN = timedelta(days=2)
+DEFAULT_RETENTION_DAYS = {'raw': 2, '5m': 14, '1h': 400}
+UPSERT_BATCH = 1000
+
+RATE_RE = re.compile(r'([\d.]+)\s*([kmg]?)bps', re.IGNORECASE)
+RATE_UNITS = {'': 0.001, 'k': 1, 'm': 1000, 'g': 1000000}
+
+ROUTER_ROLLUP_FIELDS = ['samples', 'online_samples', 'client_samples', 'clients_sum', 'clients_max']
+DEVICE_ROLLUP_FIELDS = [
+    'rate_samples', 'rx_sum', 'rx_max', 'tx_sum', 'tx_max',
+    'signal_samples', 'signal_sum', 'signal_min',
+]
+
+
+def retention_days():
+    return {**DEFAULT_RETENTION_DAYS, **getattr(settings, 'ROUTER_MANAGER', {}).get('TELEMETRY_RETENTION_DAYS', {})}
+
+
+def parse_rate(value):
+    """kbps from driver rates such as '54Mbps', '6Mbps-20MHz/1S' or a bps number"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value / 1000)
+    match = RATE_RE.search(str(value))
+    if not match:
+        return None
+    return int(float(match.group(1)) * RATE_UNITS[match.group(2).lower()])
+
+
+# -- recording ------------------------------------------------------------------
+
+def record_router_sample(router_config, is_online):
+    RouterTelemetry.objects.create(config=router_config, is_online=is_online)
+
+
+def record_client_sample(router_config, client_count):
+    """Client count only; it does not count towards uptime"""
+    RouterTelemetry.objects.create(config=router_config, client_count=client_count)
+
+
+def record_device_samples(router, devices_by_mac, parse_signal):
+    """One DeviceTelemetry row per reported device that carries link data"""
+    from .models import ConnectedDevice
+
+    readings = {}
+    for mac_address, device_data in devices_by_mac.items():
+        rx_rate = parse_rate(device_data.get('rx_rate'))
+        tx_rate = parse_rate(device_data.get('tx_rate'))
+        signal = parse_signal(device_data.get('signal_strength'))
+        if rx_rate is None and tx_rate is None and signal is None:
+            continue
+        if rx_rate is not None or tx_rate is not None:
+            rx_rate, tx_rate = rx_rate or 0, tx_rate or 0
+        readings[mac_address] = (rx_rate, tx_rate, signal)
+    if not readings:
+        return 0
+
+    now = timezone.now()
+    device_ids = ConnectedDevice.objects.filter(
+        router=router, mac_address__in=list(readings)
+    ).values_list('mac_address', 'id')
+    samples = [
+        DeviceTelemetry(
+            device_id=device_id, recorded_at=now,
+            rx_rate=readings[mac_address][0], tx_rate=readings[mac_address][1],
+            signal_strength=readings[mac_address][2],
+        )
+        for mac_address, device_id in device_ids
+    ]
+    DeviceTelemetry.objects.bulk_create(samples, batch_size=UPSERT_BATCH)
+    return len(samples)
+
+
+# -- downsampling ---------------------------------------------------------------
+
+def _floor(moment, minutes):
+    moment = moment.replace(second=0, microsecond=0)
+    return moment - timedelta(minutes=moment.minute % minutes)
+
+
+def _start(rollups, resolution, source, field, minutes):
+    """Recompute from the latest bucket already written, or the oldest source row"""
+    latest = rollups.filter(resolution=resolution).aggregate(latest=Max('bucket'))['latest']
+    if latest:
+        return latest
+    oldest = source.aggregate(oldest=Min(field))['oldest']
+    return _floor(oldest, minutes) if oldest else None
+
+
+def _upsert(model, rows, key, fields):
+    model.objects.bulk_create(
+        rows,
+        batch_size=UPSERT_BATCH,
+        update_conflicts=True,
+        unique_fields=[key, 'resolution', 'bucket'],
+        update_fields=fields,
+    )
+    return len(rows)
+
+
+def _five_minute_buckets(queryset):
+    return queryset.annotate(
+        hour=TruncHour('recorded_at'),
+        slot=Floor(ExtractMinute('recorded_at') / BUCKET_MINUTES),
+    )
+
+
+def _bucket(row):
+    return row['hour'] + timedelta(minutes=int(row['slot']) * BUCKET_MINUTES)
+
+
+def rollup_router_telemetry(now):
+    written = 0
+    end = _floor(now, BUCKET_MINUTES)
+    start = _start(RouterTelemetryRollup.objects, '5m', RouterTelemetry.objects, 'recorded_at', BUCKET_MINUTES)
+    if start and start < end:
+        rows = _five_minute_buckets(
+            RouterTelemetry.objects.filter(recorded_at__gte=start, recorded_at__lt=end)
+        ).values('config_id', 'hour', 'slot').annotate(
+            samples=Count('is_online'),
+            online_samples=Count('id', filter=Q(is_online=True)),
+            client_samples=Count('client_count'),
+            clients_sum=Coalesce(Sum('client_count'), 0),
+            clients_max=Coalesce(Max('client_count'), 0),
+        )
+        written += _upsert(RouterTelemetryRollup, [
+            RouterTelemetryRollup(
+                config_id=row['config_id'], resolution='5m', bucket=_bucket(row),
+                **{field: row[field] for field in ROUTER_ROLLUP_FIELDS}
+            )
+            for row in rows
+        ], 'config', ROUTER_ROLLUP_FIELDS)
+
+    end = _floor(now, 60)
+    fine = RouterTelemetryRollup.objects.filter(resolution='5m')
+    start = _start(RouterTelemetryRollup.objects, '1h', fine, 'bucket', 60)
+    if start and start < end:
+        rows = fine.filter(bucket__gte=start, bucket__lt=end).values(
+            'config_id', hour=TruncHour('bucket')
+        ).annotate(
+            total_samples=Sum('samples'),
+            total_online=Sum('online_samples'),
+            total_client_samples=Sum('client_samples'),
+            total_clients=Sum('clients_sum'),
+            peak_clients=Max('clients_max'),
+        )
+        written += _upsert(RouterTelemetryRollup, [
+            RouterTelemetryRollup(
+                config_id=row['config_id'], resolution='1h', bucket=row['hour'],
+                samples=row['total_samples'], online_samples=row['total_online'],
+                client_samples=row['total_client_samples'], clients_sum=row['total_clients'],
+                clients_max=row['peak_clients'],
+            )
+            for row in rows
+        ], 'config', ROUTER_ROLLUP_FIELDS)
+    return written
+
+
+def rollup_device_telemetry(now):
+    written = 0
+    end = _floor(now, BUCKET_MINUTES)
+    start = _start(DeviceTelemetryRollup.objects, '5m', DeviceTelemetry.objects, 'recorded_at', BUCKET_MINUTES)
+    if start and start < end:
+        rows = _five_minute_buckets(
+            DeviceTelemetry.objects.filter(recorded_at__gte=start, recorded_at__lt=end)
+        ).values('device_id', 'hour', 'slot').annotate(
+            rate_samples=Count('rx_rate'),
+            rx_sum=Coalesce(Sum('rx_rate'), 0),
+            rx_max=Coalesce(Max('rx_rate'), 0),
+            tx_sum=Coalesce(Sum('tx_rate'), 0),
+            tx_max=Coalesce(Max('tx_rate'), 0),
+            signal_samples=Count('signal_strength'),
+            signal_sum=Coalesce(Sum('signal_strength'), 0),
+            signal_min=Min('signal_strength'),
+        )
+        written += _upsert(DeviceTelemetryRollup, [
+            DeviceTelemetryRollup(
+                device_id=row['device_id'], resolution='5m', bucket=_bucket(row),
+                **{field: row[field] for field in DEVICE_ROLLUP_FIELDS}
+            )
+            for row in rows
+        ], 'device', DEVICE_ROLLUP_FIELDS)
+
+    end = _floor(now, 60)
+    fine = DeviceTelemetryRollup.objects.filter(resolution='5m')
+    start = _start(DeviceTelemetryRollup.objects, '1h', fine, 'bucket', 60)
+    if start and start < end:
+        rows = fine.filter(bucket__gte=start, bucket__lt=end).values(
+            'device_id', hour=TruncHour('bucket')
+        ).annotate(
+            total_rate_samples=Sum('rate_samples'),
+            total_rx=Sum('rx_sum'),
+            peak_rx=Max('rx_max'),
+            total_tx=Sum('tx_sum'),
+            peak_tx=Max('tx_max'),
+            total_signal_samples=Sum('signal_samples'),
+            total_signal=Sum('signal_sum'),
+            weakest_signal=Min('signal_min'),
+        )
+        written += _upsert(DeviceTelemetryRollup, [
+            DeviceTelemetryRollup(
+                device_id=row['device_id'], resolution='1h', bucket=row['hour'],
+                rate_samples=row['total_rate_samples'], rx_sum=row['total_rx'], rx_max=row['peak_rx'],
+                tx_sum=row['total_tx'], tx_max=row['peak_tx'],
+                signal_samples=row['total_signal_samples'], signal_sum=row['total_signal'],
+                signal_min=row['weakest_signal'],
+            )
+            for row in rows
+        ], 'device', DEVICE_ROLLUP_FIELDS)
+    return written
+
+
+def prune_telemetry(now):
+    """Delete raw samples and rollups past their retention. Returns rows deleted."""
+    days = retention_days()
+    deleted = 0
+    raw_before = now - timedelta(days=days['raw'])
+    deleted += RouterTelemetry.objects.filter(recorded_at__lt=raw_before).delete()[0]
+    deleted += DeviceTelemetry.objects.filter(recorded_at__lt=raw_before).delete()[0]
+    for resolution in ('5m', '1h'):
+        before = now - timedelta(days=days[resolution])
+        deleted += RouterTelemetryRollup.objects.filter(resolution=resolution, bucket__lt=before).delete()[0]
+        deleted += DeviceTelemetryRollup.objects.filter(resolution=resolution, bucket__lt=before).delete()[0]
+    return deleted
+
+
+def rollup_telemetry(now=None):
+    """Downsample closed buckets and apply retention. Returns (rollup rows written, rows pruned)."""
+    now = now or timezone.now()
+    written = rollup_router_telemetry(now) + rollup_device_telemetry(now)
+    return written, prune_telemetry(now)
+
+
+# -- queries ----------------------------------------------------------------------
+
+def pick_resolution(start, end):
+    return '5m' if end - start <= FINE_RESOLUTION_SPAN else '1h'
+
+
+def _ratio(numerator, denominator, digits=1):
+    return round(numerator / denominator, digits) if denominator else None
+
+
+def router_series(config_id, start, end=None):
+    """(resolution, points) of uptime % and client counts for one router"""
+    end = end or timezone.now()
+    resolution = pick_resolution(start, end)
+    rows = RouterTelemetryRollup.objects.filter(
+        config_id=config_id, resolution=resolution, bucket__gte=start, bucket__lt=end
+    ).values('bucket', *ROUTER_ROLLUP_FIELDS)
+    return resolution, [
+        {
+            'time': row['bucket'].isoformat(),
+            'uptime': _ratio(row['online_samples'] * 100, row['samples']),
+            'clients_avg': _ratio(row['clients_sum'], row['client_samples']),
+            'clients_max': row['clients_max'],
+        }
+        for row in rows
+    ]
+
+
+def device_series(device_id, start, end=None):
+    """(resolution, points) of rx/tx kbps and signal dBm for one device"""
+    end = end or timezone.now()
+    resolution = pick_resolution(start, end)
+    rows = DeviceTelemetryRollup.objects.filter(
+        device_id=device_id, resolution=resolution, bucket__gte=start, bucket__lt=end
+    ).values('bucket', *DEVICE_ROLLUP_FIELDS)
+    return resolution, [
+        {
+            'time': row['bucket'].isoformat(),
+            'rx_avg': _ratio(row['rx_sum'], row['rate_samples']),
+            'rx_max': row['rx_max'],
+            'tx_avg': _ratio(row['tx_sum'], row['rate_samples']),
+            'tx_max': row['tx_max'],
+            'signal_avg': _ratio(row['signal_sum'], row['signal_samples']),
+            'signal_min': row['signal_min'],
+        }
+        for row in rows
+    ]
+
+
+def router_uptime(config_ids, start, end=None):
+    """{config_id: uptime %} over a window from rollups, in one query"""
+    end = end or timezone.now()
+    rows = RouterTelemetryRollup.objects.filter(
+        config_id__in=config_ids, resolution=pick_resolution(start, end),
+        bucket__gte=start, bucket__lt=end,
+    ).values('config_id').annotate(total=Sum('samples'), online=Sum('online_samples'))
+    return {row['config_id']: _ratio(row['online'] * 100, row['total']) for row in rows}
@@ -40,6 +40,9 @@ urlpatterns = [
     path('isp/routers/<int:router_id>/update-wifi/', views.isp_update_router_wifi, name='isp_update_router_wifi'),
     path('isp/routers/<int:router_id>/reboot/', views.isp_remote_reboot, name='isp_remote_reboot'),
     path('isp/routers/bulk-sync/', views.isp_bulk_sync, name='isp_bulk_sync'),
+    path('isp/routers/bulk-sync/<uuid:job_id>/', views.isp_bulk_sync_status, name='isp_bulk_sync_status'),
+    path('isp/routers/<int:router_id>/telemetry/', views.isp_router_telemetry, name='isp_router_telemetry'),
+    path('isp/devices/<int:device_id>/telemetry/', views.isp_device_telemetry, name='isp_device_telemetry'),
 
     # ============================================
     # BRAND-SPECIFIC SETUP (router_manager.views)
@@ -74,6 +77,7 @@ urlpatterns = [
     path('admin/router/status/', views.admin_router_status, name='admin_router_status'),
     path('admin/router/control/', views.admin_router_control, name='admin_router_control'),
     path('admin/router/discover/', views.admin_discover_routers, name='admin_discover_routers'),
+    path('admin/router/discover/<uuid:job_id>/', views.admin_discovery_job, name='admin_discovery_job'),
 
     # ============================================
     # ROUTER ASSIGNMENT URLs
@@ -7,8 +7,13 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 import json
 from django.utils import timezone
-from .models import Router, ConnectedDevice, RouterConfig, PortForwardingRule, RouterLog, ParentalControlSchedule, FirmwareUpdate, GuestNetwork, Device
-from .services import discover_routers_in_network, health_check, port_service, RouterManagerService, RouterMonitor, router_monitor
+from django.urls import reverse
+from .models import Router, ConnectedDevice, RouterConfig, PortForwardingRule, RouterLog, ParentalControlSchedule, FirmwareUpdate, GuestNetwork, Device, BackgroundJob
+from .services import discover_routers_in_network, health_check, port_service, RouterManagerService, RouterMonitor, router_monitor, router_manager
+from .discovery import parse_network, run_discovery_job
+from .bulk_sync import active_bulk_sync, run_bulk_sync_job
+from . import telemetry
+from .jobs import start_job, serialize_job
 from .forms import FirmwareUpdateForm, ParentalControlForm, RouterForm, WiFiPasswordForm, AdvancedSettingsForm, GuestNetworkForm, ISPAddRouterForm, ISPPortForwardingForm, DeviceBlockForm
 from accounts.models import Tenant, CustomUser
 from datetime import timedelta
@@ -18,6 +23,8 @@ from accounts.decorators import isp_required
 router_service = RouterManagerService()
 router_monitor = RouterMonitor()
 
+TELEMETRY_MAX_HOURS = 24 * 90
+
 def staff_member_required(view_func=None, login_url='admin:login'):
     """
     Custom decorator for staff members
@@ -98,13 +105,15 @@ def customer_router_setup(request):
                 return redirect('dashboard')
             
             # Set up port forwarding
-            external_port = port_service.setup_customer_port_forwarding(
+            success, message, rule = port_service.setup_customer_port_forwarding(
                 customer=request.user,
-                router=router_config
+                router_config=router_config
             )
             
-            messages.success(request, f"Port forwarding configured! Your external port: {external_port}")
-            return redirect('dashboard')
+            if success:
+                messages.success(request, f"Port forwarding configured! Your external port: {rule.external_port}")
+                return redirect('dashboard')
+            messages.error(request, f"Setup failed: {message}")
             
         except Exception as e:
             messages.error(request, f"Setup failed: {str(e)}")
@@ -368,10 +377,10 @@ def block_device(request, device_id):
         RouterLog.objects.create(
             router=device.router,
             log_type='security_event',
-            message=f'Device {device.name or device.ip_address} blocked by user'
+            message=f'Device {device.name or device.ip_address or device.mac_address} blocked by user'
         )
         
-        messages.success(request, f'{device.name or device.ip_address} has been blocked.')
+        messages.success(request, f'{device.name or device.ip_address or device.mac_address} has been blocked.')
     except ConnectedDevice.DoesNotExist:
         messages.error(request, 'Device not found.')
     
@@ -394,10 +403,10 @@ def unblock_device(request, device_id):
         RouterLog.objects.create(
             router=device.router,
             log_type='security_event',
-            message=f'Device {device.name or device.ip_address} unblocked by user'
+            message=f'Device {device.name or device.ip_address or device.mac_address} unblocked by user'
         )
         
-        messages.success(request, f'{device.name or device.ip_address} has been unblocked.')
+        messages.success(request, f'{device.name or device.ip_address or device.mac_address} has been unblocked.')
     except ConnectedDevice.DoesNotExist:
         messages.error(request, 'Device not found.')
     
@@ -470,10 +479,10 @@ def parental_controls(request):
                 RouterLog.objects.create(
                     router=router,
                     log_type='security_event',
-                    message=f'Device {device.name or device.ip_address} blocked via parental controls. Reason: {reason}'
+                    message=f'Device {device.name or device.ip_address or device.mac_address} blocked via parental controls. Reason: {reason}'
                 )
                 
-                messages.success(request, f'{device.name or device.ip_address} has been blocked.')
+                messages.success(request, f'{device.name or device.ip_address or device.mac_address} has been blocked.')
                 return redirect('parental_controls')
             except ConnectedDevice.DoesNotExist:
                 messages.error(request, 'Device not found.')
@@ -531,10 +540,10 @@ def unblock_device_parental(request, device_id):
         RouterLog.objects.create(
             router=device.router,
             log_type='security_event',
-            message=f'Device {device.name or device.ip_address} unblocked from parental controls'
+            message=f'Device {device.name or device.ip_address or device.mac_address} unblocked from parental controls'
         )
         
-        messages.success(request, f'{device.name or device.ip_address} has been unblocked.')
+        messages.success(request, f'{device.name or device.ip_address or device.mac_address} has been unblocked.')
     except ConnectedDevice.DoesNotExist:
         messages.error(request, 'Device not found.')
     
@@ -961,15 +970,12 @@ def isp_toggle_port_rule(request):
             ).first()
             
             if router_config:
-                driver = router_service.get_router_driver(router_config)
-                if driver and driver.connect():
-                    driver.create_port_forwarding(
-                        rule.external_port,
-                        rule.internal_ip,
-                        rule.internal_port,
-                        rule.protocol
-                    )
-                    driver.disconnect()
+                router_manager.run_on_router(router_config, lambda driver: driver.create_port_forwarding(
+                    rule.external_port,
+                    rule.internal_ip,
+                    rule.internal_port,
+                    rule.protocol
+                ))
         
         return JsonResponse({
             'success': True,
@@ -1053,24 +1059,66 @@ def isp_sync_router(request, router_id):
 @login_required
 @isp_required
 def isp_bulk_sync(request):
-    """Bulk sync all routers"""
+    """Start syncing all of the tenant's routers in the background"""
     try:
-        router_configs = RouterConfig.objects.filter(tenant=request.user.tenant)
-        success_count = 0
-        total_count = router_configs.count()
+        job = active_bulk_sync(request.user.tenant)
+        if job is None:
+            job = start_job(
+                'bulk_sync', run_bulk_sync_job,
+                params={'tenant_id': str(request.user.tenant_id)},
+                tenant=request.user.tenant, user=request.user,
+            )
+        status_url = reverse('isp_bulk_sync_status', args=[job.pk])
         
-        for config in router_configs:
-            success, message = router_service.sync_connected_devices(config)
-            if success:
-                success_count += 1
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+            return JsonResponse({'job_id': str(job.pk), 'status_url': status_url}, status=202)
         
-        messages.success(request, f"Synced {success_count}/{total_count} routers")
+        messages.info(request, "Router sync started in the background")
         return redirect('isp_routers')
         
     except Exception as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect('isp_routers')
 
+@login_required
+@isp_required
+def isp_bulk_sync_status(request, job_id):
+    """Progress of a bulk sync job; ?since=N returns per-router results from index N"""
+    job = get_object_or_404(BackgroundJob, pk=job_id, job_type='bulk_sync', tenant=request.user.tenant)
+    try:
+        since = max(int(request.GET.get('since', 0)), 0)
+    except ValueError:
+        since = 0
+    
+    data = serialize_job(job, since)
+    data['succeeded'] = sum(1 for result in job.results if result['success'])
+    data['failed'] = len(job.results) - data['succeeded']
+    return JsonResponse(data)
+
+def _telemetry_window(request):
+    """Start of the ?hours= window (default 24, up to 90 days)"""
+    try:
+        hours = min(max(int(request.GET.get('hours', 24)), 1), TELEMETRY_MAX_HOURS)
+    except ValueError:
+        hours = 24
+    return timezone.now() - timedelta(hours=hours)
+
+@login_required
+@isp_required
+def isp_router_telemetry(request, router_id):
+    """Uptime and client count history for one router, from telemetry rollups"""
+    router_config = get_object_or_404(RouterConfig, id=router_id, tenant=request.user.tenant)
+    resolution, points = telemetry.router_series(router_config.id, _telemetry_window(request))
+    return JsonResponse({'router': router_config.name, 'resolution': resolution, 'points': points})
+
+@login_required
+@isp_required
+def isp_device_telemetry(request, device_id):
+    """Link rate and signal history for one connected device, from telemetry rollups"""
+    device = get_object_or_404(ConnectedDevice, id=device_id, router__tenant=request.user.tenant)
+    resolution, points = telemetry.device_series(device.id, _telemetry_window(request))
+    return JsonResponse({'device': str(device), 'resolution': resolution, 'points': points})
+
 @login_required
 @isp_required
 def isp_update_router_wifi(request, router_id):
@@ -1514,12 +1562,31 @@ def admin_router_control(request):
 
 @staff_member_required
 def admin_discover_routers(request):
-    """Admin view to discover routers in network"""
+    """Start a background scan of a network; poll admin_discovery_job for results"""
     network = request.GET.get('network', '192.168.1.0/24')
-    routers = discover_routers_in_network(network)
+    try:
+        network = str(parse_network(network))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    job = start_job('discovery', run_discovery_job, params={'network': network}, user=request.user)
     
     return JsonResponse({
         'network': network,
-        'routers_found': len(routers),
-        'routers': routers
-    })
\ No newline at end of file
+        'job_id': str(job.pk),
+        'status_url': reverse('admin_discovery_job', args=[job.pk]),
+    }, status=202)
+
+@staff_member_required
+def admin_discovery_job(request, job_id):
+    """Progress and results of a discovery job; ?since=N returns results from index N"""
+    job = get_object_or_404(BackgroundJob, pk=job_id, job_type='discovery')
+    try:
+        since = max(int(request.GET.get('since', 0)), 0)
+    except ValueError:
+        since = 0
+    
+    data = serialize_job(job, since)
+    data['network'] = job.params.get('network')
+    data['routers_found'] = len(job.results)
+    return JsonResponse(data)
\ No newline at end of file